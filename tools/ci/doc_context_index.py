@@ -0,0 +1,256 @@
+"""Indice invertito delle sezioni di documentazione, per scegliere il contesto del doc autopilot.
+
+La documentazione (README, `docs/**/*.md`, README dei moduli, CODEOWNERS/labeler) viene divisa
+in sezioni per titolo Markdown; l'indice salva il testo delle sezioni e le posting list
+termine → {sezione: frequenza}. Il file dell'indice è legato agli hash dei blob git dei
+documenti: a ogni esecuzione basta un `git ls-files -s` per capire quali file sono cambiati, e
+solo quelli vengono riletti e reindicizzati.
+
+Le sezioni vengono ordinate con BM25 rispetto ai termini del diff (identificatori delle righe
+modificate, spezzati in camelCase/snake_case, e segmenti dei path toccati).
+"""
+from __future__ import annotations
+
+import json
+import math
+import os
+import re
+import subprocess
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Bumped when tokenisation or file layout change: older index files are rebuilt.
+INDEX_VERSION = 1
+
+DOC_PATHSPECS = (
+    "README.md",
+    ":(glob)docs/**/*.md",
+    ":(glob)modules/*/README.md",
+    ".github/CODEOWNERS",
+    ".github/labeler.yml",
+)
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+MAX_QUERY_TERMS = 64
+
+_WORD_RE = re.compile(r"[A-Za-z][A-Za-z0-9_]+")
+_PART_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+_HEADING_RE = re.compile(r"^(#{1,3})\s+(.+?)\s*#*\s*$")
+_STOPWORDS = frozenset(
+    """
+    the and for with this that from are was were will not but can has have had you your our its into
+    when then than also only each other more most some such all any may should must use used using
+    return self def class import public private protected static void string var let const new null
+    true false none async await function namespace get set value values true int bool list dict
+    """.split()
+)
+
+
+def terms(text: str) -> Iterable[str]:
+    """Termini normalizzati: parole intere e, per gli identificatori composti, le loro parti."""
+    for word in _WORD_RE.findall(text):
+        lowered = word.lower()
+        if len(lowered) >= 3 and lowered not in _STOPWORDS:
+            yield lowered
+        parts = [p.lower() for chunk in word.split("_") for p in _PART_RE.findall(chunk)]
+        if len(parts) > 1:
+            for part in parts:
+                if len(part) >= 3 and part not in _STOPWORDS:
+                    yield part
+
+
+def query_terms_from_diff(diff_text: str, limit: int = MAX_QUERY_TERMS) -> Counter:
+    """Termini delle righe modificate e dei path toccati, con la loro frequenza nel diff."""
+    counts: Counter = Counter()
+    for line in diff_text.splitlines():
+        if line.startswith("diff --git "):
+            counts.update(terms(line[len("diff --git "):].replace("/", " ").replace(".", " ")))
+        elif line.startswith(("+++", "---")):
+            continue
+        elif line.startswith(("+", "-")):
+            counts.update(terms(line[1:]))
+    return Counter(dict(counts.most_common(limit)))
+
+
+def split_sections(path: str, text: str) -> List[Tuple[str, str]]:
+    """(titolo, testo) per ogni sezione `#`/`##`/`###`; i file non Markdown sono una sezione sola."""
+    if not path.endswith(".md"):
+        return [(path, text)] if text.strip() else []
+    sections: List[Tuple[str, List[str]]] = []
+    heading, lines = path, []
+    in_fence = False
+    for line in text.splitlines():
+        if line.lstrip().startswith("```"):
+            in_fence = not in_fence
+        match = None if in_fence else _HEADING_RE.match(line)
+        if match:
+            if any(l.strip() for l in lines):
+                sections.append((heading, lines))
+            heading, lines = match.group(2), [line]
+        else:
+            lines.append(line)
+    if any(l.strip() for l in lines):
+        sections.append((heading, lines))
+    return [(h, "\n".join(body).strip()) for h, body in sections]
+
+
+def doc_fingerprints(repo_root: Path) -> Dict[str, str]:
+    """Path → hash del blob git dei documenti indicizzati (stat del file fuori da un repo git)."""
+    proc = subprocess.run(
+        ["git", "ls-files", "-s", "--", *DOC_PATHSPECS],
+        cwd=repo_root,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+    )
+    if proc.returncode == 0:
+        found: Dict[str, str] = {}
+        for line in proc.stdout.splitlines():
+            meta, _, path = line.partition("\t")
+            parts = meta.split()
+            if len(parts) >= 2:
+                found[path] = parts[1]
+        return found
+    found = {}
+    for pattern in ("README.md", "docs/**/*.md", "modules/*/README.md", ".github/CODEOWNERS", ".github/labeler.yml"):
+        for file_path in repo_root.glob(pattern):
+            if file_path.is_file():
+                stat = file_path.stat()
+                found[file_path.relative_to(repo_root).as_posix()] = f"{stat.st_mtime_ns}:{stat.st_size}"
+    return found
+
+
+@dataclass
+class RankedSection:
+    path: str
+    heading: str
+    text: str
+    score: float
+
+
+class DocContextIndex:
+    """Sezioni di documentazione con posting list persistite e ranking BM25."""
+
+    def __init__(self) -> None:
+        self.files: Dict[str, Dict[str, object]] = {}  # path -> {"blob": hash, "sections": [id, ...]}
+        self.sections: Dict[int, Tuple[str, str, str, int]] = {}  # id -> (path, heading, text, n. termini)
+        self.postings: Dict[str, Dict[int, int]] = {}  # termine -> {id: frequenza}
+        self.next_id = 0
+        self.files_read = 0  # documenti riletti dall'ultima sincronizzazione
+
+    # -- persistenza ------------------------------------------------------------------------
+
+    @classmethod
+    def load(cls, path: Optional[Path]) -> "DocContextIndex":
+        index = cls()
+        if path is None:
+            return index
+        try:
+            data = json.loads(Path(path).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return index
+        if data.get("version") != INDEX_VERSION:
+            return index
+        index.files = data["files"]
+        index.sections = {int(k): tuple(v) for k, v in data["sections"].items()}
+        index.postings = {term: {int(k): tf for k, tf in docs.items()} for term, docs in data["postings"].items()}
+        index.next_id = data["next_id"]
+        return index
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {
+            "version": INDEX_VERSION,
+            "files": self.files,
+            "sections": {str(k): list(v) for k, v in self.sections.items()},
+            "postings": self.postings,
+            "next_id": self.next_id,
+        }
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(payload, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load_or_build(cls, repo_root: Path, path: Optional[Path]) -> "DocContextIndex":
+        """Indice aggiornato ai documenti correnti; salvato solo se qualcosa è cambiato."""
+        index = cls.load(path)
+        if index.sync(repo_root, doc_fingerprints(repo_root)) and path is not None:
+            index.save(path)
+        return index
+
+    # -- aggiornamento ----------------------------------------------------------------------
+
+    def sync(self, repo_root: Path, fingerprints: Dict[str, str]) -> bool:
+        """Reindicizza solo i file nuovi, cambiati o rimossi; True se l'indice è cambiato."""
+        stale = [p for p, meta in self.files.items() if fingerprints.get(p) != meta["blob"]]
+        fresh = [p for p, blob in fingerprints.items() if p not in self.files or p in stale]
+        if not stale and not fresh:
+            return False
+        for file_path in stale:
+            self._remove(file_path)
+        for file_path in sorted(fresh):
+            try:
+                text = (repo_root / file_path).read_text(encoding="utf-8")
+            except (OSError, UnicodeDecodeError):
+                continue
+            self.files_read += 1
+            self._add(file_path, fingerprints[file_path], text)
+        return True
+
+    def _remove(self, file_path: str) -> None:
+        ids = set(self.files.pop(file_path)["sections"])
+        for section_id in ids:
+            self.sections.pop(section_id, None)
+        for term in list(self.postings):
+            docs = self.postings[term]
+            for section_id in ids & docs.keys():
+                del docs[section_id]
+            if not docs:
+                del self.postings[term]
+
+    def _add(self, file_path: str, blob: str, text: str) -> None:
+        ids: List[int] = []
+        for heading, body in split_sections(file_path, text):
+            counts = Counter(terms(f"{file_path.replace('/', ' ')} {body}"))
+            section_id = self.next_id
+            self.next_id += 1
+            self.sections[section_id] = (file_path, heading, body, sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings.setdefault(term, {})[section_id] = tf
+            ids.append(section_id)
+        self.files[file_path] = {"blob": blob, "sections": ids}
+
+    # -- ranking ----------------------------------------------------------------------------
+
+    def rank(
+        self,
+        query: Counter,
+        top_k: int,
+        boost_paths: Sequence[str] = (),
+        boost: float = 2.0,
+    ) -> List[RankedSection]:
+        """Le `top_k` sezioni più pertinenti; le sezioni dei file in `boost_paths` valgono `boost` volte."""
+        if not self.sections:
+            return []
+        total = len(self.sections)
+        avg_len = sum(s[3] for s in self.sections.values()) / total or 1.0
+        scores: Dict[int, float] = {}
+        for term, qtf in query.items():
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = math.log(1 + (total - len(docs) + 0.5) / (len(docs) + 0.5))
+            weight = idf * (1 + math.log(qtf))
+            for section_id, tf in docs.items():
+                length = self.sections[section_id][3]
+                norm = tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_len))
+                scores[section_id] = scores.get(section_id, 0.0) + weight * norm
+        boosted = set(boost_paths)
+        for section_id, (file_path, *_rest) in self.sections.items():
+            if file_path in boosted:
+                scores[section_id] = (scores.get(section_id, 0.0) + 1.0) * boost
+        best = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:top_k]
+        return [RankedSection(*self.sections[section_id][:3], score=score) for section_id, score in best if score > 0]
@@ -0,0 +1,217 @@
+"""Applicazione in blocco delle patch di documentazione proposte dal doc autopilot.
+
+Ogni patch viene analizzata in memoria una sola volta (header `diff --git`, header degli hunk,
+file creati o rimossi) e controllata contro i path ammessi e i file tracciati, con un solo
+`git ls-files` per tutte le patch. Le patch accettate vengono unite in un unico diff:
+`git apply --index --check` lo verifica (gli errori vengono attribuiti alla patch del file
+citato, che viene scartata, e il controllo si ripete sulle rimanenti) e un solo `git apply --index`
+lo applica. Se l'applicazione finale fallisce, file e indice tornano allo stato precedente e
+nessuna patch risulta applicata.
+"""
+from __future__ import annotations
+
+import re
+import subprocess
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+HUNK_HEADER_RE = re.compile(r"^@@ -\d+(?:,\d+)? \+\d+(?:,\d+)? @@")
+DIFF_HEADER_RE = re.compile(r"^diff --git a/(.+) b/(.+)$")
+GIT_APPLY_ARGS = ["git", "apply", "--index", "--whitespace=fix"]
+
+
+class PatchError(ValueError):
+    pass
+
+
+@dataclass
+class FilePatch:
+    old_path: Optional[str]  # None per i file nuovi
+    new_path: Optional[str]  # None per i file rimossi
+    text: str
+
+    @property
+    def path(self) -> str:
+        return self.new_path or self.old_path or ""
+
+
+@dataclass
+class PatchResult:
+    source: str  # es. "doc_patches[2]" o "adr"
+    paths: List[str] = field(default_factory=list)
+    accepted: bool = False
+    reason: str = ""
+
+    def to_dict(self) -> Dict[str, object]:
+        return asdict(self)
+
+
+def parse_patch(patch_text: str) -> List[FilePatch]:
+    """Divide una patch per file; `PatchError` se manca l'header o un hunk ha un header non valido."""
+    if not patch_text.strip():
+        raise PatchError("empty patch")
+    sections: List[List[str]] = []
+    for line in patch_text.splitlines():
+        if line.startswith("diff --git "):
+            sections.append([line])
+        elif sections:
+            sections[-1].append(line)
+        # il testo prima del primo header viene ignorato, come fa git apply
+    if not sections:
+        raise PatchError("missing the 'diff --git' header")
+    files: List[FilePatch] = []
+    for lines in sections:
+        match = DIFF_HEADER_RE.match(lines[0])
+        if not match:
+            raise PatchError(f"malformed header: {lines[0][:120]!r}")
+        old_path: Optional[str] = match.group(1)
+        new_path: Optional[str] = match.group(2)
+        hunks = 0
+        for line in lines[1:]:
+            if line.startswith("@@"):
+                if not HUNK_HEADER_RE.match(line):
+                    raise PatchError(f"invalid hunk header: {line[:120]!r}")
+                hunks += 1
+            elif hunks:
+                continue
+            elif line.startswith("--- /dev/null") or line.startswith("new file mode"):
+                old_path = None
+            elif line.startswith("+++ /dev/null") or line.startswith("deleted file mode"):
+                new_path = None
+            elif line.startswith(("GIT binary patch", "Binary files ")):
+                raise PatchError(f"binary patch for {match.group(2)}")
+        if not hunks and old_path is not None and new_path is not None and old_path == new_path:
+            raise PatchError(f"no hunks for {new_path}")
+        files.append(FilePatch(old_path, new_path, "\n".join(lines) + "\n"))
+    return files
+
+
+def _tracked_paths(repo_root: Path, paths: Sequence[str], run: Callable[..., subprocess.CompletedProcess]) -> Set[str]:
+    if not paths:
+        return set()
+    proc = run(
+        ["git", "ls-files", "-z", "--", *sorted(set(paths))],
+        cwd=repo_root,
+        capture_output=True,
+        text=True,
+    )
+    return {p for p in proc.stdout.split("\0") if p} if proc.returncode == 0 else set()
+
+
+def _git_apply(
+    repo_root: Path, patch_text: str, extra: Sequence[str], run: Callable[..., subprocess.CompletedProcess]
+) -> Tuple[bool, str]:
+    proc = run([*GIT_APPLY_ARGS, *extra], input=patch_text, cwd=repo_root, capture_output=True, text=True)
+    return proc.returncode == 0, (proc.stderr or "").strip()
+
+
+def _blame(error: str, accepted: Dict[int, List[FilePatch]]) -> Dict[int, str]:
+    """Patch citate dagli errori di `git apply --check`, con la prima riga d'errore che le riguarda."""
+    blamed: Dict[int, str] = {}
+    for line in error.splitlines():
+        if not line.startswith("error:"):
+            continue
+        for position, files in accepted.items():
+            if position not in blamed and any(f" {f.path}:" in line or f" {f.path} " in line for f in files):
+                blamed[position] = line[len("error:"):].strip()
+    return blamed
+
+
+def apply_patches(
+    patches: Sequence[Tuple[str, str]],
+    repo_root: Path,
+    *,
+    is_allowed: Callable[[str], bool],
+    new_file_prefixes: Sequence[str] = ("docs/",),
+    run: Callable[..., subprocess.CompletedProcess] = subprocess.run,
+) -> List[PatchResult]:
+    """Applica le patch `(origine, testo)` in un'unica operazione; un `PatchResult` per patch, in ordine."""
+    results = [PatchResult(source) for source, _ in patches]
+    parsed: Dict[int, List[FilePatch]] = {}
+    for position, (_, text) in enumerate(patches):
+        try:
+            files = parse_patch(text)
+        except PatchError as exc:
+            results[position].reason = str(exc)
+            continue
+        results[position].paths = [f.path for f in files]
+        touched = {p for f in files for p in (f.old_path, f.new_path) if p}
+        disallowed = sorted(p for p in touched if not is_allowed(p))
+        if disallowed:
+            results[position].reason = f"paths not allowed: {', '.join(disallowed)}"
+            continue
+        parsed[position] = files
+
+    tracked = _tracked_paths(repo_root, [p for files in parsed.values() for f in files for p in (f.old_path, f.new_path) if p], run)
+    owners: Dict[str, int] = {}
+    accepted: Dict[int, List[FilePatch]] = {}
+    for position, files in parsed.items():
+        reason = ""
+        for f in files:
+            if f.old_path is not None and f.old_path not in tracked:
+                reason = f"target file not found: {f.old_path}"
+            elif f.old_path is None and f.new_path in tracked:
+                reason = f"file already exists: {f.new_path}"
+            elif f.old_path is None and not f.path.startswith(tuple(new_file_prefixes)):
+                reason = f"new files are only allowed under {', '.join(new_file_prefixes)}: {f.path}"
+            elif f.path in owners:
+                reason = f"{f.path} is already patched by {results[owners[f.path]].source}"
+            if reason:
+                break
+        if reason:
+            results[position].reason = reason
+            continue
+        for f in files:
+            owners[f.path] = position
+        accepted[position] = files
+
+    # un solo --check sul diff unito; si ripete solo se qualche patch va scartata
+    while accepted:
+        ok, error = _git_apply(repo_root, _merge(accepted), ["--check"], run)
+        if ok:
+            break
+        blamed = _blame(error, accepted) or {position: error or "git apply --check failed" for position in accepted}
+        for position, reason in blamed.items():
+            results[position].reason = f"does not apply: {reason}"
+            del accepted[position]
+    if not accepted:
+        return results
+
+    snapshot = _snapshot(repo_root, accepted)
+    ok, error = _git_apply(repo_root, _merge(accepted), [], run)
+    if not ok:
+        _restore(repo_root, snapshot, run)
+        for position in accepted:
+            results[position].reason = f"rolled back, batch apply failed: {error or 'git apply failed'}"
+        return results
+    for position in accepted:
+        results[position].accepted = True
+    return results
+
+
+def _merge(accepted: Dict[int, List[FilePatch]]) -> str:
+    return "".join(f.text for position in sorted(accepted) for f in accepted[position])
+
+
+def _snapshot(repo_root: Path, accepted: Dict[int, List[FilePatch]]) -> Dict[str, Optional[bytes]]:
+    snapshot: Dict[str, Optional[bytes]] = {}
+    for files in accepted.values():
+        for f in files:
+            for path in (f.old_path, f.new_path):
+                if path and path not in snapshot:
+                    target = repo_root / path
+                    snapshot[path] = target.read_bytes() if target.is_file() else None
+    return snapshot
+
+
+def _restore(repo_root: Path, snapshot: Dict[str, Optional[bytes]], run: Callable[..., subprocess.CompletedProcess]) -> None:
+    for path, content in snapshot.items():
+        target = repo_root / path
+        if content is None:
+            target.unlink(missing_ok=True)
+        else:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(content)
+    # l'indice torna a HEAD per i soli file toccati (file nuovi compresi)
+    run(["git", "reset", "-q", "--", *sorted(snapshot)], cwd=repo_root, capture_output=True, text=True)
@@ -9,19 +9,31 @@ from __future__ import annotations
 
 import argparse
 import fnmatch
+import hashlib
 import json
 import os
 import re
 import subprocess
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Tuple
+from typing import Any, Callable, Dict, Iterable, List, Tuple
 from zoneinfo import ZoneInfo
 
 import requests
 
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from tools.ci.doc_context_index import DocContextIndex, query_terms_from_diff
+from tools.ci.doc_patches import PatchResult, apply_patches
+from tools.ci.prompt_budget import Section, allocate, count_tokens, fair_share, truncate_tokens
+from tools.github_http import shared_client
+from tools.rate_limit import SlidingWindowLimiter
+
 # --------------------------------------------------------------------------------------
 # Costanti / limiti (configurabili via env)
 # --------------------------------------------------------------------------------------
@@ -32,23 +44,36 @@ USER_PROMPT_PATH = REPO_ROOT / "tools" / "ci" / "prompts" / "momentum_codex_auto
 
 COMMENT_MARKER = "<!-- momentum-doc-autopilot -->"
 
-SUPPORTED_DOC_FILES = [
-    Path("README.md"),
-    Path("docs/ARCHITECTURE.md"),
-    Path("docs/SECURITY.md"),
-    Path("docs/TESTING.md"),
-    Path("docs/OBSERVABILITY.md"),
-    Path("docs/RELEASE_NOTES_TEMPLATE.md"),
-    Path("docs/CONTRIBUTING.md"),
-    Path(".github/CODEOWNERS"),
-    Path(".github/labeler.yml"),
-]
 DOC_ADR_DIR = Path("docs/ADR")
 
-# limiti default; possono essere ridotti via env per evitare 429/TPM
-MAX_CONTEXT_CHARS = int(os.environ.get("MAX_CONTEXT_CHARS", "16000"))
-MAX_DIFF_CHARS = int(os.environ.get("MAX_DIFF_CHARS", "120000"))
-MAX_BODY_CHARS = int(os.environ.get("MAX_BODY_CHARS", "6000"))
+# Budget in token del prompt (system + user), ripartito tra le sezioni prima della richiesta
+# (vedi tools/ci/prompt_budget.py), e token massimi della risposta.
+PROMPT_TOKEN_BUDGET = int(os.environ.get("PROMPT_TOKEN_BUDGET", "30000"))
+MAX_OUTPUT_TOKENS = int(os.environ.get("MAX_OUTPUT_TOKENS", "2000"))
+
+# Priorità e quota massima (primo giro) di ogni sezione del prompt utente
+PROMPT_SECTIONS = (
+    # placeholder, priorità, quota, token minimi
+    ("PR_BODY", 0, 0.10, 0),
+    ("COMMIT_SUBJECTS", 1, 0.05, 0),
+    ("UNIFIED_DIFF", 2, 0.60, 0),
+    ("REPOSITORY_CONTEXT", 3, 0.25, 64),
+)
+
+# Sezioni di documentazione più pertinenti al diff incluse come contesto (vedi tools/ci/doc_context_index.py)
+CONTEXT_TOP_SECTIONS = int(os.environ.get("CONTEXT_TOP_SECTIONS", "12"))
+
+# Map-reduce sui diff grandi: "auto" (solo se il diff non entra nella sua quota), "always" o "never"
+MAP_REDUCE_MODE = os.environ.get("DOC_AUTOPILOT_MAP_REDUCE", "auto").lower()
+MAP_CHUNK_TOKENS = int(os.environ.get("MAP_CHUNK_TOKENS", "6000"))
+MAP_SUMMARY_TOKENS = int(os.environ.get("MAP_SUMMARY_TOKENS", "400"))
+MAP_CONCURRENCY = int(os.environ.get("MAP_CONCURRENCY", "4"))
+# token al minuto concessi al modello (la fase map resta sotto questa soglia)
+MODEL_TPM = int(os.environ.get("MODEL_TPM", "200000"))
+
+# Cache delle risposte del modello per hash di prompt e modello ("0" per disattivarla)
+RESPONSE_CACHE_ENABLED = os.environ.get("DOC_AUTOPILOT_CACHE", "1") != "0"
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get("DOC_AUTOPILOT_CACHE_MAX_ENTRIES", "64"))
 
 # Pattern ammessi per patch di documentazione (tutto il resto viene scartato)
 ALLOWED_GLOBS = [
@@ -77,18 +102,23 @@ def run_command(args: List[str], *, cwd: Path | None = None, check: bool = True,
     return result.returncode, result.stdout, result.stderr
 
 
+def autopilot_state_dir() -> Path:
+    """Directory di stato tra le esecuzioni (cache di Actions): dentro `.git`, mai committata."""
+    override = os.environ.get("DOC_AUTOPILOT_STATE_DIR")
+    if override:
+        return Path(override)
+    code, git_dir, _ = run_command(["git", "rev-parse", "--absolute-git-dir"], cwd=REPO_ROOT, check=False)
+    return (Path(git_dir.strip()) if code == 0 and git_dir.strip() else REPO_ROOT / ".git") / "doc-autopilot"
+
+
 def truncate(text: str, limit: int) -> str:
     if len(text) <= limit:
         return text
     return text[: limit - 3] + "..."
 
 
-def shrink_prompt(user_prompt: str, factor: float) -> str:
-    """Ritaglia il prompt per ridurre i token mantenendo struttura e contesto minimo."""
-    keep = max(1200, int(len(user_prompt) * factor))
-    if len(user_prompt) <= keep:
-        return user_prompt
-    return user_prompt[:keep] + "\n\n[...prompt truncated to reduce tokens...]\n"
+def model_name() -> str:
+    return os.environ.get("MODEL", "gpt-4o-mini")
 
 
 def load_prompt_template(path: Path) -> str:
@@ -111,6 +141,46 @@ def render_user_prompt(template: str, values: Dict[str, str]) -> str:
         prompt = prompt.replace(f"{{{{{key}}}}}", value)
     return prompt
 
+def build_user_prompt(
+    template: str,
+    values: Dict[str, str],
+    context_sections: List[str],
+    budget: int,
+) -> Tuple[str, List[str]]:
+    """Prompt utente entro `budget` token e nomi delle sezioni che è stato necessario tagliare.
+
+    `values` contiene tutti i placeholder tranne REPOSITORY_CONTEXT, costruito da
+    `context_sections` (in ordine di priorità) con una quota equa per sezione.
+    """
+    model = model_name()
+    names = [name for name, *_ in PROMPT_SECTIONS]
+    skeleton = render_user_prompt(template, {**values, **{name: "" for name in names}})
+    available = max(0, budget - count_tokens(skeleton, model))
+    texts = {**{name: values.get(name, "") for name in names}, "REPOSITORY_CONTEXT": "\n\n".join(context_sections)}
+    sections = [
+        Section(name, texts[name], priority, share, min_tokens)
+        for name, priority, share, min_tokens in PROMPT_SECTIONS
+    ]
+    granted = allocate(sections, available, model)
+    needs = {section.name: count_tokens(section.text, model) for section in sections}
+
+    fitted = {name: truncate_tokens(texts[name], granted[name], model) for name in names}
+    if 0 < granted["REPOSITORY_CONTEXT"] < needs["REPOSITORY_CONTEXT"]:
+        # ogni documento riceve una quota equa invece di perdere in blocco gli ultimi
+        separator = count_tokens("\n\n", model)
+        shares = fair_share(
+            [count_tokens(section, model) for section in context_sections],
+            granted["REPOSITORY_CONTEXT"] - separator * len(context_sections),
+        )
+        fitted["REPOSITORY_CONTEXT"] = "\n\n".join(
+            piece
+            for piece in (truncate_tokens(section, share, model) for section, share in zip(context_sections, shares))
+            if piece
+        )
+    truncated = [name for name in names if granted[name] < needs[name]]
+    return render_user_prompt(template, {**values, **fitted}), truncated
+
+
 # --------------------------------------------------------------------------------------
 # GitHub event / REST helpers
 # --------------------------------------------------------------------------------------
@@ -123,35 +193,15 @@ def load_event() -> Dict | None:
         return json.load(handle)
 
 
-def gh_get(url: str, token: str, *, params: Dict[str, Any] | None = None, max_wait: int = 300) -> Dict:
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Accept": "application/vnd.github+json",
-        "X-GitHub-Api-Version": "2022-11-28",
-        "User-Agent": "doc-autopilot-ci",
-    }
-    while True:
-        r = requests.get(url, headers=headers, params=params, timeout=60)
-        if r.status_code == 403 and "rate limit" in r.text.lower():
-            reset = int(r.headers.get("x-ratelimit-reset", "0"))
-            now = int(time.time())
-            wait = max(5, min(max_wait, reset - now + 2)) if reset > now else 60
-            print(f"[doc-autopilot] Rate limit hit. Sleeping {wait}s…", file=sys.stderr)
-            time.sleep(wait)
-            continue
-        r.raise_for_status()
-        return r.json()
+def gh_get(url: str, token: str, *, params: Dict[str, Any] | None = None) -> Dict:
+    # sessione condivisa: keep-alive, ETag e attese sui rate limit (vedi tools/github_http.py)
+    r = shared_client(token, user_agent="doc-autopilot-ci").get(url, params=params, timeout=60)
+    r.raise_for_status()
+    return r.json()
 
 
 def gh_post_or_patch(url: str, token: str, payload: Dict[str, Any], method: str = "POST") -> Dict:
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Accept": "application/vnd.github+json",
-        "X-GitHub-Api-Version": "2022-11-28",
-        "User-Agent": "doc-autopilot-ci",
-    }
-    func = requests.post if method.upper() == "POST" else requests.patch
-    r = func(url, headers=headers, json=payload, timeout=60)
+    r = shared_client(token, user_agent="doc-autopilot-ci").request(method, url, json=payload, timeout=60)
     if r.status_code >= 400:
         raise RuntimeError(f"GitHub API error {r.status_code}: {truncate(r.text, 800)}")
     return r.json()
@@ -177,37 +227,22 @@ def load_pr_from_event_or_api(args) -> Dict:
 # Repository context / diff
 # --------------------------------------------------------------------------------------
 
-def collect_repository_context(touched_modules: Iterable[str]) -> str:
-    sections: List[str] = []
-    for relative in SUPPORTED_DOC_FILES:
-        path = REPO_ROOT / relative
-        if path.exists():
-            try:
-                content = path.read_text(encoding="utf-8")
-            except UnicodeDecodeError:
-                continue
-            sections.append(f"### {relative}\n" + truncate(content, MAX_CONTEXT_CHARS // 6))
-    adr_dir = REPO_ROOT / DOC_ADR_DIR
-    if adr_dir.exists():
-        adr_files = sorted([p for p in adr_dir.glob("ADR-*.md") if p.is_file()])
-        listings: List[str] = []
-        for adr_file in adr_files:
-            try:
-                head = adr_file.read_text(encoding="utf-8").splitlines()[:40]
-                listings.append(f"#### {DOC_ADR_DIR / adr_file.name}\n" + "\n".join(head))
-            except UnicodeDecodeError:
-                continue
-        if listings:
-            sections.append(f"### {DOC_ADR_DIR}/\n" + "\n\n".join(listings))
-    for module in sorted(set(touched_modules)):
-        module_readme = REPO_ROOT / "modules" / module / "README.md"
-        if module_readme.exists():
-            try:
-                content = module_readme.read_text(encoding="utf-8")
-            except UnicodeDecodeError:
-                continue
-            sections.append(f"### modules/{module}/README.md\n" + truncate(content, MAX_CONTEXT_CHARS // 6))
-    return "\n\n".join(sections)
+def collect_repository_context_sections(touched_modules: Iterable[str], diff_text: str = "") -> List[str]:
+    """Sezioni di documentazione più pertinenti al diff, dalla più rilevante.
+
+    L'indice invertito resta nella directory di stato e viene aggiornato solo per i documenti
+    cambiati; le sezioni dei README dei moduli toccati hanno un punteggio maggiorato. Senza
+    corrispondenze si usa l'inizio del README principale.
+    """
+    index = DocContextIndex.load_or_build(REPO_ROOT, autopilot_state_dir() / "context-index.json")
+    boost_paths = [f"modules/{module}/README.md" for module in sorted(set(touched_modules))]
+    ranked = index.rank(query_terms_from_diff(diff_text), CONTEXT_TOP_SECTIONS, boost_paths)
+    if not ranked:
+        ranked = index.rank(query_terms_from_diff(""), min(CONTEXT_TOP_SECTIONS, 2), ["README.md"])
+    return [
+        f"### {section.path}" + ("" if section.heading == section.path else f" — {section.heading}") + f"\n{section.text}"
+        for section in ranked
+    ]
 
 
 def get_touched_modules_from_diff(diff_text: str) -> List[str]:
@@ -227,10 +262,8 @@ def fetch_branches(base_ref: str) -> None:
 
 
 def build_diff(base_ref: str) -> str:
+    # diff completo: il taglio avviene in token, in build_user_prompt
     _, diff_output, _ = run_command(["git", "diff", f"origin/{base_ref}...HEAD"], cwd=REPO_ROOT)
-    diff_output = truncate(diff_output, MAX_DIFF_CHARS)
-    if len(diff_output) >= MAX_DIFF_CHARS:
-        diff_output += "\n\n[Note: unified diff truncated]\n"
     return diff_output
 
 
@@ -239,6 +272,119 @@ def collect_commit_subjects(max_count: int = 10) -> str:
     _, output, _ = run_command(["git", "log", "--pretty=format:%s", "HEAD", f"-n{max_count}"], cwd=REPO_ROOT)
     return output.strip()
 
+# --------------------------------------------------------------------------------------
+# Diff map-reduce (PR grandi)
+# --------------------------------------------------------------------------------------
+
+DIFF_FILE_SPLIT_RE = re.compile(r"^(?=diff --git )", re.M)
+HUNK_SPLIT_RE = re.compile(r"^(?=@@ )", re.M)
+
+MAP_SYSTEM_PROMPT = (
+    "You summarise one chunk of a pull request diff for a documentation reviewer. "
+    "For every file list what changed in behaviour, public APIs, configuration, security, "
+    "testing and observability, and flag breaking changes or migrations. "
+    "Plain text bullets, no code, no speculation beyond the diff."
+)
+
+
+@dataclass
+class DiffChunk:
+    paths: List[str]
+    text: str
+
+
+def split_diff(diff_text: str, limit: int | None = None) -> List[DiffChunk]:
+    """Divide il diff sui confini `diff --git` e, per file troppo grandi, sui confini `@@`.
+
+    `limit` è in token. Ogni pezzo di un file spezzato ripete l'header del file; i pezzi
+    consecutivi vengono poi accorpati finché restano sotto `limit`. Un singolo hunk più grande
+    del limite viene troncato.
+    """
+    limit = limit or MAP_CHUNK_TOKENS
+    model = model_name()
+    pieces: List[Tuple[str, str, int]] = []
+    for file_diff in DIFF_FILE_SPLIT_RE.split(diff_text):
+        if not file_diff.strip():
+            continue
+        m = PATCH_DIFF_HEADER.match(file_diff.split("\n", 1)[0])
+        path = m.group(2) if m else "(unknown)"
+        tokens = count_tokens(file_diff, model)
+        if tokens <= limit:
+            pieces.append((path, file_diff, tokens))
+            continue
+        parts = HUNK_SPLIT_RE.split(file_diff)
+        header, hunks = parts[0], parts[1:]
+        header_tokens = count_tokens(header, model)
+        room = max(1, limit - header_tokens)
+        current, current_tokens = "", 0
+        for hunk in hunks or [file_diff[len(header):]]:
+            hunk_tokens = count_tokens(hunk, model)
+            if hunk_tokens > room:
+                hunk = truncate_tokens(hunk, room, model, marker="\n[hunk truncated]\n")
+                hunk_tokens = count_tokens(hunk, model)
+            if current and current_tokens + hunk_tokens > room:
+                pieces.append((path, header + current, header_tokens + current_tokens))
+                current, current_tokens = "", 0
+            current += hunk
+            current_tokens += hunk_tokens
+        pieces.append((path, header + current, header_tokens + current_tokens))
+
+    chunks: List[DiffChunk] = []
+    chunk_tokens = 0
+    for path, text, tokens in pieces:
+        if chunks and chunk_tokens + tokens <= limit:
+            last = chunks[-1]
+            last.text += text
+            chunk_tokens += tokens
+            if last.paths[-1] != path:
+                last.paths.append(path)
+        else:
+            chunks.append(DiffChunk([path], text))
+            chunk_tokens = tokens
+    return chunks
+
+
+def summarise_diff_chunks(chunks: List[DiffChunk], *, limiter: SlidingWindowLimiter | None = None) -> List[str]:
+    """Fase map: un riassunto per chunk, in parallelo e sotto il budget di token al minuto."""
+    limiter = limiter or SlidingWindowLimiter(MODEL_TPM)
+
+    def summarise(chunk: DiffChunk) -> str:
+        model = model_name()
+        key = response_cache_key("map", MAP_SYSTEM_PROMPT, chunk.text, model)
+        cached = load_cached_response(key)
+        if cached and cached.get("summary"):
+            return cached["summary"]
+        limiter.acquire(count_tokens(MAP_SYSTEM_PROMPT, model) + count_tokens(chunk.text, model) + MAP_SUMMARY_TOKENS)
+        try:
+            summary = call_model_text(MAP_SYSTEM_PROMPT, chunk.text, max_tokens=MAP_SUMMARY_TOKENS)
+        except Exception as e:  # noqa: BLE001
+            print(f"[doc-autopilot] Map step failed for {chunk.paths}: {e}", file=sys.stderr)
+            summary = ""
+        if summary:
+            store_cached_response(key, {"summary": summary})
+        return summary or "(summary unavailable; files changed: " + ", ".join(chunk.paths) + ")"
+
+    with ThreadPoolExecutor(max_workers=max(1, min(MAP_CONCURRENCY, len(chunks)))) as pool:
+        return list(pool.map(summarise, chunks))
+
+
+def map_reduce_diff(diff_text: str, *, limiter: SlidingWindowLimiter | None = None) -> str:
+    """Sostituisce il diff completo con i riassunti per chunk, da passare alla chiamata reduce.
+
+    `limiter` è il budget di token al minuto dell'esecuzione, da condividere con la chiamata reduce.
+    """
+    chunks = split_diff(diff_text)
+    summaries = summarise_diff_chunks(chunks, limiter=limiter)
+    blocks = [
+        f"### Chunk {index}/{len(chunks)}: {', '.join(chunk.paths)}\n{summary}"
+        for index, (chunk, summary) in enumerate(zip(chunks, summaries), start=1)
+    ]
+    note = (
+        f"[Large diff: ~{count_tokens(diff_text, model_name())} tokens across {len(chunks)} chunk(s). "
+        "Per-chunk summaries follow instead of the raw diff.]"
+    )
+    return note + "\n\n" + "\n\n".join(blocks)
+
 # --------------------------------------------------------------------------------------
 # Model calls + JSON handling (robust)
 # --------------------------------------------------------------------------------------
@@ -281,10 +427,60 @@ def _parse_json_or_raise(content: str) -> Dict[str, Any]:
     return json.loads(cleaned)
 
 
-def call_model(system_prompt: str, user_prompt: str) -> Dict:
+def _openai_client():
+    api_key = os.environ.get("OPENAI_API_KEY")
+    if not api_key:
+        raise RuntimeError("OPENAI_API_KEY is required when CODEX_PROVIDER=openai")
+    try:
+        from openai import OpenAI  # SDK v2+
+    except ImportError as e:
+        raise RuntimeError("Python package 'openai' is not installed. Add `openai>=1.0.0` to tools/ci/requirements.txt.") from e
+
+    client_kwargs: Dict[str, Any] = {"api_key": api_key}
+    base_url = os.environ.get("OPENAI_BASE_URL")
+    if base_url:
+        client_kwargs["base_url"] = base_url
+    return OpenAI(**client_kwargs)
+
+
+def call_model_text(system_prompt: str, user_prompt: str, *, max_tokens: int) -> str:
+    """Risposta testuale libera (usata per i riassunti della fase map); errori al chiamante."""
+    provider = os.environ.get("CODEX_PROVIDER", "openai").lower()
+    model = os.environ.get("MODEL", "gpt-4o-mini")
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt},
+    ]
+    if provider == "openai":
+        resp = _openai_client().chat.completions.create(
+            model=model, temperature=0.0, max_tokens=max_tokens, messages=messages
+        )
+        return (resp.choices[0].message.content or "").strip()
+    if provider in {"http", "self_hosted", "compat"}:
+        return _http_chat_completion(model, messages, temperature=0.0, max_tokens=max_tokens).strip()
+    raise RuntimeError(f"Unsupported CODEX_PROVIDER '{provider}'")
+
+
+def call_model(
+    system_prompt: str,
+    user_prompt: str,
+    *,
+    rebuild: Callable[[float], str],
+    limiter: SlidingWindowLimiter | None = None,
+) -> Dict:
+    """Chiamata principale (JSON).
+
+    `rebuild(scale)` ricostruisce il prompt con il budget ridotto di `scale`, nel caso il modello
+    lo rifiuti comunque. Con `limiter`, ogni richiesta prenota prima i suoi token (prompt e
+    risposta massima) sulla stessa finestra usata dalla fase map.
+    """
     provider = os.environ.get("CODEX_PROVIDER", "openai").lower()
     model = os.environ.get("MODEL", "gpt-4o-mini")  # default più “elastico”
 
+    def _reserve(system: str, prompt: str) -> None:
+        if limiter is not None:
+            limiter.acquire(count_tokens(system, model) + count_tokens(prompt, model) + MAX_OUTPUT_TOKENS)
+
     def _success_empty() -> Dict:
         # Output “valido ma vuoto” per non bloccare il job
         return {
@@ -306,28 +502,18 @@ def call_model(system_prompt: str, user_prompt: str) -> Dict:
         }
 
     if provider == "openai":
-        api_key = os.environ.get("OPENAI_API_KEY")
-        if not api_key:
-            raise RuntimeError("OPENAI_API_KEY is required when CODEX_PROVIDER=openai")
-        try:
-            from openai import OpenAI  # SDK v2+
-        except ImportError as e:
-            raise RuntimeError("Python package 'openai' is not installed. Add `openai>=1.0.0` to tools/ci/requirements.txt.") from e
-
-        client_kwargs: Dict[str, Any] = {"api_key": api_key}
-        base_url = os.environ.get("OPENAI_BASE_URL")
-        if base_url:
-            client_kwargs["base_url"] = base_url
-        client = OpenAI(**client_kwargs)
+        client = _openai_client()
 
         prompt = user_prompt
-        # fino a 3 tentativi: shrink prompt su rate/size, 1 retry di "riparazione JSON"
+        scale = 1.0
+        # fino a 3 tentativi: prompt ricostruito più piccolo su rate/size, 1 retry di "riparazione JSON"
         for attempt in range(3):
             try:
+                _reserve(system_prompt, prompt)
                 resp = client.chat.completions.create(
                     model=model,
                     temperature=float(os.environ.get("TEMPERATURE", "0.2")),
-                    max_tokens=int(os.environ.get("MAX_BODY_CHARS", "2000")),
+                    max_tokens=MAX_OUTPUT_TOKENS,
                     response_format={"type": "json_object"},  # <— forza JSON valido
                     messages=[
                         {"role": "system", "content": system_prompt},
@@ -340,14 +526,17 @@ def call_model(system_prompt: str, user_prompt: str) -> Dict:
                     return _normalize_result(data)
                 except json.JSONDecodeError:
                     # Retry di riparazione: chiedi SOLO JSON minificato
+                    repair_system = "You MUST return a single valid JSON object. No markdown, no comments."
+                    repair_prompt = f"Fix and return a valid JSON object from this text (if needed, complete missing brackets/commas):\n{content}"
+                    _reserve(repair_system, repair_prompt)
                     repair = client.chat.completions.create(
                         model=model,
                         temperature=0.0,
-                        max_tokens=int(os.environ.get("MAX_BODY_CHARS", "2000")),
+                        max_tokens=MAX_OUTPUT_TOKENS,
                         response_format={"type": "json_object"},
                         messages=[
-                            {"role": "system", "content": "You MUST return a single valid JSON object. No markdown, no comments."},
-                            {"role": "user", "content": f"Fix and return a valid JSON object from this text (if needed, complete missing brackets/commas):\n{content}"},
+                            {"role": "system", "content": repair_system},
+                            {"role": "user", "content": repair_prompt},
                         ],
                     )
                     fixed = (repair.choices[0].message.content or "").strip()
@@ -357,7 +546,8 @@ def call_model(system_prompt: str, user_prompt: str) -> Dict:
                 msg = str(e).lower()
                 if "rate limit" in msg or "request too large" in msg or "tpm" in msg:
                     factor = 0.6 if attempt == 0 else 0.4
-                    prompt = shrink_prompt(prompt, factor)
+                    scale *= factor
+                    prompt = rebuild(scale)
                     time.sleep(2 + attempt * 2)
                     continue
                 # altri errori → non bloccare l'intero job, ritorna payload vuoto
@@ -369,18 +559,23 @@ def call_model(system_prompt: str, user_prompt: str) -> Dict:
 
     if provider in {"http", "self_hosted", "compat"}:
         try:
+            _reserve(system_prompt, user_prompt)
             return call_http_compatible_model(model, system_prompt, user_prompt)
         except Exception as e:
             msg = str(e).lower()
             if "rate limit" in msg or "too large" in msg:
-                return call_http_compatible_model(model, system_prompt, shrink_prompt(user_prompt, 0.5))
+                smaller = rebuild(0.5)
+                _reserve(system_prompt, smaller)
+                return call_http_compatible_model(model, system_prompt, smaller)
             print(f"[doc-autopilot] HTTP-compatible model error: {e}", file=sys.stderr)
             return _success_empty()
 
     raise RuntimeError(f"Unsupported CODEX_PROVIDER '{provider}'")
 
 
-def call_http_compatible_model(model: str, system_prompt: str, user_prompt: str) -> Dict:
+def _http_chat_completion(
+    model: str, messages: List[Dict[str, str]], *, temperature: float = 0.2, max_tokens: int | None = None
+) -> str:
     base = os.environ.get("CODEX_API_BASE")
     if not base:
         raise RuntimeError(
@@ -394,17 +589,16 @@ def call_http_compatible_model(model: str, system_prompt: str, user_prompt: str)
     if api_key:
         headers["Authorization"] = f"Bearer {api_key}"
     timeout = float(os.environ.get("CODEX_HTTP_TIMEOUT", "120"))
-    payload = {
+    payload: Dict[str, Any] = {
         "model": model,
-        "temperature": 0.2,
-        "messages": [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ],
+        "temperature": temperature,
+        "messages": messages,
         # Molti gateway già supportano response_format: json_object;
         # se il tuo lo supporta, puoi aggiungere:
         # "response_format": {"type": "json_object"},
     }
+    if max_tokens:
+        payload["max_tokens"] = max_tokens
     response = requests.post(endpoint, json=payload, headers=headers, timeout=timeout)
     if response.status_code >= 400:
         raise RuntimeError(
@@ -421,38 +615,91 @@ def call_http_compatible_model(model: str, system_prompt: str, user_prompt: str)
     message = choices[0].get("message") if isinstance(choices[0], dict) else None
     if not isinstance(message, dict) or "content" not in message:
         raise RuntimeError("Model gateway response missing message content")
+    return message["content"] or ""
+
 
+def call_http_compatible_model(model: str, system_prompt: str, user_prompt: str) -> Dict:
+    content = _http_chat_completion(
+        model,
+        [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ],
+    )
     # Prova a parse-are e normalizzare
-    parsed = _parse_json_or_raise(message["content"])
+    parsed = _parse_json_or_raise(content)
     return _normalize_result(parsed)
 
 # --------------------------------------------------------------------------------------
-# Patch / changelog helpers
+# Cache delle risposte (riesecuzioni con lo stesso diff/contesto non consumano token)
 # --------------------------------------------------------------------------------------
 
-HUNK_HEADER_RE = re.compile(r"^@@ -\d+(?:,\d+)? \+\d+(?:,\d+)? @@")
-PATCH_DIFF_HEADER = re.compile(r"^diff --git a/(.+) b/(.+)$")
+# cambia se cambiano lo schema dei risultati o la loro normalizzazione
+RESPONSE_CACHE_VERSION = "1"
 
 
-def validate_unified_diff(patch_text: str) -> None:
-    lines = [line for line in patch_text.splitlines() if line.strip()]
-    if not lines:
-        raise ValueError("Doc autopilot produced an empty patch")
-    if not any(line.startswith("diff --git ") for line in lines):
-        raise ValueError("Doc autopilot patch is missing the 'diff --git' header")
-    invalid_headers = [line for line in lines if line.startswith("@@") and not HUNK_HEADER_RE.match(line)]
-    if invalid_headers:
-        sample = "\n".join(invalid_headers[:3])
-        raise ValueError(f"Invalid unified diff hunk header(s):\n{sample}")
+def response_cache_key(kind: str, system_prompt: str, user_prompt: str, model: str) -> str:
+    digest = hashlib.sha256()
+    for part in (RESPONSE_CACHE_VERSION, kind, model, system_prompt, user_prompt):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
 
 
-def extract_paths_from_patch(patch_text: str) -> list[str]:
-    paths: list[str] = []
-    for line in patch_text.splitlines():
-        m = PATCH_DIFF_HEADER.match(line)
-        if m:
-            paths.append(m.group(2))  # path del nuovo file (b/)
-    return paths
+def _response_cache_dir() -> Path:
+    return autopilot_state_dir() / "responses"
+
+
+def load_cached_response(key: str) -> Dict[str, Any] | None:
+    if not RESPONSE_CACHE_ENABLED:
+        return None
+    path = _response_cache_dir() / f"{key}.json"
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    os.utime(path)  # ultimo uso: le voci meno recenti vengono rimosse per prime
+    return data if isinstance(data, dict) else None
+
+
+def store_cached_response(key: str, data: Dict[str, Any]) -> None:
+    if not RESPONSE_CACHE_ENABLED:
+        return
+    cache_dir = _response_cache_dir()
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_dir / f"{key}.tmp"
+    tmp_path.write_text(json.dumps(data), encoding="utf-8")
+    os.replace(tmp_path, cache_dir / f"{key}.json")
+    entries = sorted(cache_dir.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True)
+    for stale in entries[max(1, RESPONSE_CACHE_MAX_ENTRIES):]:
+        stale.unlink(missing_ok=True)
+
+
+def call_model_cached(
+    system_prompt: str,
+    user_prompt: str,
+    *,
+    rebuild: Callable[[float], str],
+    limiter: SlidingWindowLimiter | None = None,
+) -> Dict:
+    """`call_model` con cache su disco: a parità di prompt e modello si riusa la risposta precedente."""
+    key = response_cache_key("result", system_prompt, user_prompt, model_name())
+    cached = load_cached_response(key)
+    if cached is not None:
+        print("[doc-autopilot] Model response served from cache.", file=sys.stderr)
+        return _normalize_result(cached)
+    result = call_model(system_prompt, user_prompt, rebuild=rebuild, limiter=limiter)
+    # il risultato vuoto (errori, limiti) non si memorizza: la prossima esecuzione riprova
+    if result != _normalize_result({}):
+        store_cached_response(key, result)
+    return result
+
+
+# --------------------------------------------------------------------------------------
+# Patch / changelog helpers
+# --------------------------------------------------------------------------------------
+
+PATCH_DIFF_HEADER = re.compile(r"^diff --git a/(.+) b/(.+)$")
 
 
 def is_allowed_doc_path(path: str) -> bool:
@@ -463,26 +710,6 @@ def is_allowed_doc_path(path: str) -> bool:
     return False
 
 
-def apply_patch(patch_text: str) -> None:
-    if not patch_text.strip():
-        return
-    try:
-        validate_unified_diff(patch_text)
-    except ValueError as exc:
-        print(f"[doc-autopilot] Invalid patch, skipping: {exc}", file=sys.stderr)
-        return
-    process = subprocess.run(
-        ["git", "apply", "-p0", "--whitespace=fix"],
-        input=patch_text.encode("utf-8"),
-        cwd=REPO_ROOT,
-        capture_output=True,
-    )
-    if process.returncode != 0:
-        stderr = process.stderr.decode("utf-8", errors="replace")
-        print(f"[doc-autopilot] Failed to apply patch, skipping:\n{stderr}", file=sys.stderr)
-        return
-
-
 def ensure_changelog_entry(entry: str) -> None:
     entry = entry.strip()
     if not entry:
@@ -519,55 +746,45 @@ def ensure_changelog_entry(entry: str) -> None:
     changelog_path.write_text("\n".join(new_lines).strip() + "\n", encoding="utf-8")
 
 
-def apply_doc_updates(doc_patches: List[Dict], adr_payload: Dict, changelog_entry: str) -> None:
-    changelog_touched = False
-
-    for patch in doc_patches or []:
-        patch_text = (patch or {}).get("patch", "") or ""
-        if not patch_text.strip():
-            continue
-
-        # Filtra per path consentiti
-        paths = extract_paths_from_patch(patch_text)
-        if not paths:
-            print("[doc-autopilot] Skip patch: no diff headers found", file=sys.stderr)
-            continue
-        if not all(is_allowed_doc_path(p) for p in paths):
-            print(f"[doc-autopilot] Skip patch touching non-doc files: {paths}", file=sys.stderr)
-            continue
-
-        # Verifica esistenza target (consenti nuovi file in docs/** e docs/ADR/**)
-        missing = []
-        for p in paths:
-            tgt = REPO_ROOT / p
-            if not tgt.exists() and not (p.startswith("docs/") or p.startswith(str(DOC_ADR_DIR))):
-                missing.append(p)
-        if missing:
-            print(f"[doc-autopilot] Skip patch: target files not found {missing}", file=sys.stderr)
-            continue
-
-        apply_patch(patch_text)
-        if any(p.endswith("CHANGELOG.md") for p in paths) or "CHANGELOG.md" in patch_text:
-            changelog_touched = True
+def apply_doc_updates(doc_patches: List[Dict], adr_payload: Dict, changelog_entry: str) -> List[PatchResult]:
+    """Applica patch di documentazione e ADR in un solo `git apply` (vedi tools/ci/doc_patches.py).
 
-    # ADR proposta dal modello
+    Restituisce l'esito di ogni patch; la voce di CHANGELOG viene aggiunta in coda se nessuna
+    patch applicata ha già modificato il CHANGELOG.
+    """
+    patches = [
+        (f"doc_patches[{position}]", (patch or {}).get("patch", "") or "")
+        for position, patch in enumerate(doc_patches or [])
+    ]
+    patches = [(source, text) for source, text in patches if text.strip()]
     adr_patch = (adr_payload or {}).get("patch", "") or ""
     if adr_patch.strip():
-        adr_paths = extract_paths_from_patch(adr_patch)
-        if adr_paths and all(is_allowed_doc_path(p) for p in adr_paths):
-            apply_patch(adr_patch)
-        else:
-            print(f"[doc-autopilot] Skip ADR patch (paths not allowed): {adr_paths}", file=sys.stderr)
+        patches.append(("adr", adr_patch))
+
+    results = apply_patches(patches, REPO_ROOT, is_allowed=is_allowed_doc_path, new_file_prefixes=("docs/",))
+    for result in results:
+        print(f"[doc-autopilot] Patch result: {json.dumps(result.to_dict())}", file=sys.stderr)
 
     # Se non abbiamo toccato il CHANGELOG via patch ma c'è una voce, aggiungila in append
+    changelog_touched = any(r.accepted and any(p.endswith("CHANGELOG.md") for p in r.paths) for r in results)
     if changelog_entry.strip() and not changelog_touched:
         ensure_changelog_entry(changelog_entry)
+    return results
 
 # --------------------------------------------------------------------------------------
 # PR comment
 # --------------------------------------------------------------------------------------
 
-def format_comment(data: Dict) -> str:
+def format_patch_results(results: List[PatchResult]) -> str:
+    if not results:
+        return "None proposed"
+    applied = sum(1 for r in results if r.accepted)
+    lines = [f"{applied} applied, {len(results) - applied} rejected"]
+    lines += [f"  - `{r.source}` ({', '.join(r.paths) or 'no paths'}): {r.reason}" for r in results if not r.accepted]
+    return "\n".join(lines)
+
+
+def format_comment(data: Dict, patch_results: List[PatchResult] | None = None) -> str:
     checklist_lines = [
         f"- [{'x' if (item.get('status') == 'done' or item.get('done') is True) else ' '}] {item.get('item')} ({item.get('status', 'todo')})"
         for item in data.get("checklist", [])
@@ -600,19 +817,71 @@ def format_comment(data: Dict) -> str:
         f"**Observability updates:** {observability or 'None'}",
         f"**Labels:** {labels}",
         f"**Reviewers:** {reviewers}",
+        f"**Doc patches:** {format_patch_results(patch_results or [])}",
         "**Checklist:**",
         checklist_block,
     ]
     return "\n\n".join(lines)
 
 
+def _comment_cache_path() -> Path:
+    return autopilot_state_dir() / "comment-ids.json"
+
+
+def load_cached_comment_id(repo: str, pr_number: int) -> str | None:
+    try:
+        data = json.loads(_comment_cache_path().read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    value = data.get(f"{repo}#{pr_number}") if isinstance(data, dict) else None
+    return str(value) if value else None
+
+
+def store_cached_comment_id(repo: str, pr_number: int, comment_id: str | None) -> None:
+    path = _comment_cache_path()
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+        if not isinstance(data, dict):
+            data = {}
+    except (OSError, ValueError):
+        data = {}
+    key = f"{repo}#{pr_number}"
+    if comment_id:
+        data[key] = str(comment_id)
+    else:
+        data.pop(key, None)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data, indent=2, sort_keys=True), encoding="utf-8")
+
+
+def _page_number(url: str | None) -> int | None:
+    match = re.search(r"[?&]page=(\d+)", url or "")
+    return int(match.group(1)) if match else None
+
+
+def iter_comments_newest_first(repo: str, pr_number: int, token: str, per_page: int = 100) -> Iterable[Dict]:
+    """Commenti del PR dal più recente.
+
+    L'API li restituisce solo in ordine di creazione: la prima pagina fornisce il link `last`,
+    poi le pagine si leggono a ritroso, ciascuna invertita. Chi consuma può fermarsi al primo
+    risultato utile senza scaricare il resto.
+    """
+    client = shared_client(token, user_agent="doc-autopilot-ci")
+    url = f"https://api.github.com/repos/{repo}/issues/{pr_number}/comments"
+    first = client.get(url, params={"per_page": per_page, "page": 1}, timeout=60)
+    first.raise_for_status()
+    last_page = _page_number(((first.links or {}).get("last") or {}).get("url")) or 1
+    for page in range(last_page, 1, -1):
+        r = client.get(url, params={"per_page": per_page, "page": page}, timeout=60)
+        r.raise_for_status()
+        yield from reversed(r.json() or [])
+    yield from reversed(first.json() or [])
+
+
 def fetch_existing_comment_id(pr: Dict, token: str, repo: str) -> str | None:
-    url = f"https://api.github.com/repos/{repo}/issues/{pr['number']}/comments"
-    comments = gh_get(url, token)
-    if isinstance(comments, list):
-        for c in comments:
-            if isinstance(c, dict) and COMMENT_MARKER in (c.get("body") or ""):
-                return str(c.get("id"))
+    for c in iter_comments_newest_first(repo, pr["number"], token):
+        if isinstance(c, dict) and COMMENT_MARKER in (c.get("body") or ""):
+            return str(c.get("id"))
     return None
 
 
@@ -624,13 +893,27 @@ def post_comment(pr: Dict, body: str) -> None:
     repo = os.environ.get("GITHUB_REPOSITORY")
     if not repo:
         raise RuntimeError("GITHUB_REPOSITORY env var missing")
+
+    # commento già trovato in un'esecuzione precedente: PATCH diretto, senza elencare i commenti
+    cached_id = load_cached_comment_id(repo, pr["number"])
+    if cached_id:
+        url = f"https://api.github.com/repos/{repo}/issues/comments/{cached_id}"
+        r = shared_client(token, user_agent="doc-autopilot-ci").patch(url, json={"body": body}, timeout=60)
+        if r.status_code < 400:
+            return
+        if r.status_code != 404:
+            raise RuntimeError(f"GitHub API error {r.status_code}: {truncate(r.text, 800)}")
+        # commento cancellato: si torna alla ricerca
+        store_cached_comment_id(repo, pr["number"], None)
+
     existing_id = fetch_existing_comment_id(pr, token, repo)
     if existing_id:
         url = f"https://api.github.com/repos/{repo}/issues/comments/{existing_id}"
         gh_post_or_patch(url, token, {"body": body}, method="PATCH")
     else:
         url = f"https://api.github.com/repos/{repo}/issues/{pr['number']}/comments"
-        gh_post_or_patch(url, token, {"body": body}, method="POST")
+        existing_id = str(gh_post_or_patch(url, token, {"body": body}, method="POST").get("id") or "")
+    store_cached_comment_id(repo, pr["number"], existing_id or None)
 
 # --------------------------------------------------------------------------------------
 # Main
@@ -663,36 +946,55 @@ def main() -> None:
     base_ref = pr["base"]["ref"]
 
     fetch_branches(base_ref)
-    diff_text = build_diff(base_ref)
+    full_diff = build_diff(base_ref)
     commit_subjects = collect_commit_subjects()
-    touched_modules = get_touched_modules_from_diff(diff_text)
-    repository_context = collect_repository_context(touched_modules)
-
-    pr_body = pr.get("body") or ""
-    user_prompt = render_user_prompt(
-        load_prompt_template(USER_PROMPT_PATH),
-        {
-            "PR_NUMBER": str(pr["number"]),
-            "PR_TITLE": pr["title"],
-            "PR_AUTHOR": pr["user"]["login"],
-            "BASE_BRANCH": base_ref,
-            "HEAD_BRANCH": head_ref,
-            "PR_HTML_URL": pr["html_url"],
-            "PR_BODY": truncate(pr_body, MAX_BODY_CHARS),
-            "COMMIT_SUBJECTS": commit_subjects,
-            "UNIFIED_DIFF": diff_text,
-            "REPOSITORY_CONTEXT": truncate(repository_context, MAX_CONTEXT_CHARS),
-        },
-    )
+    touched_modules = get_touched_modules_from_diff(full_diff)
+    context_sections = collect_repository_context_sections(touched_modules, full_diff)
 
     system_prompt = load_prompt_template(SYSTEM_PROMPT_PATH)
-    model_output = call_model(system_prompt, user_prompt)
+    template = load_prompt_template(USER_PROMPT_PATH)
+    # il budget del prompt utente è quello totale meno il prompt di sistema
+    user_budget = PROMPT_TOKEN_BUDGET - count_tokens(system_prompt, model_name())
+    values = {
+        "PR_NUMBER": str(pr["number"]),
+        "PR_TITLE": pr["title"],
+        "PR_AUTHOR": pr["user"]["login"],
+        "BASE_BRANCH": base_ref,
+        "HEAD_BRANCH": head_ref,
+        "PR_HTML_URL": pr["html_url"],
+        "PR_BODY": pr.get("body") or "",
+        "COMMIT_SUBJECTS": commit_subjects,
+        "UNIFIED_DIFF": full_diff,
+    }
+    user_prompt, truncated = build_user_prompt(template, values, context_sections, user_budget)
+    # un solo budget di token al minuto per l'esecuzione: fase map e chiamata principale
+    limiter = SlidingWindowLimiter(MODEL_TPM)
+    if full_diff.strip() and (
+        MAP_REDUCE_MODE == "always" or (MAP_REDUCE_MODE == "auto" and "UNIFIED_DIFF" in truncated)
+    ):
+        # PR grande: il modello vede tutti i file tramite i riassunti invece di un diff troncato
+        values["UNIFIED_DIFF"] = map_reduce_diff(full_diff, limiter=limiter)
+        user_prompt, truncated = build_user_prompt(template, values, context_sections, user_budget)
+    if truncated:
+        print(f"[doc-autopilot] Trimmed to the token budget: {', '.join(truncated)}", file=sys.stderr)
+
+    model_output = call_model_cached(
+        system_prompt,
+        user_prompt,
+        rebuild=lambda scale: build_user_prompt(template, values, context_sections, int(user_budget * scale))[0],
+        limiter=limiter,
+    )
 
-    apply_doc_updates(model_output.get("doc_patches", []), model_output.get("adr", {}), model_output.get("changelog_entry", ""))
+    patch_results = apply_doc_updates(
+        model_output.get("doc_patches", []), model_output.get("adr", {}), model_output.get("changelog_entry", "")
+    )
 
-    comment_body = format_comment(model_output)
+    comment_body = format_comment(model_output, patch_results)
     post_comment(pr, comment_body)
 
+    token = args.token or os.environ.get("GITHUB_TOKEN")
+    if token:
+        print(f"[doc-autopilot] GitHub API: {shared_client(token, user_agent='doc-autopilot-ci').metrics.summary()}", file=sys.stderr)
     print("Doc autopilot completed successfully")
 
 
@@ -0,0 +1,102 @@
+"""Budget di token per i prompt del doc autopilot.
+
+I token si contano con `tiktoken` quando è installato (encoding del modello, altrimenti
+`o200k_base`); senza, una stima prudente di 3,5 caratteri per token, che sovrastima
+leggermente per non superare i limiti del modello.
+
+Il budget si divide tra sezioni con una priorità e una quota massima: prima ogni sezione
+riceve fino alla sua quota, in ordine di priorità; i token avanzati vanno poi, sempre in ordine
+di priorità, alle sezioni che ne chiedono ancora. Le sezioni vengono tagliate in coda al
+proprio testo, mai a metà del prompt.
+"""
+from __future__ import annotations
+
+import functools
+import math
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+CHARS_PER_TOKEN_ESTIMATE = 3.5
+TRUNCATION_MARKER = "\n[...truncated to fit the token budget...]\n"
+
+
+@functools.lru_cache(maxsize=None)
+def _encoding(model: Optional[str]):
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model or "")
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    if not text:
+        return 0
+    encoding = _encoding(model)
+    if encoding is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN_ESTIMATE)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int, model: Optional[str] = None, marker: str = TRUNCATION_MARKER) -> str:
+    """Taglia `text` (marker compreso) a `max_tokens`; stringa vuota se non c'è spazio per il marker."""
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    room = max_tokens - count_tokens(marker, model)
+    if room <= 0:
+        return ""
+    encoding = _encoding(model)
+    if encoding is None:
+        head = text[: int(room * CHARS_PER_TOKEN_ESTIMATE)]
+    else:
+        head = encoding.decode(encoding.encode(text, disallowed_special=())[:room])
+    return head + marker
+
+
+@dataclass
+class Section:
+    name: str
+    text: str
+    priority: int  # 0 = più importante
+    share: float = 1.0  # quota massima del budget nel primo giro
+    min_tokens: int = 0  # sotto questa soglia la sezione viene omessa
+
+
+def allocate(sections: Sequence[Section], budget: int, model: Optional[str] = None) -> Dict[str, int]:
+    """Token assegnati a ogni sezione; se tutto entra nel budget ognuna riceve quanto chiede."""
+    needs = {s.name: count_tokens(s.text, model) for s in sections}
+    if sum(needs.values()) <= budget:
+        return dict(needs)
+    ordered = sorted(sections, key=lambda s: s.priority)
+    granted = {s.name: 0 for s in sections}
+    remaining = max(0, budget)
+    for s in ordered:
+        give = min(needs[s.name], int(budget * s.share), remaining)
+        granted[s.name] = give
+        remaining -= give
+    for s in ordered:
+        if remaining <= 0:
+            break
+        give = min(needs[s.name] - granted[s.name], remaining)
+        granted[s.name] += give
+        remaining -= give
+    for s in ordered:
+        if granted[s.name] < min(s.min_tokens, needs[s.name]):
+            granted[s.name] = 0
+    return granted
+
+
+def fair_share(needs: Sequence[int], budget: int) -> List[int]:
+    """Divisione equa (water-filling): le richieste piccole sono servite per intero, le altre a pari quota."""
+    granted = [0] * len(needs)
+    remaining = max(0, budget)
+    pending = sorted(range(len(needs)), key=lambda i: needs[i])
+    while pending:
+        quota = remaining // len(pending)
+        index = pending.pop(0)
+        granted[index] = min(needs[index], quota)
+        remaining -= granted[index]
+    return granted
@@ -0,0 +1,78 @@
+import subprocess
+from collections import Counter
+from pathlib import Path
+
+from tools.ci import doc_context_index as index_module
+from tools.ci.doc_context_index import DocContextIndex, query_terms_from_diff, split_sections, terms
+
+
+def _git(repo: Path, *args: str) -> None:
+    subprocess.run(["git", *args], cwd=repo, check=True, capture_output=True)
+
+
+def _docs_repo(tmp_path: Path) -> Path:
+    repo = tmp_path / "repo"
+    (repo / "docs" / "ADR").mkdir(parents=True)
+    (repo / "README.md").write_text("# Momentum\n\nIntro.\n\n## Build\n\nRun make.\n", encoding="utf-8")
+    (repo / "docs" / "OBSERVABILITY.md").write_text(
+        "# Observability\n\n## Metrics\n\nThe MetricsExporter pushes counters.\n\n## Tracing\n\nSpans via OpenTelemetry.\n",
+        encoding="utf-8",
+    )
+    (repo / "docs" / "ADR" / "ADR-001.md").write_text("# ADR-001 Storage\n\nWe use Postgres.\n", encoding="utf-8")
+    (repo / "src.py").write_text("print('not a doc')\n", encoding="utf-8")
+    _git(repo, "init", "-q")
+    _git(repo, "add", ".")
+    return repo
+
+
+def test_terms_split_compound_identifiers() -> None:
+    assert list(terms("MetricsExporter flush_rate")) == ["metricsexporter", "metrics", "exporter", "flush_rate", "flush", "rate"]
+
+
+def test_split_sections_ignores_headings_in_code_fences() -> None:
+    text = "# Title\n\nbody\n\n```sh\n# not a heading\n```\n\n## Next\n\nmore\n"
+    assert [heading for heading, _ in split_sections("docs/X.md", text)] == ["Title", "Next"]
+    assert split_sections(".github/CODEOWNERS", "# owners\n* @team\n") == [(".github/CODEOWNERS", "# owners\n* @team\n")]
+
+
+def test_rank_prefers_sections_matching_the_diff(tmp_path: Path) -> None:
+    repo = _docs_repo(tmp_path)
+    index = DocContextIndex.load_or_build(repo, tmp_path / "index.json")
+    diff = (
+        "diff --git a/src/metrics.py b/src/metrics.py\n"
+        "--- a/src/metrics.py\n+++ b/src/metrics.py\n@@ -1 +1 @@\n"
+        "-exporter = MetricsExporter()\n+exporter = MetricsExporter(interval=5)\n"
+    )
+    ranked = index.rank(query_terms_from_diff(diff), top_k=2)
+    assert [(r.path, r.heading) for r in ranked][0] == ("docs/OBSERVABILITY.md", "Metrics")
+    assert all(r.path != "src.py" for r in ranked)
+    assert index.rank(Counter({"unrelated": 1}), top_k=5) == []
+
+
+def test_index_is_reused_and_only_changed_docs_are_reread(tmp_path: Path, monkeypatch) -> None:
+    repo = _docs_repo(tmp_path)
+    path = tmp_path / "state" / "index.json"
+    assert DocContextIndex.load_or_build(repo, path).files_read == 3
+
+    reads = []
+    original = Path.read_text
+    monkeypatch.setattr(Path, "read_text", lambda self, *a, **k: reads.append(self.name) or original(self, *a, **k))
+    assert DocContextIndex.load_or_build(repo, path).files_read == 0
+    assert reads == ["index.json"]
+
+    (repo / "docs" / "ADR" / "ADR-001.md").write_text("# ADR-001 Storage\n\nWe use SQLite.\n", encoding="utf-8")
+    (repo / "README.md").unlink()
+    _git(repo, "add", "-A")
+    reads.clear()
+    index = DocContextIndex.load_or_build(repo, path)
+    assert index.files_read == 1
+    assert sorted(reads) == ["ADR-001.md", "index.json"]
+    assert "readme" not in index.postings
+    assert [r.path for r in index.rank(Counter({"sqlite": 1}), top_k=3)] == ["docs/ADR/ADR-001.md"]
+    assert index.rank(Counter({"postgres": 1}), top_k=3) == []
+
+
+def test_fingerprints_fall_back_to_stat_outside_git(tmp_path: Path) -> None:
+    (tmp_path / "docs").mkdir()
+    (tmp_path / "docs" / "A.md").write_text("# A\n", encoding="utf-8")
+    assert list(index_module.doc_fingerprints(tmp_path)) == ["docs/A.md"]
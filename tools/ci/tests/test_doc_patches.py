@@ -0,0 +1,101 @@
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from tools.ci.doc_patches import PatchError, apply_patches, parse_patch
+
+
+def _git(repo: Path, *args: str) -> str:
+    return subprocess.run(["git", *args], cwd=repo, check=True, capture_output=True, text=True).stdout
+
+
+@pytest.fixture
+def repo(tmp_path: Path) -> Path:
+    root = tmp_path / "repo"
+    (root / "docs").mkdir(parents=True)
+    (root / "README.md").write_text("# Title\n\nold intro\n", encoding="utf-8")
+    (root / "docs" / "TESTING.md").write_text("# Testing\n\nrun tests\n", encoding="utf-8")
+    (root / "src.py").write_text("x = 1\n", encoding="utf-8")
+    _git(root, "init", "-q")
+    _git(root, "add", ".")
+    _git(root, "-c", "user.name=t", "-c", "user.email=t@t", "commit", "-qm", "init")
+    return root
+
+
+def _modify(path: str, old: str, new: str) -> str:
+    return f"diff --git a/{path} b/{path}\n--- a/{path}\n+++ b/{path}\n@@ -3 +3 @@\n-{old}\n+{new}\n"
+
+
+def _create(path: str, line: str) -> str:
+    return f"diff --git a/{path} b/{path}\nnew file mode 100644\n--- /dev/null\n+++ b/{path}\n@@ -0,0 +1 @@\n+{line}\n"
+
+
+def _allowed(path: str) -> bool:
+    return path.endswith(".md")
+
+
+class CountingRun:
+    def __init__(self) -> None:
+        self.commands = []
+
+    def __call__(self, args, **kwargs):
+        self.commands.append(args[:2] + [a for a in args[2:] if a == "--check"])
+        return subprocess.run(args, **kwargs)
+
+
+def test_parse_patch_reports_files_and_errors() -> None:
+    files = parse_patch("intro text\n" + _modify("README.md", "a", "b") + _create("docs/NEW.md", "hi"))
+    assert [(f.old_path, f.new_path) for f in files] == [("README.md", "README.md"), (None, "docs/NEW.md")]
+    with pytest.raises(PatchError, match="diff --git"):
+        parse_patch("--- a/README.md\n+++ b/README.md\n")
+    with pytest.raises(PatchError, match="invalid hunk header"):
+        parse_patch("diff --git a/README.md b/README.md\n@@ -1,... +1 @@\n")
+
+
+def test_accepted_patches_are_checked_and_applied_once(repo: Path) -> None:
+    run = CountingRun()
+    results = apply_patches(
+        [
+            ("doc_patches[0]", _modify("README.md", "old intro", "new intro")),
+            ("doc_patches[1]", _modify("src.py", "x = 1", "x = 2")),
+            ("doc_patches[2]", _modify("docs/MISSING.md", "a", "b")),
+            ("doc_patches[3]", _modify("README.md", "old intro", "other intro")),
+            ("doc_patches[4]", _modify("docs/TESTING.md", "not there", "b")),
+            ("adr", _create("docs/ADR/ADR-002.md", "# ADR-002")),
+        ],
+        repo,
+        is_allowed=_allowed,
+        run=run,
+    )
+    assert [(r.source, r.accepted) for r in results if r.accepted] == [("doc_patches[0]", True), ("adr", True)]
+    reasons = {r.source: r.reason for r in results}
+    assert reasons["doc_patches[1]"].startswith("paths not allowed")
+    assert reasons["doc_patches[2]"] == "target file not found: docs/MISSING.md"
+    assert reasons["doc_patches[3]"] == "README.md is already patched by doc_patches[0]"
+    assert reasons["doc_patches[4]"].startswith("does not apply:") and "docs/TESTING.md" in reasons["doc_patches[4]"]
+    # un ls-files, due --check (il secondo senza la patch scartata), un solo apply
+    assert run.commands == [["git", "ls-files"], ["git", "apply", "--check"], ["git", "apply", "--check"], ["git", "apply"]]
+    assert (repo / "README.md").read_text(encoding="utf-8") == "# Title\n\nnew intro\n"
+    assert _git(repo, "diff", "--cached", "--name-only").split() == ["README.md", "docs/ADR/ADR-002.md"]
+
+
+def test_failed_batch_apply_rolls_everything_back(repo: Path) -> None:
+    def run(args, **kwargs):
+        if args[:2] == ["git", "apply"] and "--check" not in args:
+            # simula un fallimento a metà: un file già scritto e nell'indice
+            (repo / "README.md").write_text("half applied\n", encoding="utf-8")
+            subprocess.run(["git", "add", "README.md"], cwd=repo, check=True)
+            return subprocess.CompletedProcess(args, 1, "", "error: disk full")
+        return subprocess.run(args, **kwargs)
+
+    results = apply_patches(
+        [("doc_patches[0]", _modify("README.md", "old intro", "new intro")), ("adr", _create("docs/ADR/ADR-002.md", "x"))],
+        repo,
+        is_allowed=_allowed,
+        run=run,
+    )
+    assert not any(r.accepted for r in results)
+    assert all(r.reason.startswith("rolled back") for r in results)
+    assert (repo / "README.md").read_text(encoding="utf-8") == "# Title\n\nold intro\n"
+    assert _git(repo, "status", "--porcelain") == ""
@@ -0,0 +1,285 @@
+from pathlib import Path
+from typing import Dict, List
+
+import pytest
+
+from tools.ci import pr_codex_autopilot as module
+
+
+@pytest.fixture(autouse=True)
+def _state_dir(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    # comment id e cache delle risposte mai nella .git del repository
+    monkeypatch.setenv("DOC_AUTOPILOT_STATE_DIR", str(tmp_path / "state"))
+
+
+class FakeResponse:
+    def __init__(self, payload, status_code: int = 200, links=None) -> None:
+        self._payload = payload
+        self.status_code = status_code
+        self.links = links or {}
+        self.text = ""
+
+    def json(self):
+        return self._payload
+
+    def raise_for_status(self) -> None:
+        return None
+
+
+class FakeGitHub:
+    """Commenti di un PR paginati come l'API (ordine di creazione) e registro delle chiamate."""
+
+    def __init__(self, comments: List[Dict]) -> None:
+        self.comments = comments
+        self.calls: List[tuple] = []
+
+    def get(self, url, params=None, timeout=None):
+        page, per_page = params["page"], params["per_page"]
+        self.calls.append(("GET", page))
+        last = max(1, -(-len(self.comments) // per_page))
+        links = {"last": {"url": f"{url}?per_page={per_page}&page={last}"}} if last > 1 else {}
+        return FakeResponse(self.comments[(page - 1) * per_page : page * per_page], links=links)
+
+    def patch(self, url, json=None, timeout=None):
+        self.calls.append(("PATCH", url.rsplit("/", 1)[-1]))
+        known = {str(c["id"]) for c in self.comments}
+        return FakeResponse({}, status_code=200 if url.rsplit("/", 1)[-1] in known else 404)
+
+    def request(self, method, url, json=None, timeout=None):
+        if method == "PATCH":
+            return self.patch(url, json=json)
+        self.calls.append((method, url))
+        self.comments.append({"id": 9000, "body": json["body"]})
+        return FakeResponse({"id": 9000}, status_code=201)
+
+
+@pytest.fixture()
+def github(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    fake = FakeGitHub([{"id": n, "body": f"comment {n}"} for n in range(1, 251)])
+    monkeypatch.setattr(module, "shared_client", lambda *args, **kwargs: fake)
+    monkeypatch.setenv("DOC_AUTOPILOT_STATE_DIR", str(tmp_path))
+    monkeypatch.setenv("GITHUB_TOKEN", "token")
+    monkeypatch.setenv("GITHUB_REPOSITORY", "owner/repo")
+    return fake
+
+
+def test_locator_reads_newest_page_first_and_stops_at_marker(github: FakeGitHub) -> None:
+    github.comments[150]["body"] = f"{module.COMMENT_MARKER}\nold run"
+
+    found = module.fetch_existing_comment_id({"number": 7}, "token", "owner/repo")
+
+    assert found == "151"
+    # prima pagina per il link "last", poi 3 → 2 e stop: la pagina 1 non viene riletta
+    assert github.calls == [("GET", 1), ("GET", 3), ("GET", 2)]
+
+
+def test_post_comment_caches_id_and_patches_directly(github: FakeGitHub) -> None:
+    module.post_comment({"number": 7}, "body")
+    assert ("POST", "https://api.github.com/repos/owner/repo/issues/7/comments") in github.calls
+    github.calls.clear()
+
+    module.post_comment({"number": 7}, "body v2")
+
+    assert github.calls == [("PATCH", "9000")]
+
+
+def test_deleted_cached_comment_falls_back_to_lookup(github: FakeGitHub) -> None:
+    module.store_cached_comment_id("owner/repo", 7, "12345")
+    github.comments[10]["body"] = module.COMMENT_MARKER
+
+    module.post_comment({"number": 7}, "body")
+
+    assert github.calls[0] == ("PATCH", "12345")
+    assert github.calls[-1] == ("PATCH", "11")
+    assert module.load_cached_comment_id("owner/repo", 7) == "11"
+
+
+def _file_diff(path: str, hunks: int, lines_per_hunk: int = 20) -> str:
+    out = [f"diff --git a/{path} b/{path}", "index 1111111..2222222 100644", f"--- a/{path}", f"+++ b/{path}"]
+    for h in range(hunks):
+        out.append(f"@@ -{h * 100 + 1},{lines_per_hunk} +{h * 100 + 1},{lines_per_hunk} @@")
+        out.extend(f"+line {h}.{n} of {path}" for n in range(lines_per_hunk))
+    return "\n".join(out) + "\n"
+
+
+def test_split_diff_respects_file_and_hunk_boundaries() -> None:
+    diff = _file_diff("src/a.py", 1) + _file_diff("src/big.py", 12) + _file_diff("docs/b.md", 1)
+
+    chunks = module.split_diff(diff, limit=500)
+
+    assert all(module.count_tokens(chunk.text) <= 500 for chunk in chunks)
+    assert all(chunk.text.startswith("diff --git ") for chunk in chunks)
+    big_parts = [chunk for chunk in chunks if "src/big.py" in chunk.paths]
+    assert len(big_parts) > 1
+    assert all("+++ b/src/big.py\n@@ " in chunk.text for chunk in big_parts)
+    # nessuna riga persa né duplicata
+    body = lambda text: [l for l in text.splitlines() if l.startswith("+line")]  # noqa: E731
+    assert sorted(l for chunk in chunks for l in body(chunk.text)) == sorted(body(diff))
+
+
+def test_map_reduce_summarises_every_chunk_concurrently(monkeypatch: pytest.MonkeyPatch) -> None:
+    import threading
+    import time
+
+    seen = []
+    threads = set()
+    lock = threading.Lock()
+
+    def fake_text(system_prompt, user_prompt, *, max_tokens):
+        with lock:
+            seen.append(user_prompt)
+            threads.add(threading.get_ident())
+        time.sleep(0.01)
+        return "summary of " + user_prompt.split("\n", 1)[0]
+
+    monkeypatch.setattr(module, "call_model_text", fake_text)
+    monkeypatch.setattr(module, "MAP_CHUNK_TOKENS", 400)
+    monkeypatch.setattr(module, "MAP_CONCURRENCY", 4)
+    diff = "".join(_file_diff(f"src/f{n}.py", 2) for n in range(12))
+
+    reduced = module.map_reduce_diff(diff)
+
+    chunks = module.split_diff(diff, 400)
+    assert len(chunks) >= 12
+    assert sorted(seen) == sorted(chunk.text for chunk in chunks)
+    assert len(threads) > 1
+    assert all(f"src/f{n}.py" in reduced for n in range(12))
+    assert reduced.startswith("[Large diff:")
+    assert len(reduced) < len(diff)
+
+
+def test_build_user_prompt_fits_budget_and_keeps_every_section(monkeypatch: pytest.MonkeyPatch) -> None:
+    template = "Body:\n{{PR_BODY}}\nCommits:\n{{COMMIT_SUBJECTS}}\nDiff:\n{{UNIFIED_DIFF}}\nContext:\n{{REPOSITORY_CONTEXT}}\nEnd."
+    values = {
+        "PR_BODY": "why " * 50,
+        "COMMIT_SUBJECTS": "feat: x",
+        "UNIFIED_DIFF": "".join(_file_diff(f"src/f{n}.py", 4) for n in range(20)),
+    }
+    context = ["### README.md\n" + "readme " * 2000, "### docs/ADR/ADR-1.md\nshort adr"]
+
+    prompt, truncated = module.build_user_prompt(template, values, context, 3000)
+
+    assert module.count_tokens(prompt) <= 3000
+    assert truncated == ["UNIFIED_DIFF", "REPOSITORY_CONTEXT"]
+    # il taglio avviene dentro le sezioni: struttura e istruzioni finali restano nel prompt
+    assert "\nEnd.\n" in prompt
+    assert "why why" in prompt and "feat: x" in prompt and "short adr" in prompt
+    assert prompt.rstrip().endswith("etc.).")  # guardia DOC ONLY
+
+    small, truncated = module.build_user_prompt(template, {**values, "UNIFIED_DIFF": "tiny"}, context[1:], 3000)
+    assert truncated == [] and "tiny" in small
+
+
+def _same(scale: float) -> str:
+    return "prompt"
+
+
+def test_model_response_is_replayed_from_cache(monkeypatch: pytest.MonkeyPatch) -> None:
+    calls = []
+
+    def fake_call_model(system_prompt, user_prompt, *, rebuild, limiter=None):
+        calls.append(user_prompt)
+        return module._normalize_result({"pr_summary": "ok", "doc_patches": [{"patch": "diff --git a/x b/x"}]})
+
+    monkeypatch.setattr(module, "call_model", fake_call_model)
+
+    first = module.call_model_cached("system", "prompt", rebuild=_same)
+    second = module.call_model_cached("system", "prompt", rebuild=_same)
+    module.call_model_cached("system", "other prompt", rebuild=_same)
+
+    assert first == second and second["doc_patches"] == [{"patch": "diff --git a/x b/x"}]
+    assert calls == ["prompt", "other prompt"]
+    monkeypatch.setenv("MODEL", "another-model")
+    module.call_model_cached("system", "prompt", rebuild=_same)
+    assert len(calls) == 3
+
+
+def test_empty_results_are_not_cached_and_old_entries_are_evicted(monkeypatch: pytest.MonkeyPatch) -> None:
+    results = [module._normalize_result({}), module._normalize_result({"pr_summary": "ok"})]
+    monkeypatch.setattr(module, "call_model", lambda *args, **kwargs: results.pop(0))
+
+    assert module.call_model_cached("s", "p", rebuild=_same)["pr_summary"] == ""
+    assert module.call_model_cached("s", "p", rebuild=_same)["pr_summary"] == "ok"
+    assert module.call_model_cached("s", "p", rebuild=_same)["pr_summary"] == "ok"
+
+    monkeypatch.setattr(module, "RESPONSE_CACHE_MAX_ENTRIES", 3)
+    for n in range(5):
+        module.store_cached_response(f"key{n}", {"n": n})
+    assert len(list((module.autopilot_state_dir() / "responses").glob("*.json"))) == 3
+
+
+def test_context_sections_follow_the_diff(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    repo = tmp_path / "repo"
+    (repo / "docs").mkdir(parents=True)
+    (repo / "modules" / "ledger").mkdir(parents=True)
+    (repo / "README.md").write_text("# Momentum\n\nOverview.\n", encoding="utf-8")
+    (repo / "docs" / "SECURITY.md").write_text("# Security\n\n## Tokens\n\nRotate the signing keys.\n", encoding="utf-8")
+    (repo / "modules" / "ledger" / "README.md").write_text("# Ledger\n\nDouble entry.\n", encoding="utf-8")
+    monkeypatch.setattr(module, "REPO_ROOT", repo)
+    monkeypatch.setattr(module, "CONTEXT_TOP_SECTIONS", 2)
+
+    diff = "diff --git a/auth/keys.py b/auth/keys.py\n+rotate_signing_keys()\n"
+    sections = module.collect_repository_context_sections(["ledger"], diff)
+    assert sorted(s.splitlines()[0] for s in sections) == [
+        "### docs/SECURITY.md — Tokens",
+        "### modules/ledger/README.md — Ledger",
+    ]
+    assert module.collect_repository_context_sections([], "")[0].startswith("### README.md")
+
+
+def test_apply_doc_updates_reports_results_and_appends_changelog(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    import subprocess
+
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "README.md").write_text("# Momentum\n\nold\n", encoding="utf-8")
+    subprocess.run(["git", "init", "-q"], cwd=repo, check=True)
+    subprocess.run(["git", "add", "."], cwd=repo, check=True)
+    monkeypatch.setattr(module, "REPO_ROOT", repo)
+
+    patch = "diff --git a/README.md b/README.md\n--- a/README.md\n+++ b/README.md\n@@ -3 +3 @@\n-old\n+new\n"
+    results = module.apply_doc_updates(
+        [{"patch": patch}, {"patch": patch.replace("README.md", "src/app.py")}, {"patch": ""}],
+        {},
+        "- Documented the new flag",
+    )
+    assert [(r.source, r.accepted) for r in results] == [("doc_patches[0]", True), ("doc_patches[1]", False)]
+    assert (repo / "README.md").read_text(encoding="utf-8").endswith("new\n")
+    assert "- Documented the new flag" in (repo / "CHANGELOG.md").read_text(encoding="utf-8")
+    assert module.format_patch_results(results).splitlines()[0] == "1 applied, 1 rejected"
+
+
+class RecordingLimiter(module.SlidingWindowLimiter):
+    def __init__(self, events: List) -> None:
+        super().__init__(10**9)
+        self.events = events
+
+    def acquire(self, cost: int = 1) -> None:
+        self.events.append(("acquire", cost))
+        super().acquire(cost)
+
+
+def test_reduce_call_reserves_tokens_on_the_map_limiter(monkeypatch: pytest.MonkeyPatch) -> None:
+    events: List = []
+    limiter = RecordingLimiter(events)
+    monkeypatch.setenv("CODEX_PROVIDER", "http")
+    monkeypatch.setenv("MODEL", "gpt-4o-mini")
+    monkeypatch.setattr(module, "MAP_CHUNK_TOKENS", 400)
+    monkeypatch.setattr(module, "MAP_CONCURRENCY", 1)
+    monkeypatch.setattr(module, "call_model_text", lambda system, user, *, max_tokens: "summary")
+
+    def fake_http(model, system_prompt, user_prompt):
+        events.append("reduce")
+        return module._normalize_result({"pr_summary": "ok"})
+
+    monkeypatch.setattr(module, "call_http_compatible_model", fake_http)
+    diff = "".join(_file_diff(f"src/f{n}.py", 2) for n in range(6))
+
+    reduced = module.map_reduce_diff(diff, limiter=limiter)
+    result = module.call_model("system", reduced, rebuild=_same, limiter=limiter)
+
+    chunks = module.split_diff(diff, 400)
+    expected = module.count_tokens("system", "gpt-4o-mini") + module.count_tokens(reduced, "gpt-4o-mini")
+    assert result["pr_summary"] == "ok"
+    assert len([e for e in events if e != "reduce"]) == len(chunks) + 1
+    assert events[-2:] == [("acquire", expected + module.MAX_OUTPUT_TOKENS), "reduce"]
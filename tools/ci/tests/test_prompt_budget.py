@@ -0,0 +1,52 @@
+import pytest
+
+from tools.ci import prompt_budget as module
+
+
+@pytest.fixture(autouse=True)
+def _estimator(monkeypatch: pytest.MonkeyPatch) -> None:
+    # risultati deterministici anche dove tiktoken è installato
+    monkeypatch.setattr(module, "_encoding", lambda model: None)
+
+
+def test_estimator_and_truncation_stay_within_budget() -> None:
+    text = "x" * 3500
+
+    assert module.count_tokens(text) == 1000
+    cut = module.truncate_tokens(text, 100)
+    assert module.count_tokens(cut) <= 100
+    assert cut.endswith(module.TRUNCATION_MARKER)
+    assert module.truncate_tokens(text, 5) == ""
+    assert module.truncate_tokens("short", 100) == "short"
+
+
+def test_allocate_respects_priority_shares_and_redistributes_leftovers() -> None:
+    sections = [
+        module.Section("body", "b" * 35, priority=0, share=0.1),  # 10 token
+        module.Section("diff", "d" * 35_000, priority=1, share=0.6),  # 10k token
+        module.Section("context", "c" * 35_000, priority=2, share=0.3),  # 10k token
+    ]
+
+    granted = module.allocate(sections, 1000)
+
+    assert granted["body"] == 10
+    # la quota non usata dal corpo va alla sezione successiva per priorità
+    assert granted["diff"] == 600 + 90
+    assert granted["context"] == 300
+    assert sum(granted.values()) == 1000
+
+
+def test_allocate_gives_everything_when_it_fits_and_drops_tiny_sections() -> None:
+    small = [module.Section("a", "a" * 35, 0), module.Section("b", "b" * 70, 1)]
+    assert module.allocate(small, 1000) == {"a": 10, "b": 20}
+
+    sections = [
+        module.Section("diff", "d" * 3500, priority=0, share=1.0),
+        module.Section("context", "c" * 3500, priority=1, share=1.0, min_tokens=64),
+    ]
+    assert module.allocate(sections, 1040) == {"diff": 1000, "context": 0}
+
+
+def test_fair_share_serves_small_requests_in_full() -> None:
+    assert module.fair_share([10, 500, 500], 310) == [10, 150, 150]
+    assert module.fair_share([10, 20], 1000) == [10, 20]
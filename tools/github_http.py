@@ -0,0 +1,267 @@
+"""Client HTTP condiviso per le chiamate REST a GitHub degli script sotto `tools/`.
+
+- una `requests.Session` con pool di connessioni e keep-alive, riusabile da più thread;
+- richieste GET condizionali: la risposta con `ETag` resta in una piccola cache LRU e la
+  richiesta successiva allo stesso URL invia `If-None-Match`; un 304 restituisce la copia in
+  cache e non consuma rate limit. Se il chiamante invia già il suo `If-None-Match` (ETag
+  conservati altrove), la cache del client non interviene e il 304 arriva al chiamante;
+- backoff sui limiti di GitHub: `Retry-After` (limite secondario), `x-ratelimit-remaining: 0`
+  con `x-ratelimit-reset` (limite primario, rispettato anche prima della richiesta successiva);
+- metriche: richieste inviate, risposte 304, tentativi ripetuti e tempo speso in attesa.
+
+Le URL relative (`/repos/...`) vengono risolte su `GITHUB_API_URL` (default api.github.com),
+così i test possono puntare il client a un server locale.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_API_URL = "https://api.github.com"
+DEFAULT_USER_AGENT = "momentum-tools"
+# GitHub chiede di attendere almeno un minuto sul limite secondario senza Retry-After.
+SECONDARY_RATE_LIMIT_WAIT = 60.0
+TRANSIENT_STATUSES = frozenset({502, 503, 504})
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+
+@dataclass
+class GitHubHTTPMetrics:
+    requests: int = 0
+    not_modified: int = 0
+    retries: int = 0
+    throttled: int = 0
+    throttled_seconds: float = 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.requests} request(s), {self.not_modified} served from ETag cache, "
+            f"{self.retries} retried, throttled {self.throttled} time(s) for {self.throttled_seconds:.1f}s"
+        )
+
+
+class GitHubHTTPClient:
+    """Sessione GitHub con pool, ETag e gestione dei rate limit.
+
+    `get`/`post`/`patch` hanno la stessa firma di `requests.Session` e restituiscono la
+    `requests.Response` finale: gli errori HTTP non dovuti ai limiti restano al chiamante.
+    """
+
+    def __init__(
+        self,
+        token: Optional[str] = None,
+        *,
+        api_url: Optional[str] = None,
+        user_agent: str = DEFAULT_USER_AGENT,
+        pool_size: int = 10,
+        max_retries: int = 5,
+        max_wait: float = 300.0,
+        etag_cache_size: int = 256,
+        session: Optional[requests.Session] = None,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.api_url = (api_url or os.environ.get("GITHUB_API_URL") or DEFAULT_API_URL).rstrip("/")
+        self.max_retries = max(0, max_retries)
+        self.max_wait = max_wait
+        self.metrics = GitHubHTTPMetrics()
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._etags: "OrderedDict[Tuple[str, Tuple[Tuple[str, str], ...]], requests.Response]" = OrderedDict()
+        self._etag_cache_size = etag_cache_size
+        self._reset_at = 0.0  # epoch del reset quando il limite primario è esaurito
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(1, pool_size))
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+        self.session = session
+        self.session.headers.update(
+            {
+                "Accept": "application/vnd.github+json",
+                "X-GitHub-Api-Version": "2022-11-28",
+                "User-Agent": user_agent,
+            }
+        )
+        if token:
+            self.session.headers["Authorization"] = f"Bearer {token}"
+
+    # -- API pubblica ---------------------------------------------------------------------
+
+    def get(self, url: str, params: Optional[Mapping[str, Any]] = None, **kwargs: Any) -> requests.Response:
+        return self.request("GET", url, params=params, **kwargs)
+
+    def post(self, url: str, json: Any = None, **kwargs: Any) -> requests.Response:
+        return self.request("POST", url, json=json, **kwargs)
+
+    def patch(self, url: str, json: Any = None, **kwargs: Any) -> requests.Response:
+        return self.request("PATCH", url, json=json, **kwargs)
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        params: Optional[Mapping[str, Any]] = None,
+        headers: Optional[Mapping[str, str]] = None,
+        timeout: float = 30,
+        **kwargs: Any,
+    ) -> requests.Response:
+        method = method.upper()
+        if url.startswith("/"):
+            url = self.api_url + url
+        own_etag = any(name.lower() == "if-none-match" for name in (headers or {}))
+        key = _cache_key(url, params) if method == "GET" and not own_etag else None
+        cached = self._cached(key)
+        attempt = 0
+        while True:
+            self._wait_for_reset()
+            request_headers = dict(headers or {})
+            if cached is not None and cached.headers.get("ETag"):
+                request_headers["If-None-Match"] = cached.headers["ETag"]
+            with self._lock:
+                self.metrics.requests += 1
+            try:
+                response = self.session.request(
+                    method, url, params=params, headers=request_headers, timeout=timeout, **kwargs
+                )
+            except (requests.ConnectionError, requests.Timeout):
+                if method not in IDEMPOTENT_METHODS or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                self._backoff(min(self.max_wait, 2.0**attempt), throttled=False)
+                continue
+            self._track_rate_limit(response)
+
+            if response.status_code == 304 and cached is not None:
+                with self._lock:
+                    self.metrics.not_modified += 1
+                    if key in self._etags:
+                        self._etags.move_to_end(key)
+                return cached
+
+            wait = self._throttle_wait(response, attempt)
+            if wait is not None and attempt < self.max_retries:
+                attempt += 1
+                print(
+                    f"[github] Rate limit on {method} {url} (status {response.status_code}). "
+                    f"Sleeping {wait:.0f}s…",
+                    file=sys.stderr,
+                )
+                with self._lock:
+                    self._reset_at = 0.0  # l'attesa copre già il reset indicato dalla risposta
+                self._backoff(wait, throttled=True)
+                continue
+            if (
+                wait is None
+                and response.status_code in TRANSIENT_STATUSES
+                and method in IDEMPOTENT_METHODS
+                and attempt < self.max_retries
+            ):
+                attempt += 1
+                self._backoff(min(self.max_wait, 2.0**attempt), throttled=False)
+                continue
+
+            if key is not None and response.status_code == 200 and response.headers.get("ETag"):
+                self._store(key, response)
+            return response
+
+    # -- rate limit -----------------------------------------------------------------------
+
+    def _throttle_wait(self, response: requests.Response, attempt: int) -> Optional[float]:
+        """Secondi da attendere se la risposta indica un rate limit, altrimenti None."""
+        if response.status_code not in (403, 429):
+            return None
+        headers = response.headers
+        retry_after = headers.get("Retry-After")
+        if retry_after:
+            try:
+                return min(self.max_wait, max(1.0, float(retry_after)))
+            except ValueError:
+                pass
+        if headers.get("x-ratelimit-remaining") == "0":
+            reset = _as_float(headers.get("x-ratelimit-reset"))
+            if reset:
+                return min(self.max_wait, max(1.0, reset - self._clock() + 1))
+        if response.status_code == 429 or "rate limit" in (response.text or "").lower():
+            # limite secondario senza indicazioni: un minuto, poi backoff esponenziale
+            return min(self.max_wait, SECONDARY_RATE_LIMIT_WAIT * (2**attempt))
+        return None
+
+    def _track_rate_limit(self, response: requests.Response) -> None:
+        headers = response.headers
+        if headers.get("x-ratelimit-remaining") == "0":
+            reset = _as_float(headers.get("x-ratelimit-reset"))
+            if reset:
+                with self._lock:
+                    self._reset_at = max(self._reset_at, reset)
+
+    def _wait_for_reset(self) -> None:
+        """Limite primario esaurito da una risposta precedente: si attende il reset prima di inviare."""
+        with self._lock:
+            reset_at = self._reset_at
+            if not reset_at:
+                return
+            self._reset_at = 0.0
+        wait = reset_at - self._clock() + 1
+        if wait > 0:
+            self._backoff(min(self.max_wait, wait), throttled=True, retry=False)
+
+    def _backoff(self, seconds: float, *, throttled: bool, retry: bool = True) -> None:
+        with self._lock:
+            if retry:
+                self.metrics.retries += 1
+            if throttled:
+                self.metrics.throttled += 1
+                self.metrics.throttled_seconds += seconds
+        self._sleep(seconds)
+
+    # -- cache ETag -----------------------------------------------------------------------
+
+    def _cached(self, key: Optional[Tuple[str, Tuple[Tuple[str, str], ...]]]) -> Optional[requests.Response]:
+        if key is None:
+            return None
+        with self._lock:
+            return self._etags.get(key)
+
+    def _store(self, key: Tuple[str, Tuple[Tuple[str, str], ...]], response: requests.Response) -> None:
+        response.content  # legge il corpo: la risposta può essere restituita più volte
+        with self._lock:
+            self._etags[key] = response
+            self._etags.move_to_end(key)
+            while len(self._etags) > self._etag_cache_size:
+                self._etags.popitem(last=False)
+
+
+def _cache_key(url: str, params: Optional[Mapping[str, Any]]) -> Tuple[str, Tuple[Tuple[str, str], ...]]:
+    return url, tuple(sorted((str(k), str(v)) for k, v in (params or {}).items()))
+
+
+def _as_float(value: Optional[str]) -> float:
+    try:
+        return float(value) if value else 0.0
+    except ValueError:
+        return 0.0
+
+
+_shared_clients: Dict[Tuple[Optional[str], str], GitHubHTTPClient] = {}
+_shared_lock = threading.Lock()
+
+
+def shared_client(token: Optional[str] = None, *, user_agent: str = DEFAULT_USER_AGENT) -> GitHubHTTPClient:
+    """Client unico per processo e token: pool, cache ETag e stato dei limiti sono condivisi."""
+    with _shared_lock:
+        client = _shared_clients.get((token, user_agent))
+        if client is None:
+            client = _shared_clients[(token, user_agent)] = GitHubHTTPClient(token, user_agent=user_agent)
+        return client
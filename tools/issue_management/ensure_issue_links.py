@@ -12,20 +12,36 @@ import os
 import re
 import sys
 import textwrap
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import List, Optional, Sequence, Tuple
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
 
 import requests
 
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from tools.github_http import GitHubHTTPClient
+from tools.issue_management.issue_index import IssueIndex, default_index_path, normalize_title, server_time
+from tools.rate_limit import SlidingWindowLimiter
+
 ISSUE_PATTERN = re.compile(r"#(\d+)")
+# Parallel requests used to load commit files (override with GITHUB_MAX_WORKERS).
+DEFAULT_MAX_WORKERS = 8
+# Issues created in parallel by --auto-create.
+DEFAULT_CREATE_LIMIT = 4
+# GitHub search API limit for authenticated requests.
+SEARCH_REQUESTS_PER_MINUTE = 30
 
 
 @dataclass
 class Commit:
     sha: str
     message: str
-    files: Sequence[str]
+    files: Optional[Sequence[str]]  # None until loaded with GitHubClient.load_commit_files
     html_url: str
 
     @property
@@ -34,17 +50,25 @@ class Commit:
 
 
 class GitHubClient:
-    def __init__(self, token: str, repo: str) -> None:
+    def __init__(
+        self,
+        token: str,
+        repo: str,
+        max_workers: Optional[int] = None,
+        issue_index: Optional[IssueIndex] = None,
+    ) -> None:
         self._token = token
         self._repo = repo
+        # Loaded and synced on the first find_recent_issue call (see sync_issue_index).
+        self._issue_index = issue_index
+        self._issue_index_state: Optional[bool] = None  # None = not synced yet, False = sync failed
+        self._issue_index_lock = threading.Lock()
+        self._search_limiter = SlidingWindowLimiter(SEARCH_REQUESTS_PER_MINUTE, 60.0)
         self._base_url = f"https://api.github.com/repos/{repo}"
-        self._session = requests.Session()
-        self._session.headers.update(
-            {
-                "Authorization": f"Bearer {token}",
-                "Accept": "application/vnd.github+json",
-                "X-GitHub-Api-Version": "2022-11-28",
-            }
+        self._max_workers = max(1, max_workers or int(os.getenv("GITHUB_MAX_WORKERS", DEFAULT_MAX_WORKERS)))
+        # One pooled connection per worker; rate limits, retries and ETags are handled by the shared client.
+        self._session = GitHubHTTPClient(
+            token, pool_size=max(self._max_workers, 10), user_agent="issue-links-ci"
         )
 
     def get_pull_request(self, pr_number: int) -> dict:
@@ -71,46 +95,117 @@ class GitHubClient:
         )
         self._raise_for_status(response, "creating issue")
         data = response.json()
+        with self._issue_index_lock:
+            if self._issue_index_state:
+                self._issue_index.add(data["number"], title, data.get("created_at"))
         return data["number"]
 
     def find_recent_issue(self, title: str, window_days: int = 90) -> Optional[int]:
+        """Issue created in the last `window_days` with the same normalised title, if any.
+
+        Lookups go through the local issue index; the search API is only used when the index
+        could not be synced.
+        """
+        index = self.sync_issue_index(window_days)
+        if index is not None:
+            return index.lookup(title, window_days)
+        return self._search_recent_issue(title, window_days)
+
+    def sync_issue_index(self, window_days: int = 90) -> Optional[IssueIndex]:
+        """Bring the local issue index up to date once per client; None if the sync failed."""
+        with self._issue_index_lock:
+            if self._issue_index_state is None:
+                try:
+                    self._sync_issue_index(window_days)
+                    self._issue_index_state = True
+                except (RuntimeError, requests.RequestException) as exc:
+                    print(f"Warning: issue index not available, using the search API ({exc})", file=sys.stderr)
+                    self._issue_index_state = False
+            return self._issue_index if self._issue_index_state else None
+
+    def _sync_issue_index(self, window_days: int, per_page: int = 100) -> None:
+        if self._issue_index is None:
+            self._issue_index = IssueIndex.load(self._repo, default_index_path())
+        index = self._issue_index
+        url: Optional[str] = f"{self._base_url}/issues"
+        params: Optional[dict] = {
+            "state": "all",
+            "since": index.sync_since(window_days),
+            "sort": "updated",
+            "direction": "asc",
+            "per_page": per_page,
+        }
+        cursor: Optional[str] = None
+        while url:
+            response = self._session.get(url, params=params, timeout=30)
+            self._raise_for_status(response, "listing repository issues")
+            # The next sync starts from the time of the first response, as seen by GitHub.
+            cursor = cursor or server_time(getattr(response, "headers", None))
+            batch = response.json()
+            index.apply(batch)
+            if len(batch) < per_page:
+                break
+            url = ((response.links or {}).get("next") or {}).get("url")
+            params = None
+        # The cursor only moves once every page has been read.
+        index.since = cursor
+        index.save()
+
+    def _search_recent_issue(self, title: str, window_days: int) -> Optional[int]:
         cutoff = (datetime.utcnow() - timedelta(days=window_days)).date().isoformat()
         query = f'repo:{self._repo} type:issue in:title "{title}" created:>={cutoff}'
+        self._search_limiter.acquire()
         response = self._session.get(
             "https://api.github.com/search/issues",
             params={"q": query, "per_page": 5},
             timeout=30,
         )
         self._raise_for_status(response, "searching for similar issues")
+        key = normalize_title(title)
         for item in response.json().get("items", []):
-            if item.get("title", "").strip().lower() == title.strip().lower():
+            if normalize_title(item.get("title", "")) == key:
                 return int(item.get("number"))
         return None
 
-    def list_pull_request_commits(self, pr_number: int) -> List[Commit]:
-        commits: List[Commit] = []
-        page = 1
-        while True:
-            response = self._session.get(
-                f"{self._base_url}/pulls/{pr_number}/commits",
-                params={"per_page": 100, "page": page},
-                timeout=30,
-            )
+    def iter_pull_request_commits(self, pr_number: int, per_page: int = 100) -> Iterator[Commit]:
+        """Stream the pull request commits page by page.
+
+        Pages are followed through the `Link` header. Iteration stops on a short page or when
+        there is no `next` link, so a PR with fewer than `per_page` commits costs one request.
+        """
+        url: Optional[str] = f"{self._base_url}/pulls/{pr_number}/commits"
+        params: Optional[dict] = {"per_page": per_page, "page": 1}
+        while url:
+            response = self._session.get(url, params=params, timeout=30)
             self._raise_for_status(response, "fetching pull request commits")
             batch = response.json()
-            if not batch:
-                break
             for item in batch:
-                commits.append(
-                    Commit(
-                        sha=item["sha"],
-                        message=item["commit"]["message"],
-                        files=self._fetch_commit_files(item["sha"]),
-                        html_url=item["html_url"],
-                    )
+                yield Commit(
+                    sha=item["sha"],
+                    message=item["commit"]["message"],
+                    files=None,
+                    html_url=item["html_url"],
                 )
-            page += 1
-        return commits
+            if len(batch) < per_page:
+                break
+            url = ((response.links or {}).get("next") or {}).get("url")
+            params = None  # the next link already carries the query string
+
+    def list_pull_request_commits(self, pr_number: int) -> List[Commit]:
+        return list(self.iter_pull_request_commits(pr_number))
+
+    def load_commit_files(self, commits: Sequence[Commit]) -> None:
+        """Fill `files` for the commits that do not have it yet, fetching them concurrently."""
+        pending = [commit for commit in commits if commit.files is None]
+        if not pending:
+            return
+        if len(pending) == 1 or self._max_workers == 1:
+            for commit in pending:
+                commit.files = self._fetch_commit_files(commit.sha)
+            return
+        with ThreadPoolExecutor(max_workers=min(self._max_workers, len(pending))) as pool:
+            for commit, files in zip(pending, pool.map(self._fetch_commit_files, [c.sha for c in pending])):
+                commit.files = files
 
     def _fetch_commit_files(self, sha: str) -> Sequence[str]:
         response = self._session.get(f"{self._base_url}/commits/{sha}", timeout=30)
@@ -229,6 +324,20 @@ def heuristic_commit_summary(context: dict) -> Tuple[str, str]:
     return title, paragraph
 
 
+def _issue_body(commit: Commit, summary_paragraph: str) -> str:
+    return textwrap.dedent(
+        f"""
+        Auto-generated issue for commit `{commit.sha}`.
+
+        ## Summary
+        {summary_paragraph}
+
+        ## Links
+        - Commit: {commit.html_url}
+        """
+    ).strip()
+
+
 def ensure_issue_links(
     repo: str,
     pr_number: int,
@@ -236,14 +345,18 @@ def ensure_issue_links(
     openai_api_key: Optional[str],
     openai_model: str,
     labels: Sequence[str],
+    concurrency: int = DEFAULT_MAX_WORKERS,
+    create_limit: int = DEFAULT_CREATE_LIMIT,
 ) -> Tuple[bool, List[str]]:
     token = os.getenv("GITHUB_TOKEN")
     if not token:
         raise RuntimeError("GITHUB_TOKEN is not set in the environment.")
 
     client = GitHubClient(token, repo)
-    commits = client.list_pull_request_commits(pr_number)
-    missing_commits: List[Commit] = [c for c in commits if not extract_issue_numbers(c.message)]
+    # Only commits failing the check are kept; their files are loaded later, if needed.
+    missing_commits: List[Commit] = [
+        c for c in client.iter_pull_request_commits(pr_number) if not extract_issue_numbers(c.message)
+    ]
 
     if not missing_commits:
         return True, ["All commits are linked to at least one issue."]
@@ -259,34 +372,49 @@ def ensure_issue_links(
         )
         return False, [message]
 
-    log_messages: List[str] = []
-    for commit in missing_commits:
+    # Files are only needed to summarise the commits that get an auto-created issue.
+    client.load_commit_files(missing_commits)
+
+    # 1. Summaries run concurrently; results keep the commit order.
+    def summarise(commit: Commit) -> Tuple[str, str]:
         issue_title, summary_paragraph = summarise_with_llm(
-            openai_api_key, commit.message, commit.files, openai_model
+            openai_api_key, commit.message, commit.files or (), openai_model
         )
-
         # Ensure the issue title is not empty and not too long
-        issue_title = (issue_title or "Update changes").strip()[:120]
-
-        body = textwrap.dedent(
-            f"""
-            Auto-generated issue for commit `{commit.sha}`.
+        return (issue_title or "Update changes").strip()[:120], summary_paragraph
 
-            ## Summary
-            {summary_paragraph}
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(missing_commits)))) as pool:
+        summaries = list(pool.map(summarise, missing_commits))
 
-            ## Links
-            - Commit: {commit.html_url}
-            """
-        ).strip()
+    # 2. Identical titles are resolved once (same comparison as find_recent_issue): the first
+    #    commit with a given title provides the body of a newly created issue.
+    first_commit_for_title: Dict[str, int] = {}
+    for position, (issue_title, _) in enumerate(summaries):
+        first_commit_for_title.setdefault(normalize_title(issue_title), position)
 
+    def resolve(position: int) -> Tuple[int, bool]:
+        commit = missing_commits[position]
+        issue_title, summary_paragraph = summaries[position]
         existing_issue = client.find_recent_issue(issue_title)
         if existing_issue:
-            issue_number = existing_issue
-            log_messages.append(f"Reused issue #{issue_number} for commit {commit.short_sha}.")
-        else:
-            issue_number = client.create_issue(title=issue_title, body=body, labels=labels)
+            return existing_issue, False
+        body = _issue_body(commit, summary_paragraph)
+        return client.create_issue(title=issue_title, body=body, labels=labels), True
+
+    # 3. Lookups (local index, rate-limited search as fallback) and creations run in parallel
+    #    within `create_limit`.
+    with ThreadPoolExecutor(max_workers=max(1, min(create_limit, len(first_commit_for_title)))) as pool:
+        resolved = dict(zip(first_commit_for_title, pool.map(resolve, first_commit_for_title.values())))
+
+    # 4. Log and PR body are assembled in commit order, then the body is patched once.
+    log_messages: List[str] = []
+    for position, commit in enumerate(missing_commits):
+        key = normalize_title(summaries[position][0])
+        issue_number, created = resolved[key]
+        if created and first_commit_for_title[key] == position:
             log_messages.append(f"Created issue #{issue_number} for commit {commit.short_sha}.")
+        else:
+            log_messages.append(f"Reused issue #{issue_number} for commit {commit.short_sha}.")
 
         bullet = f"- Closes #{issue_number} (commit {commit.short_sha})"
         if bullet not in pr_body:
@@ -312,6 +440,18 @@ def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
         default="gpt-4o-mini",
         help="Model used to generate the summary (default: gpt-4o-mini).",
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_MAX_WORKERS,
+        help="Commit summaries generated in parallel with --auto-create (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--create-limit",
+        type=int,
+        default=DEFAULT_CREATE_LIMIT,
+        help="Issues searched/created in parallel with --auto-create (default: %(default)s).",
+    )
     parser.add_argument(
         "--labels",
         nargs="*",
@@ -331,6 +471,8 @@ def main(argv: Optional[Sequence[str]] = None) -> int:
             openai_api_key=os.getenv("OPENAI_API_KEY"),
             openai_model=args.openai_model,
             labels=args.labels,
+            concurrency=args.concurrency,
+            create_limit=args.create_limit,
         )
     except Exception as exc:  # pragma: no cover
         print(f"Error: {exc}", file=sys.stderr)
@@ -0,0 +1,180 @@
+"""Local index of the repository issues, used to deduplicate auto-created issues.
+
+The index maps a normalised issue title to the issue number. It is filled from
+`GET /repos/{repo}/issues?since=<cursor>` and saved as JSON inside the git directory
+(`.git/issue-management/issue-index.json`, or the `ISSUE_INDEX_PATH` variable). Later runs
+only ask GitHub for the issues updated after the saved cursor. Lookups are dictionary
+accesses and never use the search API, which has its own, much lower, rate limit.
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+import subprocess
+import unicodedata
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+INDEX_DIRNAME = "issue-management"
+INDEX_FILENAME = "issue-index.json"
+# Bumped when the file layout or the title normalisation changes: older files are discarded.
+INDEX_VERSION = 1
+
+_NON_WORD_RE = re.compile(r"[\W_]+")
+
+
+def normalize_title(title: str) -> str:
+    """Key used to compare titles: case, Unicode width variants, punctuation and spacing are ignored."""
+    return _NON_WORD_RE.sub(" ", unicodedata.normalize("NFKC", title).casefold()).strip()
+
+
+def default_index_path(cwd: Optional[Path] = None) -> Optional[Path]:
+    """`ISSUE_INDEX_PATH`, or the index inside the git directory (None outside a repository)."""
+    override = os.getenv("ISSUE_INDEX_PATH")
+    if override:
+        return Path(override)
+    proc = subprocess.run(
+        ["git", "rev-parse", "--absolute-git-dir"],
+        cwd=cwd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+    )
+    if proc.returncode != 0 or not proc.stdout.strip():
+        return None
+    return Path(proc.stdout.strip()) / INDEX_DIRNAME / INDEX_FILENAME
+
+
+def _format_time(value: datetime) -> str:
+    return value.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def server_time(headers: Any) -> str:
+    """Time of a response according to GitHub (`Date` header), falling back to the local clock."""
+    raw = headers.get("Date") if headers else None
+    if raw:
+        try:
+            return _format_time(parsedate_to_datetime(raw))
+        except (TypeError, ValueError):
+            pass
+    return _format_time(datetime.now(timezone.utc))
+
+
+class IssueIndex:
+    """Issues created after `horizon`, with a title → number map for O(1) lookups.
+
+    `since` is the sync cursor: the next sync only needs the issues updated after it.
+    """
+
+    def __init__(self, repo: str, path: Optional[Path] = None) -> None:
+        self.repo = repo
+        self.path = Path(path) if path else None
+        self.since: Optional[str] = None
+        self.horizon: Optional[str] = None
+        self._issues: Dict[int, Tuple[str, str]] = {}  # number -> (title, created_at)
+        self._by_title: Dict[str, int] = {}
+
+    @classmethod
+    def load(cls, repo: str, path: Optional[Path]) -> "IssueIndex":
+        index = cls(repo, path)
+        if path is None or not Path(path).exists():
+            return index
+        try:
+            data = json.loads(Path(path).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return index
+        if data.get("version") != INDEX_VERSION or data.get("repo") != repo:
+            return index
+        index.since = data.get("since")
+        index.horizon = data.get("horizon")
+        index._issues = {int(number): (title, created) for number, (title, created) in data.get("issues", {}).items()}
+        index._rebuild()
+        return index
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {
+            "version": INDEX_VERSION,
+            "repo": self.repo,
+            "since": self.since,
+            "horizon": self.horizon,
+            "issues": {str(number): [title, created] for number, (title, created) in self._issues.items()},
+        }
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(payload, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+    def __len__(self) -> int:
+        return len(self._issues)
+
+    def sync_since(self, window_days: int, now: Optional[datetime] = None) -> str:
+        """Value for the `since` parameter of the next sync.
+
+        An index that does not cover the whole window is rebuilt from the window start;
+        otherwise only the changes after the saved cursor are requested.
+        """
+        cutoff = _format_time((now or datetime.now(timezone.utc)) - timedelta(days=window_days))
+        if self.since is None or self.horizon is None or self.horizon > cutoff:
+            self._issues.clear()
+            self._by_title.clear()
+            self.since = None
+            self.horizon = cutoff
+            return cutoff
+        if self.horizon < cutoff:
+            # issues created before the window can no longer match: drop them
+            self._issues = {n: entry for n, entry in self._issues.items() if entry[1] >= cutoff}
+            self.horizon = cutoff
+            self._rebuild()
+        return self.since
+
+    def apply(self, items: Iterable[Dict[str, Any]], cursor: Optional[str] = None) -> None:
+        """Store a batch of `GET /issues` items (pull requests are skipped), optionally moving the cursor."""
+        retitled = False
+        for item in items:
+            if "pull_request" in item:
+                continue
+            created = item.get("created_at") or ""
+            if self.horizon and created < self.horizon:
+                continue
+            number, title = int(item["number"]), item.get("title") or ""
+            previous = self._issues.get(number)
+            self._issues[number] = (title, created)
+            if previous is None:
+                self._index_title(number, title, created)
+            elif normalize_title(previous[0]) != normalize_title(title):
+                retitled = True
+        if retitled:
+            # the old title may still point to the renamed issue
+            self._rebuild()
+        if cursor:
+            self.since = cursor
+
+    def add(self, number: int, title: str, created_at: Optional[str] = None) -> None:
+        """Record an issue created by this process, so later lookups in the same run find it."""
+        created = created_at or _format_time(datetime.now(timezone.utc))
+        self._issues[number] = (title, created)
+        self._index_title(number, title, created)
+
+    def lookup(self, title: str, window_days: Optional[int] = None) -> Optional[int]:
+        number = self._by_title.get(normalize_title(title))
+        if number is None or window_days is None:
+            return number
+        cutoff = _format_time(datetime.now(timezone.utc) - timedelta(days=window_days))
+        return number if self._issues[number][1] >= cutoff else None
+
+    def _rebuild(self) -> None:
+        self._by_title = {}
+        for number, (title, created) in self._issues.items():
+            self._index_title(number, title, created)
+
+    def _index_title(self, number: int, title: str, created: str) -> None:
+        # with several issues sharing a title, the most recent one wins
+        key = normalize_title(title)
+        current = self._by_title.get(key)
+        if current is None or (created, number) >= (self._issues[current][1], current):
+            self._by_title[key] = number
@@ -1,3 +1,4 @@
+import threading
 from types import SimpleNamespace
 
 import pytest
@@ -28,12 +29,15 @@ def test_ensure_issue_links_creates_issue_and_updates_body(monkeypatch: pytest.M
         def __init__(self, token: str, repo: str) -> None:
             self.repo = repo
 
-        def list_pull_request_commits(self, pr_number: int):
-            return commits
+        def iter_pull_request_commits(self, pr_number: int):
+            return iter(commits)
 
         def get_pull_request(self, pr_number: int):
             return {"body": ""}
 
+        def load_commit_files(self, commits) -> None:
+            return None
+
         def find_recent_issue(self, title: str, window_days: int = 90):
             client_state.titles_checked.append(title)
             return None
@@ -46,7 +50,7 @@ def test_ensure_issue_links_creates_issue_and_updates_body(monkeypatch: pytest.M
             client_state.updated_body = body
 
     monkeypatch.setattr(module, "GitHubClient", FakeClient)
-    monkeypatch.setattr(module, "summarise_with_llm", lambda *args, **kwargs: "Sintesi")
+    monkeypatch.setattr(module, "summarise_with_llm", lambda *args, **kwargs: ("Title", "Sintesi"))
 
     success, messages = module.ensure_issue_links(
         repo="owner/repo",
@@ -61,7 +65,7 @@ def test_ensure_issue_links_creates_issue_and_updates_body(monkeypatch: pytest.M
     assert any("Closes #101" in line for line in client_state.updated_body.splitlines())
     assert client_state.created, "una issue deve essere creata"
     assert client_state.titles_checked
-    assert any("Creata issue #101" in msg for msg in messages)
+    assert any("Created issue #101" in msg for msg in messages)
 
 
 def test_reuses_existing_issue(monkeypatch: pytest.MonkeyPatch) -> None:
@@ -72,12 +76,15 @@ def test_reuses_existing_issue(monkeypatch: pytest.MonkeyPatch) -> None:
         def __init__(self, token: str, repo: str) -> None:
             self.repo = repo
 
-        def list_pull_request_commits(self, pr_number: int):
-            return commits
+        def iter_pull_request_commits(self, pr_number: int):
+            return iter(commits)
 
         def get_pull_request(self, pr_number: int):
             return {"body": ""}
 
+        def load_commit_files(self, commits) -> None:
+            return None
+
         def find_recent_issue(self, title: str, window_days: int = 90):
             return 77
 
@@ -89,7 +96,7 @@ def test_reuses_existing_issue(monkeypatch: pytest.MonkeyPatch) -> None:
             client_state.updated_body = body
 
     monkeypatch.setattr(module, "GitHubClient", FakeClient)
-    monkeypatch.setattr(module, "summarise_with_llm", lambda *args, **kwargs: "Sintesi")
+    monkeypatch.setattr(module, "summarise_with_llm", lambda *args, **kwargs: ("Title", "Sintesi"))
 
     success, messages = module.ensure_issue_links(
         repo="owner/repo",
@@ -103,4 +110,234 @@ def test_reuses_existing_issue(monkeypatch: pytest.MonkeyPatch) -> None:
     assert success is True
     assert not client_state.created
     assert any("Closes #77" in line for line in client_state.updated_body.splitlines())
-    assert any("Riutilizzata issue #77" in msg for msg in messages)
+    assert any("Reused issue #77" in msg for msg in messages)
+
+
+class FakeResponse:
+    def __init__(self, payload, links=None) -> None:
+        self._payload = payload
+        self.status_code = 200
+        self.links = links or {}
+        self.text = ""
+
+    def json(self):
+        return self._payload
+
+    def raise_for_status(self) -> None:
+        return None
+
+
+class FakeSession:
+    """Serves paginated PR commits and per-commit details, recording every URL."""
+
+    def __init__(self, commits, issues=()) -> None:
+        self.commits = commits
+        self.issues = list(issues)
+        self.params = []
+        self.urls = []
+        self.threads = set()
+        self._lock = threading.Lock()
+
+    def get(self, url, params=None, timeout=None):
+        with self._lock:
+            self.urls.append(url)
+            self.threads.add(threading.get_ident())
+            self.params.append(params)
+        if "/search/" in url:
+            raise AssertionError("the search API must not be used")
+        if url.endswith("/issues") or "/issues?" in url:
+            if params is None:
+                params = dict(part.split("=") for part in url.split("?")[1].split("&"))
+            page, per_page = int(params.get("page", 1)), int(params["per_page"])
+            links = {}
+            if page * per_page < len(self.issues):
+                links["next"] = {"url": f"{url.split('?')[0]}?per_page={per_page}&page={page + 1}"}
+            return FakeResponse(self.issues[(page - 1) * per_page : page * per_page], links)
+        if "/pulls/" in url:
+            if params is None:  # URL taken from the Link header
+                base, query = url.split("?")
+                params = dict(part.split("=") for part in query.split("&"))
+                url = base
+            page, per_page = int(params["page"]), int(params["per_page"])
+            links = {}
+            if page * per_page < len(self.commits):
+                links["next"] = {"url": f"{url}?per_page={per_page}&page={page + 1}"}
+            return FakeResponse(self.commits[(page - 1) * per_page : page * per_page], links)
+        sha = url.rsplit("/", 1)[-1]
+        return FakeResponse({"files": [{"filename": f"src/{sha}.py"}]})
+
+    def post(self, url, json=None, timeout=None):
+        self.urls.append(url)
+        return FakeResponse({"number": 500, "title": json["title"]})
+
+
+def _pr_commits(count: int, linked: bool = True):
+    return [
+        {
+            "sha": f"{index:040d}",
+            "commit": {"message": f"feat: change {index}" + (f" (#{index})" if linked or index % 2 else "")},
+            "html_url": f"https://example.com/commit/{index}",
+        }
+        for index in range(count)
+    ]
+
+
+def test_list_pull_request_commits_does_not_fetch_files() -> None:
+    client = module.GitHubClient("token", "owner/repo")
+    client._session = FakeSession(_pr_commits(250))
+
+    commits = client.list_pull_request_commits(5)
+
+    assert len(commits) == 250
+    assert all(commit.files is None for commit in commits)
+    assert all("/pulls/5/commits" in url for url in client._session.urls)
+    # 100 + 100 + 50: the short page ends the iteration without an extra empty request
+    assert len(client._session.urls) == 3
+
+
+@pytest.mark.parametrize("count,requests_made", [(0, 1), (30, 1), (100, 1), (101, 2)])
+def test_iter_pull_request_commits_stops_without_empty_page(count: int, requests_made: int) -> None:
+    client = module.GitHubClient("token", "owner/repo")
+    client._session = FakeSession(_pr_commits(count))
+
+    assert len(list(client.iter_pull_request_commits(5))) == count
+    assert len(client._session.urls) == requests_made
+
+
+def test_load_commit_files_only_for_missing_commits_concurrently() -> None:
+    client = module.GitHubClient("token", "owner/repo", max_workers=4)
+    session = client._session = FakeSession(_pr_commits(40, linked=False))
+    commits = client.list_pull_request_commits(5)
+    missing = [c for c in commits if not module.extract_issue_numbers(c.message)]
+    session.urls.clear()
+
+    client.load_commit_files(missing)
+
+    assert len(missing) == 20
+    assert sorted(session.urls) == sorted(f"https://api.github.com/repos/owner/repo/commits/{c.sha}" for c in missing)
+    assert all(c.files == [f"src/{c.sha}.py"] for c in missing)
+    assert all(c.files is None for c in commits if c not in missing)
+
+
+def test_auto_create_pipeline_dedupes_titles_and_patches_body_once(monkeypatch: pytest.MonkeyPatch) -> None:
+    commits = [
+        make_commit(sha=f"{index:07d}aaaa", message=message)
+        for index, message in enumerate(["feat: a", "feat: b", "fix: c", "feat: a again", "docs: d"])
+    ]
+    titles = {"feat: a": "Add A", "feat: b": "Add B", "fix: c": "Known bug", "feat: a again": "add a ", "docs: d": "Docs"}
+    state = SimpleNamespace(searched=[], created=[], patches=[])
+    lock = threading.Lock()
+
+    class FakeClient:
+        def __init__(self, token: str, repo: str) -> None:
+            self.next_number = 200
+
+        def iter_pull_request_commits(self, pr_number: int):
+            return iter(commits)
+
+        def get_pull_request(self, pr_number: int):
+            return {"body": "Intro"}
+
+        def load_commit_files(self, commits) -> None:
+            return None
+
+        def find_recent_issue(self, title: str, window_days: int = 90):
+            with lock:
+                state.searched.append(title)
+            return 77 if title == "Known bug" else None
+
+        def create_issue(self, title: str, body: str, labels=None):
+            with lock:
+                self.next_number += 1
+                state.created.append((title, body))
+                return {"Add A": 201, "Add B": 202, "Docs": 203}[title]
+
+        def update_pull_request_body(self, pr_number: int, body: str) -> None:
+            state.patches.append(body)
+
+    monkeypatch.setattr(module, "GitHubClient", FakeClient)
+    monkeypatch.setattr(module, "summarise_with_llm", lambda key, message, files, model: (titles[message], "Summary"))
+
+    success, messages = module.ensure_issue_links(
+        repo="owner/repo",
+        pr_number=9,
+        auto_create=True,
+        openai_api_key=None,
+        openai_model="gpt-4o-mini",
+        labels=["triage"],
+        concurrency=3,
+        create_limit=2,
+    )
+
+    assert success is True
+    assert sorted(state.searched) == ["Add A", "Add B", "Docs", "Known bug"]
+    assert sorted(title for title, _ in state.created) == ["Add A", "Add B", "Docs"]
+    assert "`0000000aaaa`" in dict(state.created)["Add A"]
+    assert state.patches == [
+        "Intro\n"
+        "- Closes #201 (commit 0000000)\n"
+        "- Closes #202 (commit 0000001)\n"
+        "- Closes #77 (commit 0000002)\n"
+        "- Closes #201 (commit 0000003)\n"
+        "- Closes #203 (commit 0000004)"
+    ]
+    assert messages[:5] == [
+        "Created issue #201 for commit 0000000.",
+        "Created issue #202 for commit 0000001.",
+        "Reused issue #77 for commit 0000002.",
+        "Reused issue #201 for commit 0000003.",
+        "Created issue #203 for commit 0000004.",
+    ]
+
+
+def _issue(number: int, title: str, days_ago: int = 1, **extra):
+    created = (module.datetime.utcnow() - module.timedelta(days=days_ago)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    return {"number": number, "title": title, "created_at": created, **extra}
+
+
+def test_find_recent_issue_uses_local_index(tmp_path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("ISSUE_INDEX_PATH", str(tmp_path / "index.json"))
+    issues = [_issue(n, f"Issue {n}") for n in range(1, 151)]
+    issues += [
+        _issue(300, "Fix: login  timeout"),
+        _issue(301, "Old duplicate", days_ago=200),
+        _issue(302, "A pull request", pull_request={}),
+    ]
+    client = module.GitHubClient("token", "owner/repo")
+    session = client._session = FakeSession([], issues)
+
+    assert client.find_recent_issue("fix login timeout") == 300
+    assert client.find_recent_issue("ISSUE 42") == 42
+    assert client.find_recent_issue("Old duplicate") is None
+    assert client.find_recent_issue("A pull request") is None
+    # 153 issues: two pages, fetched once for every lookup
+    assert len(session.urls) == 2
+
+    number = client.create_issue("Brand new", "body")
+    assert client.find_recent_issue("brand new") == number
+
+    # a new run only asks for the issues updated after the saved cursor
+    second = module.GitHubClient("token", "owner/repo")
+    session = second._session = FakeSession([], [_issue(400, "Added later")])
+    assert second.find_recent_issue("Issue 7") == 7
+    assert second.find_recent_issue("Added later") == 400
+    assert session.params[0]["since"] == client._issue_index.since
+
+
+def test_find_recent_issue_falls_back_to_search(tmp_path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("ISSUE_INDEX_PATH", str(tmp_path / "index.json"))
+    client = module.GitHubClient("token", "owner/repo")
+    searches = []
+
+    class BrokenSession:
+        def get(self, url, params=None, timeout=None):
+            if "/search/" in url:
+                searches.append(params["q"])
+                return FakeResponse({"items": [{"number": 9, "title": "Fix  Login timeout."}]})
+            raise module.requests.ConnectionError("offline")
+
+    client._session = BrokenSession()
+
+    assert client.find_recent_issue("fix login timeout") == 9
+    assert client.find_recent_issue("other") is None
+    assert len(searches) == 2
@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta, timezone
+
+from tools.issue_management import issue_index as module
+
+
+def _at(days_ago: int) -> str:
+    return (datetime.now(timezone.utc) - timedelta(days=days_ago)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def test_normalize_title_ignores_case_punctuation_and_spacing() -> None:
+    assert module.normalize_title("  Fix: Login\ttimeout!! ") == "fix login timeout"
+    assert module.normalize_title("ＡＰＩ_errors") == module.normalize_title("api errors")
+
+
+def test_index_round_trip_and_incremental_sync(tmp_path) -> None:
+    path = tmp_path / "index.json"
+    index = module.IssueIndex.load("owner/repo", path)
+    assert index.sync_since(90) == index.horizon
+    index.apply([{"number": 1, "title": "Crash on start", "created_at": _at(3)}])
+    index.since = "2024-05-01T00:00:00Z"
+    index.save()
+
+    reloaded = module.IssueIndex.load("owner/repo", path)
+    assert reloaded.lookup("crash on START") == 1
+    assert reloaded.sync_since(90) == "2024-05-01T00:00:00Z"
+    # a wider window is not covered by the saved issues: full sync from the new horizon
+    assert reloaded.sync_since(365) == reloaded.horizon != "2024-05-01T00:00:00Z"
+    assert len(reloaded) == 0
+    # another repository never reuses the file
+    assert module.IssueIndex.load("owner/other", path).since is None
+
+
+def test_index_follows_renames_and_prefers_newest_duplicate() -> None:
+    index = module.IssueIndex("owner/repo")
+    index.sync_since(90)
+    index.apply(
+        [
+            {"number": 1, "title": "Flaky test", "created_at": _at(10)},
+            {"number": 2, "title": "flaky test", "created_at": _at(2)},
+            {"number": 3, "title": "Slow build", "created_at": _at(5)},
+        ]
+    )
+    assert index.lookup("Flaky test") == 2
+
+    index.apply([{"number": 3, "title": "Slow CI build", "created_at": _at(5)}])
+
+    assert index.lookup("slow build") is None
+    assert index.lookup("slow ci build") == 3
+    assert index.lookup("Flaky test", window_days=1) is None
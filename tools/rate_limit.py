@@ -0,0 +1,51 @@
+"""Limitatore a finestra scorrevole condiviso dagli script sotto `tools/`.
+
+Ogni `acquire(cost)` registra un costo (una chiamata, o i token stimati di una richiesta al
+modello) e attende finché la somma dei costi negli ultimi `period` secondi resta entro
+`capacity`. Lo stesso limitatore può essere usato da più thread.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Optional, Tuple
+
+
+class SlidingWindowLimiter:
+    """Al massimo `capacity` unità di costo ogni `period` secondi (thread-safe)."""
+
+    def __init__(
+        self,
+        capacity: int,
+        period: float = 60.0,
+        clock: Optional[Callable[[], float]] = None,
+        sleep: Optional[Callable[[float], None]] = None,
+    ) -> None:
+        self.capacity = max(1, capacity)
+        self.period = period
+        # risolti a ogni chiamata: i test possono sostituire time.monotonic/time.sleep
+        self._clock = clock
+        self._sleep = sleep
+        self._spent: Deque[Tuple[float, int]] = deque()
+        self._used = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, cost: int = 1) -> None:
+        # un costo più grande della capacità passa comunque, da solo nella finestra
+        cost = min(max(0, cost), self.capacity)
+        while True:
+            with self._lock:
+                now = self._clock() if self._clock else time.monotonic()
+                while self._spent and now - self._spent[0][0] >= self.period:
+                    self._used -= self._spent.popleft()[1]
+                if self._used + cost <= self.capacity:
+                    self._spent.append((now, cost))
+                    self._used += cost
+                    return
+                wait = self.period - (now - self._spent[0][0])
+            if self._sleep:
+                self._sleep(wait)
+            else:
+                time.sleep(wait)
@@ -0,0 +1 @@
+"""Benchmark della pipeline release notes su repository sintetici."""
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""Microbenchmark del classificatore Conventional Commits (`tools.release_notes.conventional`).
+
+Genera N messaggi sintetici (subject + corpo, come `synthetic_repo`) e misura il throughput
+di `classify` confrontandolo con le due implementazioni che sostituisce: il vecchio
+`_parse_conv` delle release notes e il `CONVENTIONAL_RE` di `versioning`.
+
+Esempio:
+  python -m tools.release_notes.bench.bench_classifier --messages 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parents[3]))
+
+from tools.release_notes.bench.synthetic_repo import RepoSpec, _message
+from tools.release_notes.conventional import classify
+
+# Implementazioni precedenti, mantenute qui solo come termine di paragone.
+_LEGACY_CONV_RE = re.compile(
+    r"^(?P<type>build|chore|ci|docs|feat|fix|perf|refactor|revert|style|test)"
+    r"(?:\((?P<scope>[^)]+)\))?!?:\s*(?P<subject>.+)"
+)
+_LEGACY_VERSIONING_RE = re.compile(r"^(?P<type>[a-zA-Z]+)(?P<scope>\([^)]*\))?(?P<breaking>!)?:")
+
+
+def _legacy_parse_conv(msg: str) -> Dict[str, Optional[str]]:
+    head = msg.splitlines()[0].strip()
+    m = _LEGACY_CONV_RE.match(head)
+    if m:
+        return {
+            "type": m.group("type"),
+            "scope": m.group("scope"),
+            "subject": m.group("subject").strip(),
+            "breaking": "yes" if "!" in head else None,
+        }
+    return {"type": "other", "scope": None, "subject": head, "breaking": None}
+
+
+def _legacy_versioning(msg: str) -> int:
+    msg = msg.strip()
+    if "BREAKING CHANGE" in msg or "BREAKING-CHANGE" in msg:
+        return 3
+    m = _LEGACY_VERSIONING_RE.match(msg)
+    if m:
+        if m.group("breaking"):
+            return 3
+        t = m.group("type").lower()
+        if t == "feat":
+            return 2
+        if t in {"fix", "perf", "refactor"}:
+            return 1
+    return 0
+
+
+def make_messages(count: int, body_bytes: int, seed: int = 42) -> List[str]:
+    spec = RepoSpec(commits=count, body_bytes=body_bytes, seed=seed)
+    rng = random.Random(seed)
+    return [_message(rng, spec, i) for i in range(count)]
+
+
+def _throughput(fn: Callable[[str], object], messages: Sequence[str], repeat: int) -> Dict[str, float]:
+    """Miglior tempo su `repeat` passate e relativo throughput."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for msg in messages:
+            fn(msg)
+        best = min(best, time.perf_counter() - start)
+    return {"best_s": round(best, 6), "msgs_per_s": round(len(messages) / best) if best else 0.0}
+
+
+def run(count: int, body_bytes: int, repeat: int) -> Dict[str, object]:
+    messages = make_messages(count, body_bytes)
+    results = {
+        "classify": _throughput(classify, messages, repeat),
+        "legacy_parse_conv": _throughput(_legacy_parse_conv, messages, repeat),
+        "legacy_versioning": _throughput(_legacy_versioning, messages, repeat),
+    }
+    # prima servivano due passaggi (release notes + versioning) per avere tipo e bump
+    legacy_total = results["legacy_parse_conv"]["best_s"] + results["legacy_versioning"]["best_s"]
+    results["speedup_vs_legacy_total"] = round(legacy_total / results["classify"]["best_s"], 2)
+    return {"messages": count, "body_bytes": body_bytes, "repeat": repeat, "results": results}
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    p = argparse.ArgumentParser(description="Throughput del classificatore Conventional Commits.")
+    p.add_argument("--messages", type=int, default=100_000, help="Numero di messaggi generati")
+    p.add_argument("--body-bytes", type=int, default=200, help="Dimensione del corpo dei messaggi")
+    p.add_argument("--repeat", type=int, default=3, help="Ripetizioni (si riporta la migliore)")
+    args = p.parse_args(argv)
+    print(json.dumps(run(args.messages, args.body_bytes, args.repeat), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""Benchmark della pipeline release notes su repository sintetici.
+
+Per ogni scenario (numero di commit, dimensione dei messaggi, fan-out dei file, merge) misura
+tempo wall, tempo CPU e picco di memoria delle singole fasi: lettura git, parsing, indice dei
+commit, classificazione LLM (contro un server stub locale), rendering, `collect_commits` e `plan_release`.
+I risultati vanno in JSON e possono essere confrontati con una baseline per intercettare regressioni.
+
+Esempio:
+  python -m tools.release_notes.bench.run_bench --commits 1000,20000 --out bench.json
+  python -m tools.release_notes.bench.run_bench --commits 1000 --baseline bench.json --threshold 0.25
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import datetime as dt
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parents[3]))
+
+from tools.release_notes import generate_release_notes as notes
+from tools.release_notes.bench.stub_llm import StubLLMServer
+from tools.release_notes.bench.synthetic_repo import RepoSpec, build_repo
+from tools.release_notes.commit_index import CommitIndex
+from tools.release_notes.test import llm, versioning
+
+
+@dataclass
+class StageResult:
+    wall_s: float
+    cpu_s: float
+    peak_kib: Optional[float]
+    items: int
+
+
+def _measure(fn: Callable[[], Any], memory: bool) -> StageResult:
+    """Esegue la fase una volta per i tempi e, se richiesto, una seconda sotto tracemalloc per il picco."""
+    gc.collect()
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    result = fn()
+    wall = time.perf_counter() - wall
+    cpu = time.process_time() - cpu
+    items = len(result) if hasattr(result, "__len__") else int(result or 0)
+    peak = None
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            fn()
+            peak = tracemalloc.get_traced_memory()[1] / 1024
+        finally:
+            tracemalloc.stop()
+    return StageResult(round(wall, 6), round(cpu, 6), round(peak, 1) if peak is not None else None, items)
+
+
+@contextlib.contextmanager
+def _chdir(path: Path) -> Iterator[None]:
+    previous = Path.cwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+@contextlib.contextmanager
+def _stub_llm_env(server: StubLLMServer) -> Iterator[None]:
+    saved = {k: os.environ.get(k) for k in ("OPENAI_API_KEY", "OPENAI_BASE_URL")}
+    os.environ["OPENAI_API_KEY"] = "bench-stub"
+    os.environ["OPENAI_BASE_URL"] = server.base_url
+    try:
+        yield
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def run_scenario(spec: RepoSpec, args: argparse.Namespace, workdir: Path) -> Dict[str, Any]:
+    repo = build_repo(workdir / f"repo-{spec.commits}-{spec.seed}", spec)
+    stages: Dict[str, StageResult] = {}
+    memory = not args.no_memory
+    commit_range = "main"
+
+    with _chdir(repo):
+        commits: List[notes.CommitRecord] = []
+
+        def git_read() -> List[notes.CommitRecord]:
+            commits[:] = list(notes._git_commits(commit_range))
+            return commits
+
+        stages["git_read"] = _measure(git_read, memory)
+        stages["parse"] = _measure(lambda: [notes._parse_conv(c.subject) for c in commits], memory)
+        stages["render"] = _measure(lambda: notes._render_markdown(commits, {}, version="bench").count("\n"), memory)
+        stages["stream_end_to_end"] = _measure(
+            lambda: notes._render_markdown(notes._git_commits(commit_range, with_body=False), {}, version="bench").count("\n"), memory
+        )
+
+        index_path = workdir / f"index-{spec.commits}-{spec.seed}.sqlite3"
+
+        def indexed() -> int:
+            with CommitIndex(index_path, parser_version=notes._PARSER_VERSION) as index:
+                return sum(1 for _ in notes._indexed_commits(commit_range, index))
+
+        stages["index_cold"] = _measure(indexed, False)
+        stages["index_warm"] = _measure(indexed, memory)
+        stages["versioning_collect"] = _measure(lambda: versioning.collect_commits(None, commit_range), memory)
+        stages["versioning_plan"] = _measure(
+            lambda: versioning.plan_release(None, commit_range, current_version="1.0.0"), memory
+        )
+
+        if args.llm_commits:
+            sample = commits[: args.llm_commits]
+            shas = [c.hash for c in sample]
+            subjects = {c.hash: c.subject for c in sample}
+            runs = iter(range(1_000_000))
+
+            def classify() -> List[llm.CommitEnrichment]:
+                # cache nuova a ogni esecuzione: si misura il costo reale delle chiamate
+                llm.CACHE_DIR = workdir / f"llm-cache-{spec.commits}-{next(runs)}"
+                return llm.enrich_commits(
+                    shas, subjects=subjects, concurrency=args.concurrency, batch_size=args.batch_size
+                )
+
+            previous_cache_dir = llm.CACHE_DIR
+            try:
+                with StubLLMServer(latency=args.llm_latency) as server, _stub_llm_env(server):
+                    stages["classify"] = _measure(classify, False)
+                    requests_made = server.requests
+            finally:
+                llm.CACHE_DIR = previous_cache_dir
+        else:
+            requests_made = 0
+
+    return {
+        "spec": spec.as_dict(),
+        "llm_requests": requests_made,
+        "stages": {name: asdict(result) for name, result in stages.items()},
+    }
+
+
+def _git_revision() -> str:
+    proc = subprocess.run(["git", "rev-parse", "--short", "HEAD"], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    return proc.stdout.strip() or "unknown"
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Restituisce le fasi più lente della baseline oltre la soglia relativa (es. 0.2 = +20%)."""
+    regressions: List[str] = []
+    previous = {json.dumps(s["spec"], sort_keys=True): s for s in baseline.get("scenarios", [])}
+    for scenario in current.get("scenarios", []):
+        base = previous.get(json.dumps(scenario["spec"], sort_keys=True))
+        if not base:
+            continue
+        for name, stage in scenario["stages"].items():
+            old = base["stages"].get(name)
+            if not old or not old["wall_s"]:
+                continue
+            ratio = stage["wall_s"] / old["wall_s"] - 1
+            if ratio > threshold:
+                regressions.append(
+                    f"{scenario['spec']['commits']} commits / {name}: "
+                    f"{old['wall_s']:.3f}s -> {stage['wall_s']:.3f}s (+{ratio * 100:.0f}%)"
+                )
+    return regressions
+
+
+def _int_list(raw: str) -> List[int]:
+    return [int(part) for part in raw.split(",") if part.strip()]
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Benchmark della generazione release notes su repository sintetici.")
+    p.add_argument("--commits", type=_int_list, default=[1000, 10000], help="Numero di commit per scenario (lista separata da virgole)")
+    p.add_argument("--body-bytes", type=int, default=200, help="Dimensione del corpo dei messaggi")
+    p.add_argument("--files-per-commit", type=int, default=3, help="File modificati per commit")
+    p.add_argument("--merge-every", type=int, default=0, help="Un merge commit ogni N commit (0 = storia lineare)")
+    p.add_argument("--llm-commits", type=int, default=100, help="Commit classificati tramite lo stub LLM (0 = salta)")
+    p.add_argument("--llm-latency", type=float, default=0.02, help="Latenza simulata dello stub LLM (secondi)")
+    p.add_argument("--concurrency", type=int, default=4, help="Concorrenza di enrich_commits")
+    p.add_argument("--batch-size", type=int, default=0, help="batch_size di enrich_commits (0 = per-item)")
+    p.add_argument("--no-memory", action="store_true", help="Non misurare il picco di memoria (più veloce)")
+    p.add_argument("--workdir", type=Path, help="Directory per i repository sintetici (default: temporanea)")
+    p.add_argument("-o", "--out", type=Path, help="File JSON dei risultati (default: stdout)")
+    p.add_argument("--baseline", type=Path, help="Risultati precedenti con cui confrontare")
+    p.add_argument("--threshold", type=float, default=0.2, help="Regressione massima tollerata rispetto alla baseline")
+    return p.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+    with contextlib.ExitStack() as stack:
+        workdir = args.workdir or Path(stack.enter_context(tempfile.TemporaryDirectory(prefix="relnotes-bench-")))
+        scenarios = []
+        for count in args.commits:
+            spec = RepoSpec(
+                commits=count,
+                body_bytes=args.body_bytes,
+                files_per_commit=args.files_per_commit,
+                merge_every=args.merge_every,
+            )
+            scenarios.append(run_scenario(spec, args, workdir))
+
+    results = {
+        "meta": {
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "generated_at": dt.datetime.now(dt.timezone.utc).replace(microsecond=0).isoformat(),
+            "llm_commits": args.llm_commits,
+            "llm_latency": args.llm_latency,
+            "concurrency": args.concurrency,
+            "batch_size": args.batch_size,
+        },
+        "scenarios": scenarios,
+    }
+    text = json.dumps(results, indent=2)
+    if args.out:
+        args.out.write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+
+    if args.baseline:
+        regressions = compare(results, json.loads(args.baseline.read_text(encoding="utf-8")), args.threshold)
+        for line in regressions:
+            sys.stderr.write(f"[bench] REGRESSION {line}\n")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,97 @@
+"""Server locale compatibile con `/v1/chat/completions` per i benchmark (nessuna chiamata di rete esterna).
+
+Le risposte sono deterministiche e dipendono solo dal prompt, con una latenza configurabile
+per simulare il round trip verso il provider reale.
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "StubLLMServer"
+
+    def log_message(self, format: str, *args) -> None:  # noqa: A002 - firma di BaseHTTPRequestHandler
+        return
+
+    def do_POST(self) -> None:  # noqa: N802 - nome imposto da http.server
+        length = int(self.headers.get("Content-Length") or 0)
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        self.server.record_request()
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        content = _answer(payload)
+        prompt_chars = sum(len(m.get("content") or "") for m in payload.get("messages", []))
+        body = json.dumps(
+            {
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}}],
+                "usage": {
+                    "prompt_tokens": prompt_chars // 4,
+                    "completion_tokens": len(content) // 4,
+                    "total_tokens": (prompt_chars + len(content)) // 4,
+                },
+            }
+        ).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _answer(payload: dict) -> str:
+    messages = payload.get("messages") or [{}, {}]
+    system = messages[0].get("content") or ""
+    user = messages[-1].get("content") or ""
+    if payload.get("response_format") and '"items"' in user:
+        items = json.loads(user).get("items", [])
+        if "Conventional Commits" in system:
+            return json.dumps({"results": {item["id"]: "chore" for item in items}})
+        return json.dumps(
+            {"results": {item["id"]: {"breaking": False, "db_migration": False, "public_api": False} for item in items}}
+        )
+    if "Conventional Commits" in system:
+        return "chore"
+    if "JSON" in system:
+        return '{"breaking": false, "db_migration": false, "public_api": false}'
+    first_line = user.splitlines()[0] if user else ""
+    return f"Sintesi sintetica per {first_line[:80]}"
+
+
+class StubLLMServer(ThreadingHTTPServer):
+    """Server in un thread in background; usabile come context manager."""
+
+    daemon_threads = True
+
+    def __init__(self, latency: float = 0.0, port: int = 0) -> None:
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def record_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def __enter__(self) -> "StubLLMServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="stub-llm", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,116 @@
+"""Generazione di repository git sintetici per i benchmark delle release notes.
+
+I repository vengono costruiti con `git fast-import`, quindi anche decine di migliaia di
+commit si generano in pochi secondi senza passare da `git commit`.
+"""
+
+from __future__ import annotations
+
+import random
+import subprocess
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+COMMIT_TYPES = ["feat", "fix", "perf", "refactor", "docs", "test", "build", "ci", "style", "chore", "revert"]
+SCOPES = [None, "api", "web-core", "identifier", "notifier", "streamer", "contracts"]
+PATH_ROOTS = ["src/services/core-web", "src/web-core/src/app", "modules/ticketing", "contracts/identifier", "docs"]
+
+
+@dataclass(frozen=True)
+class RepoSpec:
+    """Parametri del repository sintetico."""
+
+    commits: int = 1000
+    body_bytes: int = 200
+    files_per_commit: int = 3
+    merge_every: int = 0  # 0 = storia lineare; N = un merge ogni N commit sul ramo principale
+    unconventional_ratio: float = 0.2
+    breaking_ratio: float = 0.02
+    seed: int = 42
+
+    def as_dict(self) -> Dict[str, object]:
+        return asdict(self)
+
+
+def _message(rng: random.Random, spec: RepoSpec, index: int) -> str:
+    if rng.random() < spec.unconventional_ratio:
+        subject = f"Update component {index}"
+    else:
+        ctype = rng.choice(COMMIT_TYPES)
+        scope = rng.choice(SCOPES)
+        bang = "!" if rng.random() < spec.breaking_ratio else ""
+        scope_part = f"({scope})" if scope else ""
+        subject = f"{ctype}{scope_part}{bang}: change number {index} (#{rng.randint(1, 500)})"
+    body = ""
+    if spec.body_bytes:
+        words = []
+        size = 0
+        while size < spec.body_bytes:
+            word = rng.choice(["update", "handler", "service", "module", "refactor", "contract", "cache", "index"])
+            words.append(word)
+            size += len(word) + 1
+        body = "\n\n" + " ".join(words)[: spec.body_bytes]
+    return subject + body + "\n"
+
+
+def _fast_import_stream(spec: RepoSpec) -> Iterator[bytes]:
+    rng = random.Random(spec.seed)
+    timestamp = 1_700_000_000
+    mark = 0
+    main_mark = 0
+    side_mark = 0
+
+    def commit(ref: str, parents: List[int], index: int) -> Iterator[bytes]:
+        nonlocal mark, timestamp
+        mark += 1
+        timestamp += 60
+        author = f"Dev {rng.randint(1, 25)} <dev{index % 25}@example.com> {timestamp} +0000"
+        message = _message(rng, spec, index).encode("utf-8")
+        out = [f"commit {ref}\nmark :{mark}\nauthor {author}\ncommitter {author}\n".encode("utf-8")]
+        out.append(f"data {len(message)}\n".encode("utf-8") + message)
+        if parents:
+            out.append(f"from :{parents[0]}\n".encode("utf-8"))
+            for parent in parents[1:]:
+                out.append(f"merge :{parent}\n".encode("utf-8"))
+        for _ in range(spec.files_per_commit):
+            root = rng.choice(PATH_ROOTS)
+            path = f"{root}/area{rng.randint(0, 40)}/file{rng.randint(0, 400)}.txt"
+            content = f"{index}\n".encode("utf-8")
+            out.append(f"M 644 inline {path}\ndata {len(content)}\n".encode("utf-8") + content)
+        out.append(b"\n")
+        yield b"".join(out)
+
+    for index in range(spec.commits):
+        if spec.merge_every and side_mark and index % spec.merge_every == spec.merge_every - 1:
+            # chiude il ramo laterale con un merge commit sul ramo principale
+            yield from commit("refs/heads/main", [main_mark, side_mark], index)
+            main_mark, side_mark = mark, 0
+        elif spec.merge_every and main_mark and index % 2:
+            yield from commit("refs/heads/side", [side_mark or main_mark], index)
+            side_mark = mark
+        else:
+            yield from commit("refs/heads/main", [main_mark] if main_mark else [], index)
+            main_mark = mark
+
+
+def build_repo(path: Path, spec: RepoSpec) -> Path:
+    """Crea un repository sintetico (bare-like, senza checkout) in `path`, con `main` come HEAD."""
+    path.mkdir(parents=True, exist_ok=True)
+    subprocess.run(["git", "init", "-q", "-b", "main", str(path)], check=True)
+    proc = subprocess.Popen(
+        ["git", "fast-import", "--quiet", "--done"],
+        cwd=path,
+        stdin=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    assert proc.stdin is not None
+    for block in _fast_import_stream(spec):
+        proc.stdin.write(block)
+    proc.stdin.write(b"done\n")
+    proc.stdin.close()
+    stderr = proc.stderr.read().decode("utf-8", errors="replace") if proc.stderr else ""
+    if proc.wait() != 0:
+        raise RuntimeError(f"git fast-import failed:\n{stderr}")
+    # HEAD punta già a `main`: il working tree non serve ai benchmark e non viene popolato
+    return path
@@ -0,0 +1,131 @@
+"""Indice persistente dei commit già analizzati per la generazione delle release notes.
+
+L'indice è un file SQLite (di default sotto `.git/release-notes/`) che associa a ogni SHA
+i campi Conventional Commit già estratti. Le esecuzioni successive analizzano solo gli SHA
+mancanti, quindi il costo di una preview cresce con i commit nuovi e non con l'intero range.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import subprocess
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Sequence
+
+INDEX_DIRNAME = "release-notes"
+INDEX_FILENAME = "commit-index.sqlite3"
+
+# SQLite limita il numero di parametri per statement (999 nelle build più vecchie).
+_LOOKUP_CHUNK = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS commits (
+    sha TEXT PRIMARY KEY,
+    author TEXT NOT NULL,
+    date TEXT NOT NULL,
+    raw_subject TEXT NOT NULL,
+    type TEXT NOT NULL,
+    scope TEXT,
+    subject TEXT NOT NULL,
+    breaking INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+@dataclass(frozen=True)
+class IndexedCommit:
+    """Campi di un commit come memorizzati nell'indice."""
+
+    sha: str
+    author: str
+    date: str
+    raw_subject: str
+    type: str
+    scope: Optional[str]
+    subject: str
+    breaking: bool
+
+
+def default_index_path(cwd: Optional[Path] = None) -> Optional[Path]:
+    """Percorso dell'indice dentro la git dir del repository corrente (None fuori da un repo)."""
+    proc = subprocess.run(
+        ["git", "rev-parse", "--absolute-git-dir"],
+        cwd=cwd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+    )
+    if proc.returncode != 0 or not proc.stdout.strip():
+        return None
+    return Path(proc.stdout.strip()) / INDEX_DIRNAME / INDEX_FILENAME
+
+
+class CommitIndex:
+    """Archivio SHA → campi Conventional Commit.
+
+    `parser_version` identifica la logica di parsing usata per popolare l'indice: se cambia,
+    le righe esistenti vengono scartate perché non più coerenti con il parser corrente.
+    """
+
+    def __init__(self, path: Path, parser_version: str) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._ensure_parser_version(parser_version)
+
+    def _ensure_parser_version(self, parser_version: str) -> None:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'parser_version'").fetchone()
+        if row and row[0] == parser_version:
+            return
+        with self._conn:
+            self._conn.execute("DELETE FROM commits")
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('parser_version', ?)",
+                (parser_version,),
+            )
+
+    def get_many(self, shas: Sequence[str]) -> Dict[str, IndexedCommit]:
+        found: Dict[str, IndexedCommit] = {}
+        for start in range(0, len(shas), _LOOKUP_CHUNK):
+            chunk = shas[start : start + _LOOKUP_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._conn.execute(
+                "SELECT sha, author, date, raw_subject, type, scope, subject, breaking "
+                f"FROM commits WHERE sha IN ({placeholders})",
+                tuple(chunk),
+            )
+            for sha, author, date, raw_subject, ctype, scope, subject, breaking in rows:
+                found[sha] = IndexedCommit(sha, author, date, raw_subject, ctype, scope, subject, bool(breaking))
+        return found
+
+    def put_many(self, commits: Iterable[IndexedCommit]) -> None:
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO commits "
+                "(sha, author, date, raw_subject, type, scope, subject, breaking) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    (c.sha, c.author, c.date, c.raw_subject, c.type, c.scope, c.subject, int(c.breaking))
+                    for c in commits
+                ),
+            )
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM commits").fetchone()[0]
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> "CommitIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,91 @@
+"""Classificatore Conventional Commits condiviso da release notes e versioning.
+
+`classify` analizza solo la prima riga del messaggio (niente `splitlines()`: la regex precompilata
+lavora con `endpos` sulla stringa originale) e restituisce in un solo passaggio tipo, scope,
+subject, breaking e livello di bump. I record usano `__slots__` per restare compatti.
+`breaking` deriva solo dal marcatore `!` dell'header o da un footer `BREAKING CHANGE`.
+"""
+
+from __future__ import annotations
+
+import re
+import sys
+from typing import Optional
+
+# Tipi con una sezione dedicata nelle release notes; gli altri finiscono in "other".
+KNOWN_TYPES = frozenset(
+    ("build", "chore", "ci", "docs", "feat", "fix", "perf", "refactor", "revert", "style", "test")
+)
+
+# Livelli di bump, allineati a `versioning.VersionBump`.
+BUMP_NONE = 0
+BUMP_PATCH = 1
+BUMP_MINOR = 2
+BUMP_MAJOR = 3
+
+# Tipi noti già in minuscolo: evita `lower()` (e una nuova stringa) nel caso comune.
+_CANONICAL_TYPES = {t: t for t in KNOWN_TYPES}
+_TYPE_BUMP = {"feat": BUMP_MINOR, "fix": BUMP_PATCH, "perf": BUMP_PATCH, "refactor": BUMP_PATCH}
+
+# Solo il prefisso `type(scope)!:`; il subject è il resto della prima riga.
+_HEADER_MATCH = re.compile(r"[ \t]*([A-Za-z]+)(?:\(([^)\n]*)\))?(!)?:[ \t]*").match
+
+
+class ConventionalCommit:
+    """Esito della classificazione di un messaggio di commit."""
+
+    __slots__ = ("type", "scope", "subject", "breaking", "bump")
+
+    def __init__(self, type: str, scope: Optional[str], subject: str, breaking: bool, bump: int) -> None:  # noqa: A002
+        self.type = type
+        self.scope = scope
+        self.subject = subject
+        self.breaking = breaking
+        self.bump = bump
+
+    @property
+    def section(self) -> str:
+        return self.type if self.type in KNOWN_TYPES else "other"
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, ConventionalCommit):
+            return NotImplemented
+        return (self.type, self.scope, self.subject, self.breaking, self.bump) == (
+            other.type, other.scope, other.subject, other.breaking, other.bump
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"ConventionalCommit(type={self.type!r}, scope={self.scope!r}, subject={self.subject!r}, "
+            f"breaking={self.breaking!r}, bump={self.bump!r})"
+        )
+
+
+def bump_level(ctype: str, breaking: bool) -> int:
+    """Livello di bump implicato dal tipo (già in minuscolo) e dal flag breaking."""
+    return BUMP_MAJOR if breaking else _TYPE_BUMP.get(ctype, BUMP_NONE)
+
+
+def classify(message: str, scan_footer: bool = True) -> ConventionalCommit:
+    """Classifica un messaggio; con `scan_footer` cerca anche `BREAKING CHANGE` nel corpo."""
+    end = message.find("\n")
+    if end < 0:
+        end = len(message)
+    breaking = scan_footer and ("BREAKING CHANGE" in message or "BREAKING-CHANGE" in message)
+    match = _HEADER_MATCH(message, 0, end)
+    if match is None:
+        return ConventionalCommit("other", None, message[:end].strip(), breaking, BUMP_MAJOR if breaking else BUMP_NONE)
+
+    ctype, scope, bang = match.groups()
+    ctype = _CANONICAL_TYPES.get(ctype) or ctype.lower()
+    if bang:
+        breaking = True
+    bump = BUMP_MAJOR if breaking else _TYPE_BUMP.get(ctype, BUMP_NONE)
+    subject = message[match.end():end].rstrip()
+    if not subject:
+        # subject vuoto: in release notes si mostra la riga intera
+        return ConventionalCommit("other", None, message[:end].strip(), breaking, bump)
+    if ctype not in KNOWN_TYPES:
+        return ConventionalCommit(ctype, None, message[:end].strip(), breaking, bump)
+    # gli scope si ripetono molto nei range lunghi: una sola copia per valore
+    return ConventionalCommit(ctype, sys.intern(scope) if scope else None, subject, breaking, bump)
@@ -22,7 +22,19 @@ import os
 import re
 import subprocess
 import sys
-from typing import Dict, List, Optional, Tuple
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+if __package__ in (None, ""):
+    # Esecuzione come script (`python tools/release_notes/generate_release_notes.py`)
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from tools.release_notes.commit_index import CommitIndex, IndexedCommit, default_index_path
+from tools.release_notes.conventional import ConventionalCommit, bump_level, classify
+from tools.release_notes.instrumentation import StageRecorder
+from tools.release_notes.issue_titles import IssueTitleCache, IssueTitleResolver, default_cache_path
 
 # -----------------------
 # Utilità di sistema
@@ -74,46 +86,230 @@ def _resolve_range(args) -> str:
         return f"{last_tag}..HEAD"
     return "origin/main..HEAD"
 
-def _git_commits(commit_range: str) -> List[Dict[str, str]]:
-    fmt = "%H%x1f%an%x1f%ad%x1f%s%x1f%b%x1e"
-    out = _run(["git", "log", commit_range, f"--pretty=format:{fmt}", "--date=short"], check=True)
-    commits = []
-    for rec in out.split("\x1e"):
-        rec = rec.strip()
-        if not rec:
-            continue
-        parts = rec.split("\x1f")
-        if len(parts) < 5:
+_GIT_LOG_FORMAT = "%H%x1f%an%x1f%ad%x1f%s%x1f%b%x1e"
+# Stessi campi con body vuoto: il rendering non lo usa e non serve tenerlo in memoria.
+_GIT_LOG_FORMAT_NO_BODY = "%H%x1f%an%x1f%ad%x1f%s%x1f%x1e"
+_GIT_LOG_CHUNK = 64 * 1024
+# Numero di SHA risolti per volta contro l'indice (e passati a `git log --stdin` se mancanti).
+_INDEX_BATCH = 512
+
+def _stream_git(
+    cmd: List[str], separator: str, stdin_data: Optional[str] = None, cwd: Optional[Path] = None
+) -> Iterator[str]:
+    """
+    Esegue un comando git e ne produce l'output record per record (diviso su `separator`).
+
+    L'output non viene mai bufferizzato per intero: in memoria resta solo il
+    record corrente (più un chunk di lettura), quindi anche range con decine di
+    migliaia di commit hanno un consumo costante. Se il consumatore interrompe
+    l'iterazione il processo `git` viene terminato.
+    """
+    proc = subprocess.Popen(
+        cmd,
+        cwd=cwd,
+        stdin=subprocess.PIPE if stdin_data is not None else subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        encoding="utf-8",
+        errors="replace",
+    )
+    completed = False
+    try:
+        if stdin_data is not None:
+            assert proc.stdin is not None
+            proc.stdin.write(stdin_data)
+            proc.stdin.close()
+        assert proc.stdout is not None
+        pending = ""
+        while True:
+            chunk = proc.stdout.read(_GIT_LOG_CHUNK)
+            if not chunk:
+                break
+            pending += chunk
+            *records, pending = pending.split(separator)
+            yield from records
+        if pending:
+            yield pending
+        completed = True
+    finally:
+        if not completed and proc.poll() is None:
+            proc.kill()
+        stderr = proc.stderr.read() if proc.stderr else ""
+        if proc.stdout:
+            proc.stdout.close()
+        if proc.stderr:
+            proc.stderr.close()
+        returncode = proc.wait()
+    if returncode != 0:
+        raise RuntimeError(f"Command failed: {' '.join(cmd)}\nSTDERR:\n{stderr}")
+
+class CommitRecord:
+    """
+    Commit letto da `git log`.
+
+    Record compatto (`__slots__`, niente dict per commit): autore e data sono internati,
+    quindi i valori ripetuti in range lunghi condividono la stessa stringa. La
+    classificazione Conventional Commits è calcolata alla prima richiesta e la riga
+    markdown viene formattata solo al momento del rendering. `files` è valorizzato solo
+    dalla lettura con `--name-only` (release notes per modulo).
+    """
+
+    __slots__ = ("hash", "author", "date", "subject", "body", "files", "_conv")
+
+    def __init__(
+        self,
+        hash: str,  # noqa: A002
+        author: str,
+        date: str,
+        subject: str,
+        body: str = "",
+        conv: Optional[ConventionalCommit] = None,
+        files: Tuple[str, ...] = (),
+    ) -> None:
+        self.hash = hash
+        self.author = sys.intern(author)
+        self.date = sys.intern(date)
+        self.subject = subject
+        self.body = body
+        self.files = files
+        self._conv = conv
+
+    @property
+    def conv(self) -> ConventionalCommit:
+        if self._conv is None:
+            self._conv = _parse_conv(self.subject)
+        return self._conv
+
+    def line(self) -> str:
+        conv = self.conv
+        scope = f"**{conv.scope}**: " if conv.scope else ""
+        brk = " **(BREAKING)**" if conv.breaking else ""
+        return f"- {scope}{conv.subject} ({self.hash[:7]}) by {self.author}{brk}"
+
+    def __repr__(self) -> str:
+        return f"CommitRecord({self.hash[:7]} {self.subject!r})"
+
+def _parse_git_record(rec: str) -> Optional[CommitRecord]:
+    # Non usare strip() senza argomenti: considera whitespace anche \x1f e
+    # farebbe perdere il campo body vuoto dei commit senza corpo.
+    rec = rec.strip("\r\n")
+    if not rec:
+        return None
+    parts = rec.split("\x1f")
+    if len(parts) < 5:
+        return None
+    h, author, date, subject, body = parts[:5]
+    return CommitRecord(h, author, date, subject.strip(), body.strip() if body else "")
+
+def _git_commits(commit_range: str, with_body: bool = True) -> Iterator[CommitRecord]:
+    """Legge `git log` in streaming dalla pipe e produce un record alla volta."""
+    fmt = _GIT_LOG_FORMAT if with_body else _GIT_LOG_FORMAT_NO_BODY
+    cmd = ["git", "log", commit_range, f"--pretty=format:{fmt}", "--date=short"]
+    for rec in _stream_git(cmd, "\x1e"):
+        commit = _parse_git_record(rec)
+        if commit:
+            yield commit
+
+def _git_commits_by_sha(shas: List[str], with_body: bool = True) -> Iterator[CommitRecord]:
+    """Legge solo gli SHA indicati (nell'ordine dato) con un unico `git log --no-walk --stdin`."""
+    fmt = _GIT_LOG_FORMAT if with_body else _GIT_LOG_FORMAT_NO_BODY
+    cmd = [
+        "git", "log", "--no-walk=unsorted", "--stdin",
+        f"--pretty=format:{fmt}", "--date=short",
+    ]
+    for rec in _stream_git(cmd, "\x1e", stdin_data="\n".join(shas) + "\n"):
+        commit = _parse_git_record(rec)
+        if commit:
+            yield commit
+
+# Con --name-only i file seguono il formato: il separatore apre il record e un \x1f chiude il body.
+_GIT_LOG_FILES_FORMAT = "%x1e%H%x1f%an%x1f%ad%x1f%s%x1f%b%x1f"
+
+def _git_commits_with_files(rev_args: List[str], cwd: Optional[Path] = None) -> Iterator[CommitRecord]:
+    """Commit e file modificati in un unico `git log --name-only` letto in streaming."""
+    cmd = [
+        "git", "-c", "core.quotePath=false", "log", *rev_args, "--name-only",
+        f"--pretty=format:{_GIT_LOG_FILES_FORMAT}", "--date=short",
+    ]
+    for rec in _stream_git(cmd, "\x1e", cwd=cwd):
+        head, sep, names = rec.rpartition("\x1f")
+        commit = _parse_git_record(head) if sep else None
+        if commit is None:
             continue
-        h, author, date, subject, body = parts[:5]
-        commits.append({
-            "hash": h,
-            "author": author,
-            "date": date,
-            "subject": subject.strip(),
-            "body": (body or "").strip(),
-        })
-    return commits
+        # i path si ripetono tra i commit: internati, una sola copia per path
+        commit.files = tuple(sys.intern(name) for name in names.split("\n") if name)
+        yield commit
+
+def _git_rev_list(commit_range: str) -> Iterator[str]:
+    for line in _stream_git(["git", "rev-list", commit_range], "\n"):
+        line = line.strip()
+        if line:
+            yield line
+
+def _batched(items: Iterable[str], size: int) -> Iterator[List[str]]:
+    batch: List[str] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _indexed_commits(commit_range: str, index: CommitIndex) -> Iterator[CommitRecord]:
+    """
+    Come `_git_commits` (senza body), ma legge da git e analizza solo gli SHA assenti dall'indice.
+
+    `git rev-list` fornisce gli SHA del range (nello stesso ordine di `git log`); quelli già
+    indicizzati vengono ricostruiti dall'indice, gli altri letti in blocco e salvati.
+    """
+    for batch in _batched(_git_rev_list(commit_range), _INDEX_BATCH):
+        known = index.get_many(batch)
+        missing = [sha for sha in batch if sha not in known]
+        if missing:
+            fresh = []
+            for c in _git_commits_by_sha(missing, with_body=False):
+                conv = c.conv
+                fresh.append(IndexedCommit(
+                    sha=c.hash,
+                    author=c.author,
+                    date=c.date,
+                    raw_subject=c.subject,
+                    type=conv.type,
+                    scope=conv.scope,
+                    subject=conv.subject,
+                    breaking=conv.breaking,
+                ))
+            index.put_many(fresh)
+            known.update((ic.sha, ic) for ic in fresh)
+        for sha in batch:
+            ic = known.get(sha)
+            if ic is None:
+                continue
+            conv = ConventionalCommit(ic.type, ic.scope, ic.subject, ic.breaking, bump_level(ic.type, ic.breaking))
+            yield CommitRecord(ic.sha, ic.author, ic.date, ic.raw_subject, conv=conv)
+
+def _open_commit_index(path: Optional[str]) -> Optional[CommitIndex]:
+    """Apre l'indice (default: sotto la git dir); in caso di problemi si procede senza."""
+    try:
+        index_path = Path(path) if path else default_index_path()
+        if index_path is None:
+            return None
+        return CommitIndex(index_path, parser_version=_PARSER_VERSION)
+    except Exception as ex:
+        sys.stderr.write(f"[release-notes] WARN: commit index disabled ({ex})\n")
+        return None
 
 # -----------------------
 # Conventional Commits parsing
 # -----------------------
 
-_CONV_RE = re.compile(
-    r"^(?P<type>build|chore|ci|docs|feat|fix|perf|refactor|revert|style|test)"
-    r"(?:\((?P<scope>[^)]+)\))?!?:\s*(?P<subject>.+)"
-)
-
-def _parse_conv(msg: str) -> Dict[str, Optional[str]]:
-    head = msg.splitlines()[0].strip()
-    m = _CONV_RE.match(head)
-    if m:
-        t = m.group("type")
-        scope = m.group("scope")
-        subject = m.group("subject").strip()
-        breaking = "!" in head
-        return {"type": t, "scope": scope, "subject": subject, "breaking": "yes" if breaking else None}
-    return {"type": "other", "scope": None, "subject": head, "breaking": None}
+# Da incrementare a ogni modifica di `_parse_conv`: invalida l'indice persistente dei commit.
+_PARSER_VERSION = "2"
+
+# Classificatore condiviso con `versioning`: legge solo la prima riga e restituisce un record con `__slots__`.
+_parse_conv = classify
 
 # -----------------------
 # PR context (facoltativo)
@@ -157,73 +353,254 @@ SECTION_TITLES = {
     "other": "🔧 Other",
 }
 
-def _format_commit_line(c: Dict[str, str], parsed: Dict[str, Optional[str]]) -> str:
-    h = c["hash"][:7]
-    scope = f"**{parsed['scope']}**: " if parsed.get("scope") else ""
-    brk = " **(BREAKING)**" if parsed.get("breaking") else ""
-    return f"- {scope}{parsed['subject']} ({h}) by {c['author']}{brk}"
+def _summarize(commits: Iterable[CommitRecord]) -> Tuple[Dict[str, List[CommitRecord]], List[CommitRecord], int]:
+    """
+    Consuma i commit una sola volta (anche da un generatore) e li raggruppa per sezione.
 
-def _summarize(commits: List[Dict[str, str]]) -> Tuple[Dict[str, List[str]], List[str]]:
-    sections: Dict[str, List[str]] = {t: [] for t in SECTION_ORDER}
-    breaking: List[str] = []
+    Sezioni e breaking contengono riferimenti agli stessi record, non righe già formattate.
+    """
+    sections: Dict[str, List[CommitRecord]] = {t: [] for t in SECTION_ORDER}
+    breaking: List[CommitRecord] = []
+    total = 0
     for c in commits:
-        parsed = _parse_conv(c["subject"])
-        t = parsed["type"] if parsed["type"] in sections else "other"
-        line = _format_commit_line(c, parsed)
-        sections[t].append(line)
-        if parsed.get("breaking"):
-            breaking.append(line)
-    return sections, breaking
+        total += 1
+        conv = c.conv
+        sections[conv.section].append(c)
+        if conv.breaking:
+            breaking.append(c)
+    return sections, breaking, total
 
 def _ensure_trailing_newline(text: str) -> str:
     text = text.rstrip("\n")
     return text + "\n"
 
 def _render_markdown(
-    commits: List[Dict[str, str]],
+    commits: Iterable[CommitRecord],
     pr_ctx: Dict[str, str],
     title: Optional[str] = None,
     version: Optional[str] = None,
 ) -> str:
-    sections, breaking = _summarize(commits)
-    lines: List[str] = []
+    sections, breaking, total = _summarize(commits)
+    lines = list(_iter_markdown_lines(sections, breaking, total, pr_ctx, title, version))
+    # un solo join: niente strip()/concatenazioni che copierebbero di nuovo tutto il documento
+    while lines and not lines[-1]:
+        lines.pop()
+    lines.append("")
+    return "\n".join(lines)
+
+def _iter_markdown_lines(
+    sections: Dict[str, List[CommitRecord]],
+    breaking: List[CommitRecord],
+    total: int,
+    pr_ctx: Dict[str, str],
+    title: Optional[str],
+    version: Optional[str],
+) -> Iterator[str]:
+    """Produce le righe del markdown formattando ogni commit solo quando viene emesso."""
     title = title or (f"Release Notes {version}" if version else "Release Notes")
 
-    lines.append(f"# {title}")
-    lines.append("")
-    lines.append(f"_Generated: {_now_utc_iso()}_")
-    lines.append("")
+    yield f"# {title}"
+    yield ""
+    yield f"_Generated: {_now_utc_iso()}_"
+    yield ""
 
     if version:
-        lines.append(f"**Version**: {version}")
-        lines.append("")
+        yield f"**Version**: {version}"
+        yield ""
 
     if pr_ctx.get("pr_number"):
-        lines.append(f"**PR**: #{pr_ctx['pr_number']} — {pr_ctx.get('pr_title','')}")
+        yield f"**PR**: #{pr_ctx['pr_number']} — {pr_ctx.get('pr_title','')}"
         if pr_ctx.get("pr_html_url"):
-            lines.append(f"**URL**: {pr_ctx['pr_html_url']}")
+            yield f"**URL**: {pr_ctx['pr_html_url']}"
         if pr_ctx.get("pr_user"):
-            lines.append(f"**Opened by**: @{pr_ctx['pr_user']}")
-        lines.append("")
+            yield f"**Opened by**: @{pr_ctx['pr_user']}"
+        yield ""
 
     if breaking:
-        lines.append("## ❗ Breaking Changes")
-        lines.extend(breaking)
-        lines.append("")
+        yield "## ❗ Breaking Changes"
+        for c in breaking:
+            yield c.line()
+        yield ""
 
     for t in SECTION_ORDER:
-        items = sections.get(t) or []
+        items = sections.get(t)
         if not items:
             continue
-        lines.append(f"## {SECTION_TITLES.get(t, t.title())}")
-        lines.extend(items)
-        lines.append("")
+        yield f"## {SECTION_TITLES.get(t, t.title())}"
+        for c in items:
+            yield c.line()
+        yield ""
+        # i record della sezione non servono più: la memoria passa dai record alle righe, non si somma
+        items.clear()
+
+    if not total:
+        yield "_No changes in the selected range._"
+        yield ""
+
+# -----------------------
+# Release notes per modulo
+# -----------------------
+
+ROOT_MODULE = ""  # chiave del gruppo con tutti i commit (release notes di repository)
+
+_ISSUE_RE = re.compile(r"(?<![\w/&])#(\d+)\b")
+
+@dataclass
+class ModuleReleaseData:
+    """Commit e issue referenziate di un modulo (o dell'intero repository per `ROOT_MODULE`)."""
+
+    name: str
+    commits: List[CommitRecord] = field(default_factory=list)
+    issues: Set[int] = field(default_factory=set)
+
+class ModulePathIndex:
+    """
+    Associa un path al modulo `<modules_root>/<nome>/` che lo contiene.
+
+    I nomi dei moduli sono calcolati una volta (dalle directory esistenti, se non indicati):
+    la ricerca per path è un confronto di prefisso più un lookup in un set.
+    """
+
+    __slots__ = ("prefix", "names")
+
+    def __init__(self, modules_root: str, names: Optional[Iterable[str]] = None) -> None:
+        self.prefix = modules_root.replace("\\", "/").strip("/") + "/"
+        self.names = frozenset(names) if names is not None else None
+
+    @classmethod
+    def from_tree(cls, modules_root: str, repo_root: Optional[Path] = None) -> "ModulePathIndex":
+        base = (repo_root or Path.cwd()) / modules_root
+        if not base.is_dir():
+            return cls(modules_root, ())
+        return cls(modules_root, (p.name for p in base.iterdir() if p.is_dir() and not p.name.startswith(".")))
+
+    def module_for(self, path: str) -> Optional[str]:
+        prefix = self.prefix
+        if not path.startswith(prefix):
+            return None
+        end = path.find("/", len(prefix))
+        if end < 0:
+            return None  # file direttamente sotto la root dei moduli
+        name = path[len(prefix):end]
+        if self.names is not None and name not in self.names:
+            return None
+        return name
+
+def determine_commits(base_ref: str, head_ref: str = "HEAD", repo_root: Optional[Path] = None) -> List[CommitRecord]:
+    """
+    Commit del range (dal più recente) con i file toccati, letti con un solo `git log --name-only`.
+
+    `repo_root` è la directory in cui eseguire git (default: la directory corrente).
+    """
+    commit_range = f"{base_ref}..{head_ref}" if base_ref else head_ref
+    return list(_git_commits_with_files([commit_range], cwd=repo_root))
+
+def load_commit(sha: str, repo_root: Optional[Path] = None) -> CommitRecord:
+    """Un singolo commit con i file toccati."""
+    for commit in _git_commits_with_files(["--no-walk", sha], cwd=repo_root):
+        return commit
+    raise RuntimeError(f"Commit non trovato: {sha}")
+
+def _issue_refs(commit: CommitRecord) -> Set[int]:
+    refs = {int(n) for n in _ISSUE_RE.findall(commit.subject)}
+    if commit.body:
+        refs.update(int(n) for n in _ISSUE_RE.findall(commit.body))
+    return refs
+
+def group_commits_by_module(
+    commits: Iterable[CommitRecord],
+    modules_root: str = "modules",
+    index: Optional[ModulePathIndex] = None,
+) -> Dict[str, ModuleReleaseData]:
+    """
+    Raggruppa i commit per modulo in un solo passaggio sui file toccati.
 
-    if not commits:
-        lines.append("_No changes in the selected range._")
-        lines.append("")
+    `ROOT_MODULE` contiene sempre tutti i commit; un commit compare in ogni modulo di cui
+    tocca almeno un file (una sola volta per modulo).
+    """
+    index = index or ModulePathIndex.from_tree(modules_root)
+    grouped: Dict[str, ModuleReleaseData] = {ROOT_MODULE: ModuleReleaseData(ROOT_MODULE)}
+    root = grouped[ROOT_MODULE]
+    for commit in commits:
+        issues = _issue_refs(commit)
+        root.commits.append(commit)
+        root.issues.update(issues)
+        touched: Set[str] = set()
+        for path in commit.files:
+            name = index.module_for(path)
+            if name is None or name in touched:
+                continue
+            touched.add(name)
+            data = grouped.get(name)
+            if data is None:
+                data = grouped[name] = ModuleReleaseData(name)
+            data.commits.append(commit)
+            data.issues.update(issues)
+    return grouped
+
+def fetch_issue_titles(repo: str, issues: Iterable[int], github_token: Optional[str] = None) -> Dict[int, str]:
+    """
+    Titoli delle issue GitHub referenziate; quelle non leggibili vengono ignorate.
 
-    return _ensure_trailing_newline("\n".join(lines).strip())
+    Le richieste vanno a blocchi via GraphQL e i risultati restano nella cache locale
+    (`issue_titles.default_cache_path()`), rivalidata a ogni esecuzione.
+    """
+    numbers = {int(n) for n in issues}
+    if not repo or not numbers:
+        return {}
+    cache = None
+    try:
+        cache_path = default_cache_path()
+        cache = IssueTitleCache(cache_path) if cache_path else None
+    except Exception as ex:
+        sys.stderr.write(f"[release-notes] WARN: issue title cache disabled ({ex})\n")
+    try:
+        return IssueTitleResolver(repo, github_token, cache=cache).resolve(numbers)
+    finally:
+        if cache:
+            cache.close()
+
+def _render_release_file(
+    data: ModuleReleaseData,
+    version: str,
+    issue_titles: Dict[int, str],
+) -> str:
+    title = f"Release Notes {version}" if data.name == ROOT_MODULE else f"Release Notes {data.name} {version}"
+    text = _render_markdown(data.commits, {}, title=title, version=version)
+    if not data.issues:
+        return text
+    lines = ["", "## 🔗 Issues"]
+    for number in sorted(data.issues):
+        issue_title = issue_titles.get(number)
+        lines.append(f"- #{number} {issue_title}" if issue_title else f"- #{number}")
+    return text + "\n".join(lines) + "\n"
+
+def write_release_notes(
+    *,
+    repo_root: Path,
+    modules_root: str,
+    version: str,
+    grouped: Dict[str, ModuleReleaseData],
+    issue_titles: Dict[int, str],
+    release_dir_name: str = "ReleaseNotes",
+) -> List[Path]:
+    """
+    Scrive in un solo passaggio `<release_dir>/<version>.md` e `<modules_root>/<nome>/<release_dir>/<version>.md`.
+
+    Usa solo i dati già raggruppati: git non viene riletto per i singoli moduli.
+    """
+    written: List[Path] = []
+    for name, data in grouped.items():
+        if name == ROOT_MODULE:
+            target_dir = repo_root / release_dir_name
+        else:
+            target_dir = repo_root / modules_root / name / release_dir_name
+        target_dir.mkdir(parents=True, exist_ok=True)
+        target = target_dir / f"{version}.md"
+        with open(target, "w", encoding="utf-8", newline="\n") as f:
+            f.write(_render_release_file(data, version, issue_titles))
+        written.append(target)
+    return written
 
 # -----------------------
 # LLM enrichment (facoltativo)
@@ -232,7 +609,7 @@ def _render_markdown(
 def _llm_enabled() -> bool:
     return (os.environ.get("ENABLE_LLM") or "").lower() in ("1", "true", "yes")
 
-def _enrich_with_llm(markdown_notes: str) -> str:
+def _enrich_with_llm(markdown_notes: str, recorder: Optional[StageRecorder] = None) -> str:
     if not _llm_enabled():
         return markdown_notes
 
@@ -277,9 +654,17 @@ def _enrich_with_llm(markdown_notes: str) -> str:
         if provider == "azure":
             payload.pop("model", None)
 
-        resp = requests.post(url, headers=headers, json=payload, timeout=60)
-        resp.raise_for_status()
-        data = resp.json()
+        started = time.perf_counter()
+        try:
+            resp = requests.post(url, headers=headers, json=payload, timeout=60)
+            resp.raise_for_status()
+            data = resp.json()
+        except Exception:
+            if recorder:
+                recorder.record_llm("llm_enrich", time.perf_counter() - started, ok=False)
+            raise
+        if recorder:
+            recorder.record_llm("llm_enrich", time.perf_counter() - started, data.get("usage"))
         content = data["choices"][0]["message"]["content"].strip()
         # Se il modello ha (per errore) già incluso l'originale, evita di appenderlo di nuovo
         title_line = markdown_notes.splitlines()[0] if markdown_notes else ""
@@ -314,22 +699,56 @@ def parse_args(argv: Optional[List[str]] = None):
     p.add_argument("--version", dest="version", help="Versione da riportare in testa (legacy compat)")
     p.add_argument("--out", dest="out", help="Percorso file output (alias di --output)")
 
+    # Indice persistente dei commit
+    p.add_argument("--commit-index", dest="commit_index", help="Percorso dell'indice SQLite dei commit (default: .git/release-notes/)")
+    p.add_argument("--no-commit-index", action="store_true", help="Rilegge e rianalizza tutti i commit senza usare l'indice")
+
     # LLM
     p.add_argument("--no-llm", action="store_true", help="Disabilita arricchimento LLM (ignora ENABLE_LLM)")
+
+    # Strumentazione (anche via env RELEASE_NOTES_TIMINGS=1|<percorso json>)
+    p.add_argument("--timings", nargs="?", const="", default=None, metavar="PATH",
+                   help="Registra tempi/CPU/RSS per fase in un JSON (default: <output>.timings.json) e nello step summary")
+    p.add_argument("--profile", nargs="?", const="release-notes-profile", default=None, metavar="DIR",
+                   help="Profila le fasi principali con cProfile (o pyinstrument con RELEASE_NOTES_PROFILER=pyinstrument)")
     return p.parse_args(argv)
 
-def _build_notes(args) -> str:
-    commit_range = _resolve_range(args)
-    commits = _git_commits(commit_range)
-    pr_ctx = _load_pr_context()
+def _timings_target(args, output_path: Optional[str]) -> Tuple[bool, Optional[Path]]:
+    """Decide se registrare le fasi e dove scrivere il JSON (flag --timings o env RELEASE_NOTES_TIMINGS)."""
+    raw = args.timings
+    if raw is None:
+        env = (os.environ.get("RELEASE_NOTES_TIMINGS") or "").strip()
+        if env.lower() in ("", "0", "false", "no"):
+            return (args.profile is not None), None
+        raw = "" if env.lower() in ("1", "true", "yes") else env
+    if raw:
+        return True, Path(raw)
+    default = f"{output_path}.timings.json" if output_path else "release-notes-timings.json"
+    return True, Path(default)
+
+def _build_notes(args, recorder: Optional[StageRecorder] = None) -> str:
+    recorder = recorder or StageRecorder()
+    with recorder.stage("resolve_range"):
+        commit_range = _resolve_range(args)
+    with recorder.stage("load_pr_context"):
+        pr_ctx = _load_pr_context()
 
     # Titolo: priorità a --title, poi "Release Notes {version}" se presente
     title = args.title or (f"Release Notes {args.version}" if args.version else None)
-    base_text = _render_markdown(commits, pr_ctx, title=title, version=args.version)
+    index = None if args.no_commit_index else _open_commit_index(args.commit_index)
+    try:
+        commits = _indexed_commits(commit_range, index) if index is not None else _git_commits(commit_range, with_body=False)
+        # il rendering consuma git log in streaming: "git_log" misura solo il tempo speso nel generatore
+        with recorder.stage("render"):
+            base_text = _render_markdown(recorder.timed_iter("git_log", commits), pr_ctx, title=title, version=args.version)
+    finally:
+        if index is not None:
+            index.close()
 
     if args.no_llm:
         return base_text
-    return _enrich_with_llm(base_text)
+    with recorder.stage("llm_enrich"):
+        return _enrich_with_llm(base_text, recorder)
 
 def _write_output(text: str, path: Optional[str]) -> None:
     if path:
@@ -344,13 +763,21 @@ def main(argv: Optional[List[str]] = None) -> int:
 
     # Normalizza alias legacy
     output_path = args.output or args.out  # --out è alias
+    enabled, sidecar = _timings_target(args, output_path)
+    recorder = StageRecorder(enabled=enabled, profile_dir=Path(args.profile) if args.profile else None)
     try:
-        notes = _build_notes(args)
-        _write_output(notes, output_path)
+        notes = _build_notes(args, recorder)
+        with recorder.stage("write_output"):
+            _write_output(notes, output_path)
         return 0
     except Exception as ex:
         sys.stderr.write(f"[release-notes] ERROR: {ex}\n")
         return 1
+    finally:
+        try:
+            recorder.write(sidecar)
+        except OSError as ex:
+            sys.stderr.write(f"[release-notes] WARN: cannot write timings ({ex})\n")
 
 if __name__ == "__main__":
     raise SystemExit(main())
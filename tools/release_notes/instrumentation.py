@@ -0,0 +1,191 @@
+"""Misurazione per fase della generazione release notes (tempi, CPU, memoria, chiamate LLM).
+
+Il `StageRecorder` registra per ogni fase tempo wall, tempo CPU e picco RSS del processo;
+facoltativamente profila le fasi con cProfile (o pyinstrument se installato). I risultati
+vengono scritti in un file JSON accanto all'output e, in GitHub Actions, nello step summary.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import os
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+try:  # non disponibile su Windows
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None  # type: ignore[assignment]
+
+T = TypeVar("T")
+
+# Fasi profilate con --profile: le altre sono trascurabili e sporcherebbero il report.
+HOT_STAGES = ("render", "llm_enrich")
+
+
+def _peak_rss_kib() -> Optional[int]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux riporta KiB, macOS byte
+    return int(peak / 1024) if sys.platform == "darwin" else int(peak)
+
+
+@dataclass
+class StageTiming:
+    name: str
+    wall_s: float = 0.0
+    cpu_s: float = 0.0
+    peak_rss_kib: Optional[int] = None
+    calls: int = 0
+
+
+@dataclass
+class LLMCall:
+    stage: str
+    latency_s: float
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    ok: bool = True
+
+
+@dataclass
+class StageRecorder:
+    """Raccoglie le misure delle fasi; se disabilitato ogni metodo è un no-op."""
+
+    enabled: bool = False
+    profile_dir: Optional[Path] = None
+    profile_stages: Tuple[str, ...] = HOT_STAGES
+    stages: Dict[str, StageTiming] = field(default_factory=dict)
+    llm_calls: List[LLMCall] = field(default_factory=list)
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+        with self._profiled(name):
+            wall = time.perf_counter()
+            cpu = time.process_time()
+            try:
+                yield
+            finally:
+                self._add(name, time.perf_counter() - wall, time.process_time() - cpu)
+
+    def timed_iter(self, name: str, items: Iterable[T]) -> Iterator[T]:
+        """Attribuisce a `name` solo il tempo speso dentro l'iteratore (es. lettura `git log` in streaming)."""
+        if not self.enabled:
+            yield from items
+            return
+        iterator = iter(items)
+        while True:
+            wall = time.perf_counter()
+            cpu = time.process_time()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self._add(name, time.perf_counter() - wall, time.process_time() - cpu)
+                return
+            self._add(name, time.perf_counter() - wall, time.process_time() - cpu, calls=0)
+            yield item
+
+    def _add(self, name: str, wall: float, cpu: float, calls: int = 1) -> None:
+        timing = self.stages.setdefault(name, StageTiming(name))
+        timing.wall_s += wall
+        timing.cpu_s += cpu
+        timing.calls += calls
+        timing.peak_rss_kib = _peak_rss_kib()
+
+    @contextlib.contextmanager
+    def _profiled(self, name: str) -> Iterator[None]:
+        if self.profile_dir is None or name not in self.profile_stages:
+            yield
+            return
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        if (os.environ.get("RELEASE_NOTES_PROFILER") or "").lower() == "pyinstrument":
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                Profiler = None  # noqa: N806
+            if Profiler is not None:
+                profiler = Profiler()
+                profiler.start()
+                try:
+                    yield
+                finally:
+                    profiler.stop()
+                    (self.profile_dir / f"{name}.html").write_text(profiler.output_html(), encoding="utf-8")
+                return
+        import cProfile
+        import io
+        import pstats
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(str(self.profile_dir / f"{name}.prof"))
+            text = io.StringIO()
+            pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(25)
+            (self.profile_dir / f"{name}.txt").write_text(text.getvalue(), encoding="utf-8")
+
+    def record_llm(
+        self,
+        stage: str,
+        latency_s: float,
+        usage: Optional[dict] = None,
+        ok: bool = True,
+    ) -> None:
+        if not self.enabled:
+            return
+        usage = usage or {}
+        self.llm_calls.append(
+            LLMCall(stage, round(latency_s, 6), usage.get("prompt_tokens"), usage.get("completion_tokens"), ok)
+        )
+
+    def to_dict(self) -> Dict[str, object]:
+        stages = []
+        for t in self.stages.values():
+            item = asdict(t)
+            item["wall_s"] = round(t.wall_s, 6)
+            item["cpu_s"] = round(t.cpu_s, 6)
+            stages.append(item)
+        return {
+            "stages": stages,
+            "llm_calls": [asdict(c) for c in self.llm_calls],
+            "peak_rss_kib": _peak_rss_kib(),
+        }
+
+    def to_markdown(self, title: str = "Release notes timings") -> str:
+        lines = [f"### {title}", "", "| Stage | Wall (s) | CPU (s) | Peak RSS (MiB) |", "|---|---:|---:|---:|"]
+        for t in self.stages.values():
+            rss = f"{t.peak_rss_kib / 1024:.1f}" if t.peak_rss_kib is not None else "n/a"
+            lines.append(f"| {t.name} | {t.wall_s:.3f} | {t.cpu_s:.3f} | {rss} |")
+        if self.llm_calls:
+            latency = sum(c.latency_s for c in self.llm_calls)
+            prompt = sum(c.prompt_tokens or 0 for c in self.llm_calls)
+            completion = sum(c.completion_tokens or 0 for c in self.llm_calls)
+            lines += [
+                "",
+                f"LLM: {len(self.llm_calls)} call(s), {latency:.3f}s total latency, "
+                f"{prompt} prompt / {completion} completion tokens",
+            ]
+        return "\n".join(lines) + "\n"
+
+    def write(self, sidecar: Optional[Path]) -> None:
+        """Scrive il JSON (se richiesto) e aggiunge la tabella allo step summary di GitHub Actions."""
+        if not self.enabled:
+            return
+        if sidecar is not None:
+            sidecar.parent.mkdir(parents=True, exist_ok=True)
+            sidecar.write_text(json.dumps(self.to_dict(), indent=2) + "\n", encoding="utf-8")
+        summary = os.environ.get("GITHUB_STEP_SUMMARY")
+        if summary:
+            with open(summary, "a", encoding="utf-8") as handle:
+                handle.write(self.to_markdown() + "\n")
@@ -0,0 +1,287 @@
+"""Risoluzione dei titoli delle issue GitHub referenziate nelle release notes.
+
+I titoli mancanti vengono letti via GraphQL a blocchi di 100 (un alias `issueOrPullRequest`
+per numero), quindi una release con centinaia di riferimenti costa poche richieste invece di
+una per issue. I risultati restano in una cache SQLite locale (di default accanto all'indice
+dei commit, sotto `.git/release-notes/`). Prima di riusarli la cache viene rivalidata con una
+sola `GET /repos/{repo}/issues?since=<cursore>` condizionale (`If-None-Match`): una risposta
+304 conferma tutte le voci senza consumare rate limit, una 200 porta solo le issue modificate
+dopo il cursore, confrontate per `updated_at`.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import email.utils
+import os
+import re
+import sqlite3
+import sys
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from tools.release_notes.commit_index import default_index_path
+
+CACHE_FILENAME = "issue-titles.sqlite3"
+GRAPHQL_BATCH = 100
+
+_LOOKUP_CHUNK = 500
+_NEXT_LINK_RE = re.compile(r'<([^>]+)>;\s*rel="next"')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS issues (
+    repo TEXT NOT NULL,
+    number INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (repo, number)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS revalidation (
+    repo TEXT PRIMARY KEY,
+    since TEXT NOT NULL,
+    etag TEXT
+);
+"""
+
+
+def default_cache_path() -> Optional[Path]:
+    """`RELEASE_NOTES_ISSUE_CACHE` oppure `.git/release-notes/issue-titles.sqlite3` (None fuori da un repo)."""
+    override = os.environ.get("RELEASE_NOTES_ISSUE_CACHE")
+    if override:
+        return Path(override)
+    index_path = default_index_path()
+    return index_path.with_name(CACHE_FILENAME) if index_path else None
+
+
+def _utc_now_iso() -> str:
+    return dt.datetime.now(dt.timezone.utc).replace(microsecond=0).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _server_time(headers: Any) -> str:
+    """Orario della risposta secondo GitHub (header `Date`), per non dipendere dall'orologio locale."""
+    raw = headers.get("Date") if headers else None
+    if raw:
+        try:
+            parsed = email.utils.parsedate_to_datetime(raw)
+            return parsed.astimezone(dt.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        except (TypeError, ValueError):
+            pass
+    return _utc_now_iso()
+
+
+class IssueTitleCache:
+    """Archivio (repo, numero) → titolo e `updated_at`, con il cursore di rivalidazione per repo."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def get_many(self, repo: str, numbers: Sequence[int]) -> Dict[int, Tuple[str, str]]:
+        found: Dict[int, Tuple[str, str]] = {}
+        for start in range(0, len(numbers), _LOOKUP_CHUNK):
+            chunk = numbers[start : start + _LOOKUP_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._conn.execute(
+                f"SELECT number, title, updated_at FROM issues WHERE repo = ? AND number IN ({placeholders})",
+                (repo, *chunk),
+            )
+            for number, title, updated_at in rows:
+                found[number] = (title, updated_at)
+        return found
+
+    def put_many(self, repo: str, items: Iterable[Tuple[int, str, str]]) -> None:
+        with self._conn:
+            # una versione più vecchia (updated_at minore) non sovrascrive quella in cache
+            self._conn.executemany(
+                "INSERT INTO issues (repo, number, title, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (repo, number) DO UPDATE SET title = excluded.title, updated_at = excluded.updated_at "
+                "WHERE excluded.updated_at >= issues.updated_at",
+                ((repo, number, title, updated_at) for number, title, updated_at in items),
+            )
+
+    def revalidation(self, repo: str) -> Tuple[Optional[str], Optional[str]]:
+        row = self._conn.execute("SELECT since, etag FROM revalidation WHERE repo = ?", (repo,)).fetchone()
+        return (row[0], row[1]) if row else (None, None)
+
+    def set_revalidation(self, repo: str, since: str, etag: Optional[str]) -> None:
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO revalidation (repo, since, etag) VALUES (?, ?, ?)",
+                (repo, since, etag),
+            )
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> "IssueTitleCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class IssueTitleResolver:
+    """Titoli di issue e pull request di un repository, con cache locale e richieste a blocchi."""
+
+    def __init__(
+        self,
+        repo: str,
+        token: Optional[str] = None,
+        cache: Optional[IssueTitleCache] = None,
+        api_url: Optional[str] = None,
+        graphql_url: Optional[str] = None,
+        client: Any = None,
+        batch_size: int = GRAPHQL_BATCH,
+    ) -> None:
+        self.repo = repo
+        self.owner, _, self.name = repo.partition("/")
+        self.token = token
+        self.cache = cache
+        self.api_url = (api_url or os.environ.get("GITHUB_API_URL") or "https://api.github.com").rstrip("/")
+        self.graphql_url = graphql_url or os.environ.get("GITHUB_GRAPHQL_URL") or f"{self.api_url}/graphql"
+        self.batch_size = max(1, min(batch_size, GRAPHQL_BATCH))
+        self.requests_made = 0
+        if client is None:
+            # import locale, niente internet in fase di lint
+            from tools.github_http import shared_client
+
+            # pool, limiti e backoff condivisi con gli altri script GitHub dello stesso processo
+            client = shared_client(token, user_agent="release-notes")
+        self.client = client
+
+    # -- API pubblica -----------------------------------------------------------------------
+
+    def resolve(self, numbers: Iterable[int]) -> Dict[int, str]:
+        wanted = sorted({int(n) for n in numbers})
+        if not wanted or not self.name:
+            return {}
+        cached = self.cache.get_many(self.repo, wanted) if self.cache else {}
+        titles = {number: title for number, (title, _) in cached.items()}
+        if cached:
+            titles.update(self._revalidate(cached))
+        missing = [n for n in wanted if n not in titles]
+        if missing:
+            fetched = self._fetch_graphql(missing) if self.token else self._fetch_rest(missing)
+            titles.update((number, title) for number, (title, _) in fetched.items())
+        return titles
+
+    # -- rivalidazione ----------------------------------------------------------------------
+
+    def _revalidate(self, cached: Dict[int, Tuple[str, str]]) -> Dict[int, str]:
+        """Aggiorna le voci in cache modificate dopo il cursore; 304 = nessuna modifica."""
+        assert self.cache is not None
+        since, etag = self.cache.revalidation(self.repo)
+        if since is None:
+            return {}
+        url: Optional[str] = f"{self.api_url}/repos/{self.repo}/issues"
+        params: Optional[Dict[str, Any]] = {"state": "all", "since": since, "per_page": 100}
+        headers = {"If-None-Match": etag} if etag else {}
+        updated: Dict[int, str] = {}
+        changed: List[Tuple[int, str, str]] = []
+        first_etag: Optional[str] = None
+        server_time = since
+        while url:
+            resp = self._request("GET", url, params=params, headers=headers)
+            if resp is None:
+                return updated
+            if resp.status_code == 304:
+                return updated
+            if resp.status_code != 200:
+                sys.stderr.write(f"[release-notes] WARN: issue cache revalidation failed ({resp.status_code})\n")
+                return updated
+            if first_etag is None:
+                first_etag = resp.headers.get("ETag")
+                server_time = _server_time(resp.headers)
+            for item in resp.json() or []:
+                number = int(item.get("number") or 0)
+                title = item.get("title") or ""
+                updated_at = item.get("updated_at") or ""
+                changed.append((number, title, updated_at))
+                if number in cached and updated_at > cached[number][1]:
+                    updated[number] = title
+            url = self._next_link(resp)
+            params = None  # il link "next" contiene già i parametri
+            headers = {}
+        if changed:
+            # il cursore avanza: l'ETag riguardava l'URL con il vecchio `since` e non vale più
+            self.cache.put_many(self.repo, changed)
+            self.cache.set_revalidation(self.repo, server_time, None)
+        else:
+            # stesso URL alla prossima esecuzione: con l'ETag GitHub risponderà 304
+            self.cache.set_revalidation(self.repo, since, first_etag)
+        return updated
+
+    # -- lettura delle voci mancanti -----------------------------------------------------------
+
+    def _fetch_graphql(self, numbers: Sequence[int]) -> Dict[int, Tuple[str, str]]:
+        fetched: Dict[int, Tuple[str, str]] = {}
+        started: Optional[str] = None
+        for start in range(0, len(numbers), self.batch_size):
+            chunk = numbers[start : start + self.batch_size]
+            fields = "\n".join(
+                f"i{n}: issueOrPullRequest(number: {n}) {{ ... on Issue {{ title updatedAt }} "
+                f"... on PullRequest {{ title updatedAt }} }}"
+                for n in chunk
+            )
+            query = f"query($owner: String!, $name: String!) {{ repository(owner: $owner, name: $name) {{\n{fields}\n}} }}"
+            resp = self._request(
+                "POST",
+                self.graphql_url,
+                json={"query": query, "variables": {"owner": self.owner, "name": self.name}},
+            )
+            if resp is None or resp.status_code != 200:
+                status = getattr(resp, "status_code", "n/a")
+                sys.stderr.write(f"[release-notes] WARN: GraphQL issue lookup failed ({status})\n")
+                continue
+            started = started or _server_time(resp.headers)
+            payload = resp.json() or {}
+            # numeri inesistenti producono errori NOT_FOUND accanto ai dati validi: si ignorano
+            repository = (payload.get("data") or {}).get("repository") or {}
+            for n in chunk:
+                node = repository.get(f"i{n}")
+                if node and node.get("title") is not None:
+                    fetched[n] = (node["title"], node.get("updatedAt") or "")
+        self._store(fetched, started)
+        return fetched
+
+    def _fetch_rest(self, numbers: Sequence[int]) -> Dict[int, Tuple[str, str]]:
+        """Senza token GraphQL non è disponibile: una richiesta per issue."""
+        fetched: Dict[int, Tuple[str, str]] = {}
+        started: Optional[str] = None
+        for n in numbers:
+            resp = self._request("GET", f"{self.api_url}/repos/{self.repo}/issues/{n}")
+            if resp is None or resp.status_code != 200:
+                continue
+            started = started or _server_time(resp.headers)
+            item = resp.json() or {}
+            fetched[n] = (item.get("title") or "", item.get("updated_at") or "")
+        self._store(fetched, started)
+        return fetched
+
+    def _store(self, fetched: Dict[int, Tuple[str, str]], started: Optional[str]) -> None:
+        if not self.cache or not fetched:
+            return
+        self.cache.put_many(self.repo, ((n, title, updated) for n, (title, updated) in fetched.items()))
+        since, _ = self.cache.revalidation(self.repo)
+        if since is None and started:
+            # prima popolazione: le modifiche successive a questa lettura verranno rivalidate
+            self.cache.set_revalidation(self.repo, started, None)
+
+    # -- HTTP ---------------------------------------------------------------------------------
+
+    def _request(self, method: str, url: str, **kwargs: Any) -> Any:
+        self.requests_made += 1
+        try:
+            return self.client.request(method, url, timeout=30, **kwargs)
+        except Exception as ex:
+            sys.stderr.write(f"[release-notes] WARN: GitHub request failed ({ex})\n")
+            return None
+
+    @staticmethod
+    def _next_link(resp: Any) -> Optional[str]:
+        match = _NEXT_LINK_RE.search(resp.headers.get("Link") or "")
+        return match.group(1) if match else None
@@ -0,0 +1,130 @@
+"""Regole path → bump per i commit privi di un tipo Conventional Commit significativo.
+
+Le regole arrivano da `bump_rules.yaml` (o dal file indicato in `RELEASE_BUMP_RULES`) e vengono
+compilate in un trie di prefissi per segmento di path più un insieme di estensioni: ogni file
+viene classificato una sola volta, con un'unica discesa nel trie. Per ogni path vale il prefisso
+più lungo che corrisponde (così le regole di un modulo possono restringere quelle generali) e,
+se più alta, la regola sull'estensione; per un commit vince il bump massimo tra i file toccati.
+"""
+
+from __future__ import annotations
+
+import functools
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, Mapping, Optional
+
+from tools.release_notes.conventional import BUMP_MAJOR, BUMP_MINOR, BUMP_NONE, BUMP_PATCH
+
+DEFAULT_RULES_PATH = Path(__file__).with_name("bump_rules.yaml")
+
+BUMP_NAMES = {"none": BUMP_NONE, "patch": BUMP_PATCH, "minor": BUMP_MINOR, "major": BUMP_MAJOR}
+
+# Usate se il file di configurazione manca: equivalgono alle regole storiche di `versioning`.
+DEFAULT_RULES: Dict[str, Any] = {
+    "prefixes": {"contracts/": "major", "src/": "minor", "modules/": "minor", "docs/": "patch"},
+    "extensions": {".proto": "major"},
+}
+
+_VALUE = ""  # chiave del nodo che contiene il bump (i segmenti di path non sono mai vuoti)
+
+
+def _bump_value(raw: Any, where: str) -> int:
+    if isinstance(raw, int) and BUMP_NONE <= raw <= BUMP_MAJOR:
+        return raw
+    value = BUMP_NAMES.get(str(raw).strip().lower())
+    if value is None:
+        raise ValueError(f"Bump non valido per {where!r}: {raw!r} (attesi: {', '.join(BUMP_NAMES)})")
+    return value
+
+
+class PathRules:
+    """Regole compilate: trie dei prefissi (per segmento, anche file singoli) e mappa estensione → bump."""
+
+    __slots__ = ("_trie", "_extensions", "_max_depth")
+
+    def __init__(self, prefixes: Mapping[str, int], extensions: Mapping[str, int]) -> None:
+        self._trie: Dict[str, Any] = {}
+        self._max_depth = 0
+        for prefix, bump in prefixes.items():
+            segments = [s for s in prefix.lower().strip("/").split("/") if s]
+            if not segments:
+                continue
+            node = self._trie
+            for segment in segments:
+                node = node.setdefault(segment, {})
+            node[_VALUE] = bump
+            self._max_depth = max(self._max_depth, len(segments))
+        self._extensions = {("." + ext.lower().lstrip(".")): bump for ext, bump in extensions.items()}
+
+    @classmethod
+    def from_mapping(cls, data: Mapping[str, Any]) -> "PathRules":
+        prefixes: Dict[str, int] = {}
+        for prefix, raw in (data.get("prefixes") or {}).items():
+            prefixes[str(prefix)] = _bump_value(raw, prefix)
+        extensions = {str(ext): _bump_value(raw, ext) for ext, raw in (data.get("extensions") or {}).items()}
+        # regole per modulo: prefissi relativi a modules/<nome>/
+        for module, rules in (data.get("modules") or {}).items():
+            base = f"modules/{str(module).strip('/')}/"
+            for prefix, raw in ((rules or {}).get("prefixes") or {}).items():
+                prefixes[base + str(prefix).lstrip("/")] = _bump_value(raw, f"{base}{prefix}")
+            if "default" in (rules or {}):
+                prefixes[base] = _bump_value(rules["default"], base)
+        return cls(prefixes, extensions)
+
+    @classmethod
+    def load(cls, path: Optional[Path] = None) -> "PathRules":
+        """Carica le regole da YAML; senza file si usano `DEFAULT_RULES`."""
+        path = path or DEFAULT_RULES_PATH
+        if not path.exists():
+            return cls.from_mapping(DEFAULT_RULES)
+        import yaml
+
+        data = yaml.safe_load(path.read_text(encoding="utf-8")) or {}
+        if not isinstance(data, dict):
+            raise ValueError(f"{path}: attesa una mappa di regole")
+        return cls.from_mapping(data)
+
+    def classify(self, path: str) -> int:
+        """Bump del singolo path: prefisso più lungo che corrisponde, alzato dalla regola sull'estensione."""
+        path = path.strip().lower()
+        bump = BUMP_NONE
+        node = self._trie
+        start = 0
+        for _ in range(self._max_depth):
+            end = path.find("/", start)
+            node = node.get(path[start:] if end < 0 else path[start:end])
+            if node is None:
+                break
+            bump = node.get(_VALUE, bump)
+            if end < 0:
+                break
+            start = end + 1
+        if self._extensions:
+            dot = path.rfind(".")
+            if dot > path.rfind("/"):
+                ext_bump = self._extensions.get(path[dot:])
+                if ext_bump is not None and ext_bump > bump:
+                    bump = ext_bump
+        return bump
+
+    def max_bump(self, files: Iterable[str]) -> int:
+        """Bump massimo tra i file, interrompendo la scansione al primo MAJOR."""
+        bump = BUMP_NONE
+        for file_path in files:
+            value = self.classify(file_path)
+            if value > bump:
+                if value == BUMP_MAJOR:
+                    return value
+                bump = value
+        return bump
+
+
+@functools.lru_cache(maxsize=None)
+def _load_cached(path: Optional[str]) -> PathRules:
+    return PathRules.load(Path(path) if path else None)
+
+
+def get_path_rules() -> PathRules:
+    """Regole condivise del processo (file indicato da `RELEASE_BUMP_RULES` o quello di default)."""
+    return _load_cached(os.environ.get("RELEASE_BUMP_RULES") or None)
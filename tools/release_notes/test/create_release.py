@@ -10,16 +10,15 @@ from pathlib import Path
 from typing import Iterable, Optional, Sequence
 
 from tools.release_notes.generate_release_notes import (
+    ModulePathIndex,
     determine_commits,
     fetch_issue_titles,
     group_commits_by_module,
-    load_commit,
     write_release_notes,
 )
-from tools.release_notes.versioning import (
-    collect_commits,
+from tools.release_notes.test.versioning import (
     get_latest_tag,
-    plan_next_version,
+    plan_release,
     run_git,
 )
 
@@ -71,11 +70,12 @@ def generate_release_notes(
     modules_root: str,
     release_dir: str,
 ) -> Iterable[Path]:
-    commits_sha = determine_commits(base_ref or "", "HEAD")
-    if not commits_sha:
+    commits = determine_commits(base_ref or "", "HEAD", repo_root=repository_root)
+    if not commits:
         return []
-    commits = [load_commit(sha) for sha in commits_sha]
-    grouped = group_commits_by_module(commits, modules_root)
+    # i moduli si cercano sotto la root del repository, non nella directory corrente
+    index = ModulePathIndex.from_tree(modules_root, repository_root)
+    grouped = group_commits_by_module(commits, modules_root, index=index)
 
     all_issues = set()
     for data in grouped.values():
@@ -107,15 +107,20 @@ def create_tag_and_branch(repository_root: Path, version: str, tag_prefix: str)
     run_git(["branch", f"release/{tag_name}", "HEAD"], cwd=repository_root)
 
 
+def default_repository_root() -> Path:
+    """Root del repository git che contiene questo script."""
+    return Path(run_git(["rev-parse", "--show-toplevel"], cwd=Path(__file__).resolve().parent))
+
+
 def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser(description=__doc__)
     parser.add_argument("--repo", required=True, help="Repository GitHub nel formato owner/name.")
     parser.add_argument("--github-token", help="Token GitHub per arricchire le release notes.")
     parser.add_argument(
         "--repository-root",
-        default=Path(__file__).resolve().parents[2],
+        default=None,
         type=Path,
-        help="Percorso della root del repository.",
+        help="Percorso della root del repository (default: quella che contiene questo script).",
     )
     parser.add_argument(
         "--modules-root",
@@ -142,19 +147,19 @@ def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
 
 def main(argv: Optional[Sequence[str]] = None) -> int:
     args = parse_args(argv)
-    repo_root: Path = args.repository_root.resolve()
+    repo_root: Path = (args.repository_root or default_repository_root()).resolve()
 
     ensure_clean_worktree(repo_root)
     ensure_on_main(repo_root, args.branch)
 
     latest_tag = get_latest_tag(args.tag_prefix)
     current_version = latest_tag[len(args.tag_prefix) :] if latest_tag else None
-    commits = collect_commits(latest_tag, "HEAD")
-    if not commits:
+    plan = plan_release(latest_tag, "HEAD", current_version=current_version)
+    if plan is None:
         print("Nessun commit da rilasciare. Nessuna azione eseguita.")
         return 0
 
-    next_version, bump = plan_next_version(current_version=current_version, commits=commits)
+    next_version, bump = plan
     print(f"Ultimo tag: {latest_tag or 'nessuno'}")
     print(f"Incremento richiesto: {bump.name.lower()}")
     print(f"Nuova versione: {next_version}")
@@ -1,33 +1,305 @@
 
 # tools/release_notes/llm.py
 from __future__ import annotations
-import hashlib, json, os
+import hashlib, json, os, re, sqlite3, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional, Dict
+from typing import Iterator, Optional, Dict, List, Mapping, Sequence, Tuple
 import subprocess
 
-CACHE_DIR = Path(".llm-cache")
-CACHE_DIR.mkdir(exist_ok=True)
+from tools.rate_limit import SlidingWindowLimiter
 
-def _read_git_diff(sha: str, max_bytes: int = 160_000) -> str:
-    diff = subprocess.run(
-        ["git", "show", sha, "--patch", "--no-ext-diff", "--find-renames", "--find-copies", "--unified=3"],
-        check=True, text=True, stdout=subprocess.PIPE
-    ).stdout
-    return diff[:max_bytes]
+CACHE_DIR = Path(os.getenv("LLM_CACHE_DIR", ".llm-cache"))
+CACHE_MAX_BYTES = int(float(os.getenv("LLM_CACHE_MAX_MB", "256")) * 1024 * 1024)
+CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_DAYS", "30")) * 86400
 
-def _cache_get(key: str) -> Optional[dict]:
-    path = CACHE_DIR / f"{key}.json"
-    if path.exists():
+DIFF_MAX_BYTES = 160_000
+# Stesse opzioni per `git show` e per il prefetch con `git log`: con `--cc` anche i merge
+# producono lo stesso testo, quindi le chiavi di cache non dipendono dal percorso di lettura.
+_DIFF_ARGS = ["--patch", "--cc", "--no-ext-diff", "--find-renames", "--find-copies", "--unified=3"]
+_COMMIT_HEADER = re.compile(rb"^commit ([0-9a-f]{40}|[0-9a-f]{64})(?=\s|$)")
+_READ_CHUNK = 64 * 1024
+
+def _split_commits(stream, max_bytes: int) -> Iterator[Tuple[str, bytes]]:
+    """(SHA, primi `max_bytes` byte) per ogni commit dell'output di `git show`/`git log`.
+
+    Le righe vengono lette a blocchi di `_READ_CHUNK` byte, quindi una riga enorme non viene mai
+    accumulata per intero. La riga vuota che `git log` mette tra due commit non fa parte del
+    commit precedente (`git show` non la produce).
+    """
+    sha: Optional[str] = None
+    chunks: List[bytes] = []
+    size = 0
+    pending = b""  # riga vuota trattenuta finché non si sa se precede un nuovo commit
+    at_line_start = True
+
+    def add(piece: bytes) -> None:
+        nonlocal size
+        if size < max_bytes:
+            piece = piece[: max_bytes - size]
+            chunks.append(piece)
+            size += len(piece)
+
+    while True:
+        piece = stream.readline(_READ_CHUNK)
+        if not piece:
+            break
+        line_start, at_line_start = at_line_start, piece.endswith(b"\n")
+        if line_start:
+            match = _COMMIT_HEADER.match(piece)
+            if match:
+                if sha is not None:
+                    yield sha, b"".join(chunks)
+                sha, chunks, size, pending = match.group(1).decode("ascii"), [], 0, b""
+                add(piece)
+                continue
+            if piece == b"\n":
+                add(pending)
+                pending = piece
+                continue
+        add(pending)
+        pending = b""
+        add(piece)
+    add(pending)
+    if sha is not None:
+        yield sha, b"".join(chunks)
+
+def _subject_of(diff: str) -> str:
+    """Equivalente di `%s`: il primo paragrafo del messaggio (indentato di 4 spazi) su una riga."""
+    lines: List[str] = []
+    for line in diff.partition("\n\n")[2].split("\n"):
+        if not line.startswith("    ") or not line.strip():
+            break
+        lines.append(line.strip())
+    return " ".join(lines)
+
+def _read_git_diff(sha: str, max_bytes: int = DIFF_MAX_BYTES) -> str:
+    proc = subprocess.Popen(["git", "show", sha, *_DIFF_ARGS], stdout=subprocess.PIPE)
+    try:
+        assert proc.stdout is not None
+        found = dict(_split_commits(proc.stdout, max_bytes))
+    finally:
+        if proc.stdout:
+            proc.stdout.close()
+        returncode = proc.wait()
+    if returncode != 0 and not found:
+        raise subprocess.CalledProcessError(returncode, ["git", "show", sha])
+    return next(iter(found.values()), b"").decode("utf-8", errors="replace")
+
+class DiffProvider:
+    """Legge i diff di un insieme di commit con un solo `git log -p` e li condivide tra i classificatori.
+
+    L'output viene suddiviso per commit mentre arriva dalla pipe; raggiunto `max_bytes` il resto
+    del commit viene scartato senza essere accumulato. Il testo di ogni commit è identico a quello
+    di `_read_git_diff` (`git show`), su cui ricadono gli SHA non prefetchati.
+    """
+
+    def __init__(self, max_bytes: int = DIFF_MAX_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self.subjects: Dict[str, str] = {}
+        self._diffs: Dict[str, str] = {}
+
+    def prefetch(self, shas: Sequence[str]) -> None:
+        todo = [sha for sha in shas if sha not in self._diffs]
+        if not todo:
+            return
+        cmd = ["git", "log", "--no-walk=unsorted", "--stdin", *_DIFF_ARGS]
+        proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
         try:
-            return json.loads(path.read_text(encoding="utf-8"))
-        except Exception:
+            assert proc.stdin is not None and proc.stdout is not None
+            proc.stdin.write(("\n".join(todo) + "\n").encode("utf-8"))
+            proc.stdin.close()
+            for sha, raw in _split_commits(proc.stdout, self.max_bytes):
+                diff = raw.decode("utf-8", errors="replace")
+                self._diffs[sha] = diff
+                self.subjects[sha] = _subject_of(diff)
+        finally:
+            if proc.stdout:
+                proc.stdout.close()
+            # in caso di errore git (es. SHA non validi) gli SHA mancanti useranno `_read_git_diff`
+            proc.wait()
+
+    def get(self, sha: str) -> str:
+        diff = self._diffs.get(sha)
+        if diff is None:
+            diff = _read_git_diff(sha, self.max_bytes)
+            self._diffs[sha] = diff
+        return diff
+
+_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+CREATE INDEX IF NOT EXISTS entries_created ON entries (created);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('total_bytes', 0);
+CREATE TRIGGER IF NOT EXISTS entries_ai AFTER INSERT ON entries BEGIN
+    UPDATE meta SET value = value + NEW.size WHERE key = 'total_bytes';
+END;
+CREATE TRIGGER IF NOT EXISTS entries_au AFTER UPDATE OF size ON entries BEGIN
+    UPDATE meta SET value = value + NEW.size - OLD.size WHERE key = 'total_bytes';
+END;
+CREATE TRIGGER IF NOT EXISTS entries_ad AFTER DELETE ON entries BEGIN
+    UPDATE meta SET value = value - OLD.size WHERE key = 'total_bytes';
+END;
+"""
+
+class LLMCache:
+    """Cache delle risposte LLM in un unico file SQLite, con limite di dimensione ed eviction LRU/TTL.
+
+    Il file viene creato solo al primo accesso. Ogni thread usa la propria connessione e le
+    scritture avvengono in transazioni `BEGIN IMMEDIATE`, quindi più processi (runner paralleli)
+    possono condividere la stessa directory senza corrompere i dati.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int = CACHE_MAX_BYTES, ttl_seconds: Optional[float] = CACHE_TTL_SECONDS) -> None:
+        self.directory = Path(directory)
+        self.path = self.directory / "cache.sqlite3"
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds if ttl_seconds and ttl_seconds > 0 else None
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+        self._stats_lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+        with self._init_lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            if not self._initialized:
+                conn.executescript("BEGIN IMMEDIATE;" + _CACHE_SCHEMA + "COMMIT;")
+                self._initialized = True
+                self._import_legacy_files(conn)
+        self._local.conn = conn
+        return conn
+
+    def _import_legacy_files(self, conn: sqlite3.Connection) -> None:
+        # migra una tantum il vecchio formato (un file JSON per chiave)
+        for path in self.directory.glob("*.json"):
+            try:
+                value = json.dumps(json.loads(path.read_text(encoding="utf-8")), ensure_ascii=False)
+            except Exception:
+                value = None
+            if value is not None:
+                self._write(conn, path.stem, value)
+            path.unlink(missing_ok=True)
+
+    def _count(self, **deltas: int) -> None:
+        with self._stats_lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+
+    def get(self, key: str) -> Optional[dict]:
+        conn = self._conn()
+        row = conn.execute("SELECT value, created FROM entries WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        if row is None:
+            self._count(misses=1)
             return None
-    return None
+        if self.ttl_seconds is not None and now - row[1] > self.ttl_seconds:
+            deleted = conn.execute("DELETE FROM entries WHERE key = ?", (key,)).rowcount
+            self._count(misses=1, evictions=deleted)
+            return None
+        conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+        try:
+            data = json.loads(row[0])
+        except ValueError:
+            self._count(misses=1)
+            return None
+        self._count(hits=1)
+        return data
+
+    def set(self, key: str, data: dict) -> None:
+        self._write(self._conn(), key, json.dumps(data, ensure_ascii=False, separators=(",", ":")))
+
+    def _write(self, conn: sqlite3.Connection, key: str, value: str) -> None:
+        now = time.time()
+        size = len(value.encode("utf-8")) + len(key)
+        evicted = 0
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT INTO entries (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, size = excluded.size, "
+                "created = excluded.created, accessed = excluded.accessed",
+                (key, value, size, now, now),
+            )
+            if self.ttl_seconds is not None:
+                evicted += conn.execute("DELETE FROM entries WHERE created < ?", (now - self.ttl_seconds,)).rowcount
+            total = conn.execute("SELECT value FROM meta WHERE key = 'total_bytes'").fetchone()[0]
+            while total > self.max_bytes:
+                victims = conn.execute(
+                    "SELECT key, size FROM entries WHERE key != ? ORDER BY accessed LIMIT 64", (key,)
+                ).fetchall()
+                if not victims:
+                    break
+                for victim, victim_size in victims:
+                    conn.execute("DELETE FROM entries WHERE key = ?", (victim,))
+                    evicted += 1
+                    total -= victim_size
+                    if total <= self.max_bytes:
+                        break
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._count(evictions=evicted)
+
+    def stats(self) -> Dict[str, int]:
+        conn = self._conn()
+        entries = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        total = conn.execute("SELECT value FROM meta WHERE key = 'total_bytes'").fetchone()[0]
+        with self._stats_lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": entries,
+                "bytes": total,
+                "max_bytes": self.max_bytes,
+            }
+
+    def report(self) -> str:
+        s = self.stats()
+        lookups = s["hits"] + s["misses"]
+        ratio = (s["hits"] / lookups * 100) if lookups else 0.0
+        return (f"llm-cache: {s['hits']} hit / {s['misses']} miss ({ratio:.1f}% hit), "
+                f"{s['evictions']} evicted, {s['entries']} entries, "
+                f"{s['bytes'] / 1024 / 1024:.1f}/{s['max_bytes'] / 1024 / 1024:.0f} MB")
+
+_cache_instance: Optional[LLMCache] = None
+_cache_instance_lock = threading.Lock()
+
+def get_cache() -> LLMCache:
+    global _cache_instance
+    with _cache_instance_lock:
+        if _cache_instance is None or _cache_instance.directory != Path(CACHE_DIR):
+            _cache_instance = LLMCache(Path(CACHE_DIR))
+        return _cache_instance
+
+def _cache_get(key: str) -> Optional[dict]:
+    try:
+        return get_cache().get(key)
+    except sqlite3.Error:
+        return None
 
 def _cache_set(key: str, data: dict) -> None:
-    path = CACHE_DIR / f"{key}.json"
-    path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    try:
+        get_cache().set(key, data)
+    except sqlite3.Error:
+        pass
 
 def _hash_inputs(*chunks: str) -> str:
     import hashlib
@@ -36,25 +308,73 @@ def _hash_inputs(*chunks: str) -> str:
         h.update(c.encode("utf-8", errors="ignore"))
     return h.hexdigest()[:32]
 
-def _llm_call(system_prompt: str, user_prompt: str, model: Optional[str]=None, max_tokens: int=400) -> Optional[str]:
+class _TokenBudget(SlidingWindowLimiter):
+    """Limite token-per-minute condiviso tra i thread (finestra mobile di 60s)."""
+
+    def __init__(self, tokens_per_minute: int) -> None:
+        super().__init__(tokens_per_minute, 60.0)
+        self.tokens_per_minute = tokens_per_minute
+
+_session = None
+_session_lock = threading.Lock()
+_pool_size = 0
+
+def _mount_pool(session, size: int) -> None:
+    from requests.adapters import HTTPAdapter
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, size))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+def _reserve_connections(workers: int) -> None:
+    """Allarga il pool della sessione condivisa ad almeno `workers` connessioni (mai lo restringe)."""
+    global _pool_size
+    with _session_lock:
+        if workers <= _pool_size:
+            return
+        _pool_size = workers
+        if _session is not None:
+            _mount_pool(_session, workers)
+
+def _get_session():
+    global _session, _pool_size
+    with _session_lock:
+        if _session is None:
+            import requests
+            session = requests.Session()
+            _pool_size = max(_pool_size, int(os.getenv("LLM_CONCURRENCY", "4")))
+            _mount_pool(session, _pool_size)
+            _session = session
+        return _session
+
+def _estimate_tokens(*texts: str) -> int:
+    # stima economica (~4 caratteri per token), sufficiente per il rate limiting
+    return sum(len(t) for t in texts) // 4 + 1
+
+def _llm_call(system_prompt: str, user_prompt: str, model: Optional[str]=None, max_tokens: int=400, json_mode: bool=False,
+              budget: Optional[_TokenBudget] = None) -> Optional[str]:
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         return None
     model = model or os.getenv("LLM_MODEL", "gpt-4o-mini")
+    base_url = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1").rstrip("/")
+    if budget is not None:
+        budget.acquire(_estimate_tokens(system_prompt, user_prompt) + max_tokens)
+    payload = {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ],
+        "temperature": float(os.getenv("LLM_TEMPERATURE", "0.2")),
+        "max_tokens": max_tokens,
+    }
+    if json_mode:
+        payload["response_format"] = {"type": "json_object"}
     try:
-        import requests
-        resp = requests.post(
-            "https://api.openai.com/v1/chat/completions",
+        resp = _get_session().post(
+            f"{base_url}/chat/completions",
             headers={"Authorization": f"Bearer {api_key}"},
-            json={
-                "model": model,
-                "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                "temperature": float(os.getenv("LLM_TEMPERATURE", "0.2")),
-                "max_tokens": max_tokens,
-            },
+            json=payload,
             timeout=60,
         )
         resp.raise_for_status()
@@ -63,8 +383,10 @@ def _llm_call(system_prompt: str, user_prompt: str, model: Optional[str]=None, m
     except Exception:
         return None
 
-def summarize_diff(commit_sha: str, commit_subject: str) -> Optional[str]:
-    diff = _read_git_diff(commit_sha)
+def summarize_diff(commit_sha: str, commit_subject: str, diff: Optional[str] = None,
+                   budget: Optional[_TokenBudget] = None) -> Optional[str]:
+    if diff is None:
+        diff = _read_git_diff(commit_sha)
     key = _hash_inputs("sum", commit_sha, commit_subject, diff)
     cached = _cache_get(key)
     if cached:
@@ -72,13 +394,15 @@ def summarize_diff(commit_sha: str, commit_subject: str) -> Optional[str]:
     sys_prompt = ("Sei un assistente tecnico. Riassumi in 4-8 righe l'impatto delle modifiche "
                   "nel diff, citando API/contratti/DB se toccati. Evita fronzoli.")
     usr_prompt = f"Commit: {commit_subject}\n\nDiff (troncato):\n```\n{diff}\n```"
-    out = _llm_call(sys_prompt, usr_prompt, max_tokens=300)
+    out = _llm_call(sys_prompt, usr_prompt, max_tokens=300, budget=budget)
     if out:
         _cache_set(key, {"summary": out})
     return out
 
-def classify_risk(commit_sha: str, commit_subject: str) -> Optional[Dict[str, bool]]:
-    diff = _read_git_diff(commit_sha)
+def classify_risk(commit_sha: str, commit_subject: str, diff: Optional[str] = None,
+                  budget: Optional[_TokenBudget] = None) -> Optional[Dict[str, bool]]:
+    if diff is None:
+        diff = _read_git_diff(commit_sha)
     key = _hash_inputs("risk", commit_sha, commit_subject, diff)
     cached = _cache_get(key)
     if cached:
@@ -87,7 +411,7 @@ def classify_risk(commit_sha: str, commit_subject: str) -> Optional[Dict[str, bo
                   "touch su API pubbliche/contratti. Rispondi JSON con chiavi: "
                   "{'breaking': bool, 'db_migration': bool, 'public_api': bool}.")
     usr_prompt = f"Commit: {commit_subject}\n\nDiff (troncato):\n```\n{diff}\n```"
-    out = _llm_call(sys_prompt, usr_prompt, max_tokens=120)
+    out = _llm_call(sys_prompt, usr_prompt, max_tokens=120, budget=budget)
     try:
         data = json.loads(out) if out else None
     except Exception:
@@ -96,16 +420,190 @@ def classify_risk(commit_sha: str, commit_subject: str) -> Optional[Dict[str, bo
         _cache_set(key, {"risk": data})
     return data
 
-def classify_type(commit_subject: str) -> Optional[str]:
+def classify_type(commit_subject: str, budget: Optional[_TokenBudget] = None) -> Optional[str]:
     key = _hash_inputs("type", commit_subject)
     cached = _cache_get(key)
     if cached:
         return cached.get("type")
     sys_prompt = ("Classifica il messaggio secondo Conventional Commits (feat, fix, perf, refactor, "
                   "docs, chore, ci, test, style, revert) o 'other'. Rispondi SOLO con la label.")
-    out = _llm_call(sys_prompt, commit_subject, max_tokens=10)
+    out = _llm_call(sys_prompt, commit_subject, max_tokens=10, budget=budget)
     label = (out or "").strip().lower()
     if label:
         _cache_set(key, {"type": label})
         return label
     return None
+
+# -----------------------
+# Classificazione a batch: K elementi per richiesta, risposta JSON {"results": {id: valore}}
+# -----------------------
+
+TYPE_LABELS = frozenset(("feat", "fix", "perf", "refactor", "docs", "chore", "ci", "test", "style", "revert", "build", "other"))
+_RISK_KEYS = ("breaking", "db_migration", "public_api")
+
+def _chunks(items: Sequence, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def _parse_json_object(text: Optional[str]) -> Optional[dict]:
+    cleaned = (text or "").strip()
+    if cleaned.startswith("```"):
+        cleaned = "\n".join(cleaned.splitlines()[1:-1]).strip()
+    try:
+        data = json.loads(cleaned)
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+def _batched_json_call(sys_prompt: str, items: Sequence[Tuple[str, str]], max_tokens_per_item: int,
+                       budget: Optional[_TokenBudget] = None) -> Dict[str, object]:
+    """Invia più elementi (id, testo) in un'unica richiesta e restituisce le risposte per id."""
+    usr_prompt = json.dumps({"items": [{"id": item_id, "text": text} for item_id, text in items]}, ensure_ascii=False)
+    out = _llm_call(sys_prompt, usr_prompt, max_tokens=32 + max_tokens_per_item * len(items), json_mode=True, budget=budget)
+    results = (_parse_json_object(out) or {}).get("results")
+    return results if isinstance(results, dict) else {}
+
+def classify_types_batch(subjects: Mapping[str, str], batch_size: int = 25,
+                         budget: Optional[_TokenBudget] = None) -> Dict[str, Optional[str]]:
+    """Variante a batch di `classify_type` (chiave: SHA). Subject identici vengono inviati una volta sola.
+
+    Ogni risposta valida popola la cache come la chiamata singola; gli elementi scartati o non
+    validi dal modello ricadono su `classify_type`.
+    """
+    labels: Dict[str, Optional[str]] = {}
+    pending: List[str] = []
+    for subject in dict.fromkeys(subjects.values()):
+        cached = _cache_get(_hash_inputs("type", subject))
+        if cached and cached.get("type"):
+            labels[subject] = cached["type"]
+        else:
+            pending.append(subject)
+    sys_prompt = ("Classifica ogni elemento di `items` secondo Conventional Commits (feat, fix, perf, "
+                  "refactor, docs, chore, ci, test, style, revert) o 'other'. Rispondi SOLO con JSON "
+                  '{"results": {"<id>": "<label>"}} con una voce per ogni id.')
+    for chunk in _chunks(pending, max(1, batch_size)):
+        answers = _batched_json_call(sys_prompt, [(str(i), subject) for i, subject in enumerate(chunk)], 8, budget)
+        for i, subject in enumerate(chunk):
+            label = str(answers.get(str(i)) or "").strip().lower()
+            if label in TYPE_LABELS:
+                _cache_set(_hash_inputs("type", subject), {"type": label})
+                labels[subject] = label
+    for subject in pending:
+        if subject not in labels:
+            labels[subject] = classify_type(subject, budget)
+    return {sha: labels[subject] for sha, subject in subjects.items()}
+
+_RISK_FROM_SUMMARY_PROMPT = ("Sei un revisore. Per ogni commit (subject + sintesi del diff) valuta il rischio BC "
+                             "(breaking change), presenza migrazioni DB, touch su API pubbliche/contratti. ")
+
+def _coerce_risk(value: object) -> Optional[Dict[str, bool]]:
+    if not isinstance(value, dict) or not all(k in value for k in _RISK_KEYS):
+        return None
+    return {k: bool(value[k]) for k in _RISK_KEYS}
+
+def _classify_risk_from_summary(sha: str, subject: str, summary: str,
+                                budget: Optional[_TokenBudget] = None) -> Optional[Dict[str, bool]]:
+    sys_prompt = _RISK_FROM_SUMMARY_PROMPT + ("Rispondi JSON con chiavi: "
+                                              "{'breaking': bool, 'db_migration': bool, 'public_api': bool}.")
+    out = _llm_call(sys_prompt, f"Commit: {subject}\n\nSintesi:\n{summary}", max_tokens=120, json_mode=True,
+                   budget=budget)
+    data = _coerce_risk(_parse_json_object(out))
+    if data:
+        _cache_set(_hash_inputs("risk-sum", sha, subject, summary), {"risk": data})
+    return data
+
+def classify_risks_batch(items: Mapping[str, Tuple[str, str]], batch_size: int = 10,
+                         budget: Optional[_TokenBudget] = None) -> Dict[str, Optional[Dict[str, bool]]]:
+    """Classifica il rischio a partire dalle sintesi dei diff (SHA -> (subject, sintesi)), K commit per richiesta."""
+    risks: Dict[str, Optional[Dict[str, bool]]] = {}
+    pending: List[str] = []
+    for sha, (subject, summary) in items.items():
+        cached = _cache_get(_hash_inputs("risk-sum", sha, subject, summary))
+        if cached and cached.get("risk"):
+            risks[sha] = cached["risk"]
+        else:
+            pending.append(sha)
+    sys_prompt = _RISK_FROM_SUMMARY_PROMPT + ('Rispondi SOLO con JSON {"results": {"<id>": {"breaking": bool, '
+                                              '"db_migration": bool, "public_api": bool}}} con una voce per ogni id.')
+    for chunk in _chunks(pending, max(1, batch_size)):
+        texts = [(str(i), f"Commit: {items[sha][0]}\nSintesi: {items[sha][1]}") for i, sha in enumerate(chunk)]
+        answers = _batched_json_call(sys_prompt, texts, 40, budget)
+        for i, sha in enumerate(chunk):
+            data = _coerce_risk(answers.get(str(i)))
+            if data:
+                subject, summary = items[sha]
+                _cache_set(_hash_inputs("risk-sum", sha, subject, summary), {"risk": data})
+                risks[sha] = data
+    for sha in pending:
+        if sha not in risks:
+            risks[sha] = _classify_risk_from_summary(sha, *items[sha], budget=budget)
+    return risks
+
+@dataclass
+class CommitEnrichment:
+    sha: str
+    subject: str
+    summary: Optional[str]
+    risk: Optional[Dict[str, bool]]
+    type: Optional[str]
+
+def _enrich_one(sha: str, subject: str, diffs: DiffProvider, budget: Optional[_TokenBudget]) -> CommitEnrichment:
+    diff = diffs.get(sha)
+    return CommitEnrichment(
+        sha=sha,
+        subject=subject,
+        summary=summarize_diff(sha, subject, diff=diff, budget=budget),
+        risk=classify_risk(sha, subject, diff=diff, budget=budget),
+        type=classify_type(subject, budget),
+    )
+
+def _enrich_batched(shas: Sequence[str], subjects: Mapping[str, str], diffs: DiffProvider,
+                    pool: ThreadPoolExecutor, batch_size: int,
+                    budget: Optional[_TokenBudget]) -> List[CommitEnrichment]:
+    by_sha = {sha: subjects.get(sha, "") for sha in shas}
+    types_future = pool.submit(classify_types_batch, by_sha, batch_size, budget)
+    summaries = dict(zip(shas, pool.map(lambda sha: summarize_diff(sha, by_sha[sha], diff=diffs.get(sha), budget=budget), shas)))
+    risks = classify_risks_batch(
+        {sha: (by_sha[sha], summary) for sha, summary in summaries.items() if summary}, batch_size, budget
+    )
+    # senza sintesi (LLM non disponibile o errore) si torna al rischio calcolato sul diff
+    for sha in shas:
+        if sha not in risks:
+            risks[sha] = classify_risk(sha, by_sha[sha], diff=diffs.get(sha), budget=budget)
+    types = types_future.result()
+    return [CommitEnrichment(sha, by_sha[sha], summaries[sha], risks[sha], types[sha]) for sha in shas]
+
+def enrich_commits(
+    shas: Sequence[str],
+    subjects: Optional[Mapping[str, str]] = None,
+    concurrency: Optional[int] = None,
+    tokens_per_minute: Optional[int] = None,
+    batch_size: Optional[int] = None,
+) -> List[CommitEnrichment]:
+    """Arricchisce più commit in parallelo, restituendo i risultati nello stesso ordine di `shas`.
+
+    Le chiamate condividono una sola sessione HTTP (connessioni in pool) e un budget
+    token-per-minute (`LLM_TPM`); i risultati già presenti in cache non toccano la rete.
+    Con `batch_size` > 1 (`LLM_BATCH_SIZE`) tipo e rischio vengono classificati a gruppi
+    di K commit per richiesta, il rischio a partire dalle sintesi dei diff.
+    """
+    if not shas:
+        return []
+    concurrency = concurrency or int(os.getenv("LLM_CONCURRENCY", "4"))
+    tpm = tokens_per_minute or int(os.getenv("LLM_TPM", "0") or 0)
+    batch_size = batch_size if batch_size is not None else int(os.getenv("LLM_BATCH_SIZE", "0") or 0)
+    diffs = DiffProvider()
+    diffs.prefetch(shas)  # un solo processo git per diff e subject di tutto il batch
+    if subjects is None:
+        subjects = diffs.subjects
+    budget = _TokenBudget(tpm) if tpm > 0 else None
+    workers = max(1, concurrency)
+    # una connessione per worker, più il thread chiamante che invia i batch di rischio
+    _reserve_connections(workers + 1)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        if batch_size > 1:
+            return _enrich_batched(shas, subjects, diffs, pool, batch_size, budget)
+        return list(pool.map(lambda sha: _enrich_one(sha, subjects.get(sha, ""), diffs, budget), shas))
+
+if __name__ == "__main__":
+    print(get_cache().report())
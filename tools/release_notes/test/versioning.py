@@ -3,11 +3,15 @@
 from __future__ import annotations
 
 import enum
+import itertools
 import re
 import subprocess
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Iterable, List, Optional, Sequence, Tuple
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from tools.release_notes.conventional import classify
+from tools.release_notes.path_rules import get_path_rules
 
 
 SEMVER_RE = re.compile(r"^(?P<major>0|[1-9]\d*)\.(?P<minor>0|[1-9]\d*)\.(?P<patch>0|[1-9]\d*)$")
@@ -49,11 +53,6 @@ class CommitMetadata:
         return self.message.splitlines()[0] if self.message else ""
 
 
-CONVENTIONAL_RE = re.compile(
-    r"^(?P<type>[a-zA-Z]+)(?P<scope>\([^)]*\))?(?P<breaking>!)?:"
-)
-
-
 def run_git(args: Sequence[str], cwd: Optional[Path] = None) -> str:
     result = subprocess.run(
         ["git", *args],
@@ -88,32 +87,13 @@ def detect_bump_from_commit(message: str, files: Sequence[str]) -> VersionBump:
     if not normalized_message:
         return VersionBump.NONE
 
-    if "BREAKING CHANGE" in normalized_message or "BREAKING-CHANGE" in normalized_message:
-        return VersionBump.MAJOR
-
-    match = CONVENTIONAL_RE.match(normalized_message)
-    if match:
-        if match.group("breaking"):
-            return VersionBump.MAJOR
-        commit_type = match.group("type").lower()
-        if commit_type == "feat":
-            return VersionBump.MINOR
-        if commit_type in {"fix", "perf", "refactor"}:
-            return VersionBump.PATCH
-
-    # In assenza di convenzioni esplicite, si utilizza una stima sui file toccati.
-    for file_path in files:
-        normalized = file_path.lower()
-        if ".proto" in normalized or normalized.startswith("contracts/"):
-            return VersionBump.MAJOR
-        if normalized.startswith("src/") or normalized.startswith("modules/"):
-            # Le modifiche funzionali al codice sono almeno una release minor.
-            return VersionBump.MINOR
-
-    if any(file_path.lower().startswith("docs/") for file_path in files):
-        return VersionBump.PATCH
+    bump = classify(normalized_message).bump
+    if bump:
+        return VersionBump(bump)
 
-    return VersionBump.NONE
+    # In assenza di convenzioni esplicite, si utilizza una stima sui file toccati
+    # (regole in tools/release_notes/bump_rules.yaml).
+    return VersionBump(get_path_rules().max_bump(files))
 
 
 def determine_required_bump(commits: Iterable[CommitMetadata]) -> VersionBump:
@@ -134,45 +114,67 @@ def get_latest_tag(prefix: str = "v") -> Optional[str]:
     return tags[0] if tags else None
 
 
-def collect_commits(base_ref: Optional[str], head_ref: str = "HEAD") -> List[CommitMetadata]:
+def _stream_git_lines(args: Sequence[str], cwd: Optional[Path] = None) -> Iterator[str]:
+    """Come `run_git`, ma legge l'output riga per riga; se il consumatore si ferma, git viene terminato."""
+    cmd = ["git", *args]
+    proc = subprocess.Popen(
+        cmd,
+        cwd=cwd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        errors="replace",
+    )
+    completed = False
+    try:
+        assert proc.stdout is not None
+        for line in proc.stdout:
+            yield line.rstrip("\n")
+        completed = True
+    finally:
+        if not completed and proc.poll() is None:
+            proc.kill()
+        stderr = proc.stderr.read() if proc.stderr else ""
+        if proc.stdout:
+            proc.stdout.close()
+        if proc.stderr:
+            proc.stderr.close()
+        returncode = proc.wait()
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmd, stderr=stderr)
+
+
+def _commit_metadata(sha: str, message_lines: List[str], files: List[str]) -> CommitMetadata:
+    message = "\n".join(message_lines).strip()
+    normalized_files = [file_path.strip() for file_path in files if file_path.strip()]
+    return CommitMetadata(sha=sha, message=message, files=normalized_files)
+
+
+def iter_commits(
+    base_ref: Optional[str],
+    head_ref: str = "HEAD",
+    cwd: Optional[Path] = None,
+) -> Iterator[CommitMetadata]:
+    """Produce i commit del range dal più recente, leggendo `git log --name-only` in streaming."""
     if base_ref:
         range_spec = f"{base_ref}..{head_ref}"
     else:
         range_spec = head_ref
     pretty_format = "%H%x01%B%x02FILES%x02"
-    raw_log = run_git(
-        [
-            "log",
-            range_spec,
-            f"--pretty=format:{pretty_format}",
-            "--name-only",
-        ]
-    )
-    commits: List[CommitMetadata] = []
     current_sha: Optional[str] = None
     message_lines: List[str] = []
     files: List[str] = []
     collecting_files = False
 
-    def flush_current_commit() -> None:
-        nonlocal current_sha, message_lines, files, collecting_files
-        if current_sha is None:
-            return
-        message = "\n".join(message_lines).strip()
-        normalized_files = [file_path.strip() for file_path in files if file_path.strip()]
-        commits.append(
-            CommitMetadata(sha=current_sha, message=message, files=normalized_files)
-        )
-        current_sha = None
-        message_lines = []
-        files = []
-        collecting_files = False
-
-    for line in raw_log.splitlines():
+    for line in _stream_git_lines(
+        ["log", range_spec, f"--pretty=format:{pretty_format}", "--name-only"],
+        cwd=cwd,
+    ):
         if "\x01" in line:
-            flush_current_commit()
+            if current_sha is not None:
+                yield _commit_metadata(current_sha, message_lines, files)
             sha, first_line = line.split("\x01", 1)
-            current_sha = sha
+            current_sha = sha.strip()
             message_lines = [first_line]
             files = []
             collecting_files = False
@@ -182,7 +184,10 @@ def collect_commits(base_ref: Optional[str], head_ref: str = "HEAD") -> List[Com
             continue
         if collecting_files:
             if not line.strip():
-                flush_current_commit()
+                if current_sha is not None:
+                    yield _commit_metadata(current_sha, message_lines, files)
+                current_sha = None
+                collecting_files = False
             else:
                 files.append(line)
             continue
@@ -190,8 +195,13 @@ def collect_commits(base_ref: Optional[str], head_ref: str = "HEAD") -> List[Com
         if current_sha is not None:
             message_lines.append(line)
 
-    flush_current_commit()
+    if current_sha is not None:
+        yield _commit_metadata(current_sha, message_lines, files)
+
 
+def collect_commits(base_ref: Optional[str], head_ref: str = "HEAD") -> List[CommitMetadata]:
+    """Tutti i commit del range in ordine cronologico (per i consumatori che servono la lista completa)."""
+    commits = list(iter_commits(base_ref, head_ref))
     commits.reverse()  # ordine cronologico
     return commits
 
@@ -199,7 +209,7 @@ def collect_commits(base_ref: Optional[str], head_ref: str = "HEAD") -> List[Com
 def plan_next_version(
     *,
     current_version: Optional[str],
-    commits: Sequence[CommitMetadata],
+    commits: Iterable[CommitMetadata],
 ) -> Tuple[str, VersionBump]:
     if current_version:
         base = parse_version(current_version)
@@ -210,3 +220,25 @@ def plan_next_version(
     next_version = format_version(next_version_tuple)
     return next_version, bump
 
+
+def plan_release(
+    base_ref: Optional[str],
+    head_ref: str = "HEAD",
+    *,
+    current_version: Optional[str],
+) -> Optional[Tuple[str, VersionBump]]:
+    """
+    Pianifica la prossima versione leggendo i commit in streaming.
+
+    Restituisce None se il range è vuoto. `determine_required_bump` si ferma al primo MAJOR:
+    a quel punto il generatore viene chiuso e il processo `git log` terminato, quindi su
+    range lunghi si legge solo la storia necessaria.
+    """
+    commits = iter_commits(base_ref, head_ref)
+    try:
+        first = next(commits, None)
+        if first is None:
+            return None
+        return plan_next_version(current_version=current_version, commits=itertools.chain([first], commits))
+    finally:
+        commits.close()
@@ -0,0 +1,38 @@
+import json
+from pathlib import Path
+
+from tools.release_notes.bench import run_bench
+
+
+def test_bench_runs_small_scenario_and_writes_json(tmp_path: Path) -> None:
+    out = tmp_path / "bench.json"
+
+    exit_code = run_bench.main(
+        [
+            "--commits", "30",
+            "--merge-every", "5",
+            "--llm-commits", "4",
+            "--llm-latency", "0",
+            "--workdir", str(tmp_path / "work"),
+            "--out", str(out),
+        ]
+    )
+
+    assert exit_code == 0
+    results = json.loads(out.read_text(encoding="utf-8"))
+    scenario = results["scenarios"][0]
+    assert scenario["spec"]["commits"] == 30
+    assert scenario["llm_requests"] == 12
+    assert {"git_read", "parse", "render", "classify", "versioning_collect", "index_warm"} <= set(scenario["stages"])
+    assert scenario["stages"]["git_read"]["peak_kib"] is not None
+
+
+def test_compare_flags_slower_stages() -> None:
+    spec = {"commits": 10}
+    baseline = {"scenarios": [{"spec": spec, "stages": {"parse": {"wall_s": 1.0}, "render": {"wall_s": 1.0}}}]}
+    current = {"scenarios": [{"spec": spec, "stages": {"parse": {"wall_s": 1.5}, "render": {"wall_s": 1.1}}}]}
+
+    regressions = run_bench.compare(current, baseline, threshold=0.2)
+
+    assert len(regressions) == 1
+    assert "parse" in regressions[0]
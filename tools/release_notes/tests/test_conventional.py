@@ -0,0 +1,45 @@
+import pytest
+
+from tools.release_notes.bench import bench_classifier
+from tools.release_notes.conventional import ConventionalCommit, classify
+from tools.release_notes.test import versioning
+
+
+@pytest.mark.parametrize(
+    "message,expected",
+    [
+        ("feat(api): add endpoint\n\nbody", ConventionalCommit("feat", "api", "add endpoint", False, 2)),
+        ("fix!: drop v1", ConventionalCommit("fix", None, "drop v1", True, 3)),
+        ("Feat: upper case type  ", ConventionalCommit("feat", None, "upper case type", False, 2)),
+        ("docs: spiega\n\nBREAKING CHANGE: nuovo formato", ConventionalCommit("docs", None, "spiega", True, 3)),
+        ("wip: qualcosa", ConventionalCommit("wip", None, "wip: qualcosa", False, 0)),
+        ("Update README", ConventionalCommit("other", None, "Update README", False, 0)),
+        ("feat:", ConventionalCommit("other", None, "feat:", False, 2)),
+    ],
+)
+def test_classify(message: str, expected: ConventionalCommit) -> None:
+    assert classify(message) == expected
+
+
+def test_exclamation_in_subject_is_not_breaking() -> None:
+    parsed = classify("feat: support !important in css")
+    assert parsed.breaking is False
+    assert parsed.section == "feat"
+
+
+def test_only_first_line_is_parsed() -> None:
+    parsed = classify("Merge branch 'x'\nfeat!: not a header")
+    assert parsed.section == "other"
+    assert parsed.breaking is False
+
+
+def test_versioning_uses_shared_classifier() -> None:
+    assert versioning.detect_bump_from_commit("refactor(core): x", []) == versioning.VersionBump.PATCH
+    assert versioning.detect_bump_from_commit("chore: x", ["src/app.py"]) == versioning.VersionBump.MINOR
+    assert versioning.detect_bump_from_commit("chore: x\n\nBREAKING-CHANGE: y", []) == versioning.VersionBump.MAJOR
+
+
+def test_classifier_bench_reports_throughput() -> None:
+    report = bench_classifier.run(count=500, body_bytes=50, repeat=1)
+    assert report["messages"] == 500
+    assert report["results"]["classify"]["msgs_per_s"] > 0
@@ -0,0 +1,193 @@
+import json
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from tools.release_notes import generate_release_notes as module
+
+
+def _git(repo: Path, *args: str) -> str:
+    return subprocess.run(
+        ["git", *args], cwd=repo, check=True, stdout=subprocess.PIPE, text=True
+    ).stdout.strip()
+
+
+@pytest.fixture()
+def repo(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    _git(tmp_path, "init", "-q")
+    _git(tmp_path, "config", "user.name", "Dev")
+    _git(tmp_path, "config", "user.email", "dev@example.com")
+    messages = [
+        "chore: bootstrap",
+        "feat(api): add endpoint\n\nbody text",
+        "fix: handle null",
+        "feat!: drop legacy flag",
+        "update readme",
+    ]
+    for index, message in enumerate(messages):
+        (tmp_path / f"file{index}.txt").write_text(str(index), encoding="utf-8")
+        _git(tmp_path, "add", ".")
+        _git(tmp_path, "commit", "-q", "-m", message)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def test_git_commits_streams_every_record(repo: Path) -> None:
+    commits = module._git_commits("HEAD")
+
+    assert not isinstance(commits, list)
+    subjects = [c.subject for c in commits]
+    assert subjects == [
+        "update readme",
+        "feat!: drop legacy flag",
+        "fix: handle null",
+        "feat(api): add endpoint",
+        "chore: bootstrap",
+    ]
+
+
+def test_git_commits_keeps_body_and_empty_body(repo: Path) -> None:
+    by_subject = {c.subject: c for c in module._git_commits("HEAD")}
+
+    assert by_subject["feat(api): add endpoint"].body == "body text"
+    assert by_subject["fix: handle null"].body == ""
+
+
+def test_commit_records_share_authors_and_skip_body_on_request(repo: Path) -> None:
+    commits = list(module._git_commits("HEAD", with_body=False))
+
+    assert all(c.body == "" for c in commits)
+    assert len({id(c.author) for c in commits}) == 1
+    assert not hasattr(commits[0], "__dict__")
+    assert commits[2].line().startswith("- handle null (")
+
+
+def test_git_commits_can_stop_early(repo: Path) -> None:
+    commits = module._git_commits("HEAD")
+    first = next(commits)
+    commits.close()
+
+    assert first.subject == "update readme"
+
+
+def test_git_commits_reports_git_errors(repo: Path) -> None:
+    with pytest.raises(RuntimeError, match="Command failed"):
+        list(module._git_commits("missing..HEAD"))
+
+
+def test_render_markdown_consumes_generator(repo: Path) -> None:
+    text = module._render_markdown(module._git_commits("HEAD"), {}, version="1.0.0")
+
+    assert "## ❗ Breaking Changes" in text
+    assert "- **api**: add endpoint" in text
+    assert "_No changes in the selected range._" not in text
+
+
+def test_render_markdown_empty_range(repo: Path) -> None:
+    text = module._render_markdown(module._git_commits("HEAD..HEAD"), {})
+
+    assert "_No changes in the selected range._" in text
+
+
+def test_indexed_commits_parse_only_new_shas(
+    repo: Path, tmp_path_factory: pytest.TempPathFactory, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    index_path = tmp_path_factory.mktemp("index") / "commits.sqlite3"
+    parsed = []
+    original = module._parse_conv
+    monkeypatch.setattr(module, "_parse_conv", lambda msg: parsed.append(msg) or original(msg))
+
+    with module.CommitIndex(index_path, parser_version=module._PARSER_VERSION) as index:
+        first = list(module._indexed_commits("HEAD", index))
+    assert len(parsed) == 5
+
+    (repo / "extra.txt").write_text("x", encoding="utf-8")
+    _git(repo, "add", ".")
+    _git(repo, "commit", "-q", "-m", "perf: faster path")
+    parsed.clear()
+
+    with module.CommitIndex(index_path, parser_version=module._PARSER_VERSION) as index:
+        second = list(module._indexed_commits("HEAD", index))
+    assert parsed == ["perf: faster path"]
+    assert [c.hash for c in second[1:]] == [c.hash for c in first]
+    assert module._render_markdown(second[1:], {}).split("\n", 3)[3] == module._render_markdown(
+        module._git_commits("HEAD~1"), {}
+    ).split("\n", 3)[3]
+
+
+def test_build_notes_fills_and_reuses_the_commit_index(
+    repo: Path, tmp_path_factory: pytest.TempPathFactory, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    index_path = tmp_path_factory.mktemp("index") / "commits.sqlite3"
+    monkeypatch.delenv("GITHUB_EVENT_PATH", raising=False)
+    # l'intestazione riporta l'ora di generazione: fissa, perché i due giri devono coincidere
+    monkeypatch.setattr(module, "_now_utc_iso", lambda: "2024-01-01T00:00:00Z")
+    args = module.parse_args(["--range", "HEAD", "--no-llm", "--commit-index", str(index_path)])
+
+    first = module._build_notes(args)
+    with module.CommitIndex(index_path, parser_version=module._PARSER_VERSION) as index:
+        assert len(index) == 5
+
+    # secondo giro: tutto dall'indice, nessun commit riletto da git log
+    monkeypatch.setattr(module, "_git_commits", lambda *a, **k: pytest.fail("git log fallback used"))
+    monkeypatch.setattr(module, "_git_commits_by_sha", lambda *a, **k: pytest.fail("indexed commits re-read"))
+    assert module._build_notes(args) == first
+
+
+def test_commit_index_is_reset_when_parser_changes(tmp_path: Path) -> None:
+    path = tmp_path / "commits.sqlite3"
+    row = module.IndexedCommit("a" * 40, "Dev", "2024-01-01", "feat: x", "feat", None, "x", False)
+    with module.CommitIndex(path, parser_version="1") as index:
+        index.put_many([row])
+        assert len(index) == 1
+
+    with module.CommitIndex(path, parser_version="2") as index:
+        assert len(index) == 0
+
+
+def test_main_writes_timings_sidecar_and_step_summary(
+    repo: Path, tmp_path_factory: pytest.TempPathFactory, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    out_dir = tmp_path_factory.mktemp("out")
+    summary = out_dir / "summary.md"
+    monkeypatch.setenv("GITHUB_STEP_SUMMARY", str(summary))
+    monkeypatch.delenv("GITHUB_EVENT_PATH", raising=False)
+
+    exit_code = module.main(
+        ["--range", "HEAD", "--no-llm", "--no-commit-index", "-o", str(out_dir / "notes.md"), "--timings"]
+    )
+
+    assert exit_code == 0
+    data = json.loads((out_dir / "notes.md.timings.json").read_text(encoding="utf-8"))
+    stages = {stage["name"]: stage for stage in data["stages"]}
+    assert {"load_pr_context", "git_log", "render", "write_output"} <= set(stages)
+    assert stages["git_log"]["wall_s"] <= stages["render"]["wall_s"]
+    assert "| git_log |" in summary.read_text(encoding="utf-8")
+
+
+def test_timings_env_toggle_and_profile(
+    repo: Path, tmp_path_factory: pytest.TempPathFactory, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    out_dir = tmp_path_factory.mktemp("out")
+    monkeypatch.delenv("GITHUB_STEP_SUMMARY", raising=False)
+    monkeypatch.setenv("RELEASE_NOTES_TIMINGS", str(out_dir / "timings.json"))
+
+    exit_code = module.main(
+        ["--range", "HEAD", "--no-llm", "--no-commit-index", "-o", str(out_dir / "notes.md"),
+         "--profile", str(out_dir / "prof")]
+    )
+
+    assert exit_code == 0
+    assert (out_dir / "timings.json").exists()
+    assert (out_dir / "prof" / "render.prof").exists()
+    assert not (out_dir / "prof" / "write_output.prof").exists()
+
+
+def test_stage_recorder_reports_llm_usage() -> None:
+    recorder = module.StageRecorder(enabled=True)
+    recorder.record_llm("llm_enrich", 1.25, {"prompt_tokens": 100, "completion_tokens": 20})
+
+    text = recorder.to_markdown()
+
+    assert "1 call(s), 1.250s total latency, 100 prompt / 20 completion tokens" in text
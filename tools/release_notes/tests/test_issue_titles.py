@@ -0,0 +1,163 @@
+import datetime as dt
+import hashlib
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterator, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from tools.github_http import GitHubHTTPClient, shared_client
+from tools.release_notes.issue_titles import IssueTitleCache, IssueTitleResolver
+
+
+def _iso(moment: dt.datetime) -> str:
+    return moment.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class FakeGitHub(ThreadingHTTPServer):
+    """GitHub minimale: GraphQL `issueOrPullRequest`, elenco issue con `since`/ETag e issue singola."""
+
+    daemon_threads = True
+
+    def __init__(self, count: int) -> None:
+        super().__init__(("127.0.0.1", 0), _Handler)
+        past = _iso(dt.datetime.now(dt.timezone.utc) - dt.timedelta(days=30))
+        self.issues: Dict[int, Tuple[str, str]] = {n: (f"Issue {n}", past) for n in range(1, count + 1)}
+        self.calls: Dict[str, int] = {"graphql": 0, "list": 0, "list_304": 0, "single": 0}
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def touch(self, number: int, title: str) -> None:
+        self.issues[number] = (title, _iso(dt.datetime.now(dt.timezone.utc) + dt.timedelta(seconds=5)))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: FakeGitHub
+
+    def log_message(self, format: str, *args) -> None:  # noqa: A002
+        return
+
+    def _send(self, status: int, body: object = None, headers: Dict[str, str] = None) -> None:
+        raw = json.dumps(body).encode("utf-8") if body is not None else b""
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def do_POST(self) -> None:  # noqa: N802
+        assert self.path == "/graphql"
+        assert self.headers.get("Authorization") == "Bearer token"
+        self.server.calls["graphql"] += 1
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        data = {}
+        for number in map(int, re.findall(r"i(\d+): issueOrPullRequest", payload["query"])):
+            issue = self.server.issues.get(number)
+            data[f"i{number}"] = {"title": issue[0], "updatedAt": issue[1]} if issue else None
+        self._send(200, {"data": {"repository": data}})
+
+    def do_GET(self) -> None:  # noqa: N802
+        parsed = urlparse(self.path)
+        single = re.fullmatch(r"/repos/owner/name/issues/(\d+)", parsed.path)
+        if single:
+            self.server.calls["single"] += 1
+            issue = self.server.issues.get(int(single.group(1)))
+            if not issue:
+                self._send(404, {"message": "Not Found"})
+                return
+            self._send(200, {"number": int(single.group(1)), "title": issue[0], "updated_at": issue[1]})
+            return
+        assert parsed.path == "/repos/owner/name/issues"
+        self.server.calls["list"] += 1
+        query = parse_qs(parsed.query)
+        since = query["since"][0]
+        page = int(query.get("page", ["1"])[0])
+        per_page = int(query["per_page"][0])
+        items = [
+            {"number": n, "title": title, "updated_at": updated}
+            for n, (title, updated) in sorted(self.server.issues.items())
+            if updated >= since
+        ]
+        body = items[(page - 1) * per_page : page * per_page]
+        etag = '"' + hashlib.sha1(json.dumps([since, page, body]).encode()).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.server.calls["list_304"] += 1
+            self._send(304)
+            return
+        headers = {"ETag": etag}
+        if page * per_page < len(items):
+            headers["Link"] = f'<{self.server.url}/repos/owner/name/issues?since={since}&per_page={per_page}&page={page + 1}>; rel="next"'
+        self._send(200, body, headers)
+
+
+@pytest.fixture()
+def github() -> Iterator[FakeGitHub]:
+    server = FakeGitHub(600)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _resolver(github: FakeGitHub, cache: IssueTitleCache, token: str = "token") -> IssueTitleResolver:
+    return IssueTitleResolver("owner/name", token, cache=cache, api_url=github.url, client=GitHubHTTPClient(token, api_url=github.url))
+
+
+def test_500_issues_resolved_in_graphql_batches_then_revalidated(github: FakeGitHub, tmp_path: Path) -> None:
+    wanted = range(1, 501)
+    with IssueTitleCache(tmp_path / "issues.sqlite3") as cache:
+        first = _resolver(github, cache)
+        titles = first.resolve(wanted)
+        assert len(titles) == 500 and titles[42] == "Issue 42"
+        assert first.requests_made == 5
+        assert github.calls["graphql"] == 5
+
+        # seconda esecuzione: una sola richiesta di rivalidazione, poi 304
+        second = _resolver(github, cache)
+        assert second.resolve(wanted) == titles
+        assert second.requests_made == 1
+        third = _resolver(github, cache)
+        assert third.resolve(wanted) == titles
+        assert third.requests_made == 1
+        assert github.calls["list_304"] == 1
+        assert github.calls["graphql"] == 5
+
+        github.touch(42, "Renamed issue")
+        fourth = _resolver(github, cache)
+        assert fourth.resolve(wanted)[42] == "Renamed issue"
+        assert fourth.requests_made == 1
+        assert github.calls["graphql"] == 5
+
+
+def test_only_missing_numbers_are_fetched(github: FakeGitHub, tmp_path: Path) -> None:
+    with IssueTitleCache(tmp_path / "issues.sqlite3") as cache:
+        _resolver(github, cache).resolve(range(1, 51))
+        resolver = _resolver(github, cache)
+        titles = resolver.resolve([10, 60, 9999])
+
+    assert titles == {10: "Issue 10", 60: "Issue 60"}
+    assert resolver.requests_made == 2  # rivalidazione + un blocco GraphQL per 60 e 9999
+
+
+def test_without_token_falls_back_to_rest(github: FakeGitHub) -> None:
+    resolver = IssueTitleResolver("owner/name", None, api_url=github.url, client=GitHubHTTPClient(api_url=github.url))
+
+    assert resolver.resolve([3, 4]) == {3: "Issue 3", 4: "Issue 4"}
+    assert github.calls == {"graphql": 0, "list": 0, "list_304": 0, "single": 2}
+
+
+def test_default_client_is_the_shared_github_client() -> None:
+    resolver = IssueTitleResolver("owner/name", "token")
+
+    assert resolver.client is shared_client("token", user_agent="release-notes")
@@ -0,0 +1,344 @@
+import subprocess
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from tools.release_notes.test import llm as module
+
+
+class FakeResponse:
+    def __init__(self, content: str) -> None:
+        self._content = content
+
+    def raise_for_status(self) -> None:
+        return None
+
+    def json(self) -> dict:
+        return {"choices": [{"message": {"content": self._content}}]}
+
+
+class FakeSession:
+    def __init__(self, delay: float = 0.0) -> None:
+        self.calls = []
+        self.threads = set()
+        self.delay = delay
+        self._lock = threading.Lock()
+
+    def post(self, url, headers=None, json=None, timeout=None):
+        with self._lock:
+            self.calls.append(json)
+            self.threads.add(threading.get_ident())
+        time.sleep(self.delay)
+        system = json["messages"][0]["content"]
+        user = json["messages"][1]["content"]
+        if "Conventional Commits" in system:
+            return FakeResponse("feat")
+        if "JSON" in system:
+            return FakeResponse('{"breaking": false, "db_migration": false, "public_api": true}')
+        return FakeResponse(f"summary of {user.splitlines()[0]}")
+
+
+@pytest.fixture(autouse=True)
+def _isolated(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    monkeypatch.setattr(module, "CACHE_DIR", tmp_path)
+
+
+@pytest.fixture()
+def fake_diffs(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(module, "_read_git_diff", lambda sha, max_bytes=160_000: f"diff for {sha}")
+    monkeypatch.setattr(module.DiffProvider, "prefetch", lambda self, shas: None)
+
+
+@pytest.mark.usefixtures("fake_diffs")
+def test_enrich_commits_preserves_input_order(monkeypatch: pytest.MonkeyPatch) -> None:
+    session = FakeSession(delay=0.01)
+    monkeypatch.setattr(module, "_get_session", lambda: session)
+    shas = [f"{i:040d}" for i in range(8)]
+    subjects = {sha: f"change {i}" for i, sha in enumerate(shas)}
+
+    results = module.enrich_commits(shas, subjects=subjects, concurrency=4)
+
+    assert [r.sha for r in results] == shas
+    assert results[3].summary == "summary of Commit: change 3"
+    assert results[3].type == "feat"
+    assert results[3].risk == {"breaking": False, "db_migration": False, "public_api": True}
+    assert len(session.calls) == 3 * len(shas)
+    assert len(session.threads) > 1
+
+
+@pytest.mark.usefixtures("fake_diffs")
+def test_enrich_commits_skips_network_on_cache_hits(monkeypatch: pytest.MonkeyPatch) -> None:
+    session = FakeSession()
+    monkeypatch.setattr(module, "_get_session", lambda: session)
+    subjects = {"a" * 40: "fix: something"}
+
+    first = module.enrich_commits(list(subjects), subjects=subjects)
+    calls_after_first = len(session.calls)
+    second = module.enrich_commits(list(subjects), subjects=subjects)
+
+    assert calls_after_first == 3
+    assert len(session.calls) == calls_after_first
+    assert second == first
+
+
+@pytest.mark.usefixtures("fake_diffs")
+def test_concurrent_enrichments_keep_their_own_budget(monkeypatch: pytest.MonkeyPatch) -> None:
+    session = FakeSession(delay=0.01)
+    monkeypatch.setattr(module, "_get_session", lambda: session)
+    seen = []
+    original = module._llm_call
+
+    def recording_call(system_prompt, user_prompt, *args, budget=None, **kwargs):
+        seen.append((user_prompt, budget.tokens_per_minute if budget else None))
+        return original(system_prompt, user_prompt, *args, budget=budget, **kwargs)
+
+    monkeypatch.setattr(module, "_llm_call", recording_call)
+    runs = {1_000_000: [f"{i:040d}" for i in range(4)], 2_000_000: [f"{i:040d}" for i in range(4, 8)]}
+    threads = [
+        threading.Thread(target=module.enrich_commits, args=(shas,), kwargs={
+            "subjects": {sha: f"run {tpm} {sha[-1]}" for sha in shas}, "concurrency": 2, "tokens_per_minute": tpm,
+        })
+        for tpm, shas in runs.items()
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(seen) == 24
+    assert all(f"run {tpm} " in prompt for prompt, tpm in seen)
+
+
+def test_session_pool_grows_with_the_worker_count(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(module, "_session", None)
+    monkeypatch.setattr(module, "_pool_size", 0)
+    monkeypatch.setenv("LLM_CONCURRENCY", "2")
+
+    module._reserve_connections(17)
+    session = module._get_session()
+    assert session.get_adapter("https://api.openai.com")._pool_maxsize == 17
+
+    module._reserve_connections(33)
+    module._reserve_connections(5)
+    assert module._get_session() is session
+    assert session.get_adapter("https://api.openai.com")._pool_maxsize == 33
+
+
+def test_token_budget_waits_for_window(monkeypatch: pytest.MonkeyPatch) -> None:
+    clock = {"now": 0.0}
+    sleeps = []
+    monkeypatch.setattr(module.time, "monotonic", lambda: clock["now"])
+
+    def fake_sleep(seconds: float) -> None:
+        sleeps.append(seconds)
+        clock["now"] += seconds
+
+    monkeypatch.setattr(module.time, "sleep", fake_sleep)
+    budget = module._TokenBudget(tokens_per_minute=100)
+
+    budget.acquire(60)
+    budget.acquire(40)
+    assert sleeps == []
+
+    budget.acquire(10)
+    assert sleeps == [60]
+
+
+def test_cache_is_created_lazily(tmp_path: Path) -> None:
+    cache = module.LLMCache(tmp_path / "cache")
+    assert not (tmp_path / "cache").exists()
+
+    assert cache.get("missing") is None
+    assert (tmp_path / "cache" / "cache.sqlite3").exists()
+
+
+def test_cache_evicts_least_recently_used_over_size_cap(tmp_path: Path) -> None:
+    cache = module.LLMCache(tmp_path, max_bytes=350)
+    payload = {"summary": "x" * 80}
+    for key in ("a", "b", "c"):
+        cache.set(key, payload)
+    assert cache.get("a") == payload  # "a" diventa il più recente
+
+    cache.set("d", payload)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == payload
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["bytes"] <= 350
+    assert stats["entries"] == 3
+
+
+def test_cache_expires_entries_after_ttl(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    now = {"t": 1000.0}
+    monkeypatch.setattr(module.time, "time", lambda: now["t"])
+    cache = module.LLMCache(tmp_path, ttl_seconds=60)
+    cache.set("k", {"type": "feat"})
+
+    now["t"] += 61
+
+    assert cache.get("k") is None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_cache_concurrent_writers_and_stats(tmp_path: Path) -> None:
+    cache = module.LLMCache(tmp_path)
+
+    def worker(n: int) -> None:
+        for i in range(20):
+            cache.set(f"{n}-{i}", {"n": n, "i": i})
+            assert cache.get(f"{n}-{i}") == {"n": n, "i": i}
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = cache.stats()
+    assert stats["entries"] == 80
+    assert stats["hits"] == 80
+    assert "80 hit" in cache.report()
+
+
+def test_cache_imports_legacy_json_files(tmp_path: Path) -> None:
+    (tmp_path / "abc.json").write_text('{\n  "type": "fix"\n}', encoding="utf-8")
+
+    cache = module.LLMCache(tmp_path)
+
+    assert cache.get("abc") == {"type": "fix"}
+    assert not (tmp_path / "abc.json").exists()
+
+
+def _git(repo: Path, *args: str) -> str:
+    return subprocess.run(
+        ["git", *args], cwd=repo, check=True, stdout=subprocess.PIPE, text=True
+    ).stdout.strip()
+
+
+@pytest.fixture()
+def repo(tmp_path_factory: pytest.TempPathFactory, monkeypatch: pytest.MonkeyPatch) -> Path:
+    root = tmp_path_factory.mktemp("repo")
+    _git(root, "init", "-q")
+    _git(root, "config", "user.name", "Dev")
+    _git(root, "config", "user.email", "dev@example.com")
+    (root / "small.txt").write_text("hello\n", encoding="utf-8")
+    _git(root, "add", ".")
+    _git(root, "commit", "-q", "-m", "feat: small change")
+    (root / "big.txt").write_text("".join(f"line {i}\n" for i in range(5000)), encoding="utf-8")
+    _git(root, "add", ".")
+    _git(root, "commit", "-q", "-m", "chore: big change")
+    monkeypatch.chdir(root)
+    return root
+
+
+def test_diff_provider_reads_all_commits_with_one_process(repo: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    big, small = _git(repo, "rev-list", "HEAD").split()
+    spawned = []
+    real_popen = subprocess.Popen
+    monkeypatch.setattr(module.subprocess, "Popen", lambda cmd, **kw: spawned.append(cmd) or real_popen(cmd, **kw))
+
+    provider = module.DiffProvider(max_bytes=2000)
+    provider.prefetch([small, big])
+
+    assert len(spawned) == 1
+    assert provider.subjects == {small: "feat: small change", big: "chore: big change"}
+    assert "+hello" in provider.get(small)
+    assert "+line 0" in provider.get(big)
+    assert len(provider.get(big).encode("utf-8")) == 2000
+    assert len(spawned) == 1
+
+
+def test_prefetched_diffs_match_git_show(repo: Path) -> None:
+    _git(repo, "checkout", "-q", "-b", "side")
+    (repo / "side.txt").write_text("è\r\n" + "x" * 300_000 + "\n", encoding="utf-8")
+    _git(repo, "add", ".")
+    _git(repo, "commit", "-q", "-m", "feat: side\n\nwith body")
+    _git(repo, "checkout", "-q", "-")
+    (repo / "small.txt").write_text("changed\n", encoding="utf-8")
+    _git(repo, "commit", "-q", "-am", "fix: main\nwrapped subject")
+    _git(repo, "merge", "-q", "--no-ff", "side", "-m", "merge side")
+    shas = _git(repo, "rev-list", "HEAD").split()
+
+    provider = module.DiffProvider(max_bytes=4000)
+    provider.prefetch(shas)
+    for sha in shas:
+        assert provider.get(sha) == module._read_git_diff(sha, 4000), sha
+    assert provider.subjects[shas[0]] == "merge side"
+    assert "fix: main wrapped subject" in provider.subjects.values()
+
+
+def test_split_commits_reads_long_lines_in_bounded_chunks() -> None:
+    class Stream:
+        def __init__(self, data: bytes) -> None:
+            self.data, self.limits = data, []
+
+        def readline(self, limit: int) -> bytes:
+            self.limits.append(limit)
+            end = self.data.find(b"\n", 0, limit)
+            piece, self.data = self.data[: end + 1 if end >= 0 else limit], self.data[end + 1 if end >= 0 else limit:]
+            return piece
+
+    header = b"commit " + b"a" * 40 + b"\n"
+    stream = Stream(header + b"+" + b"y" * (3 * module._READ_CHUNK) + b"\ncommit not-a-header\n")
+    assert list(module._split_commits(stream, 100)) == [("a" * 40, (header + b"+" + b"y" * 100)[:100])]
+    assert set(stream.limits) == {module._READ_CHUNK}
+
+
+class BatchSession(FakeSession):
+    """Risponde ai batch saltando l'ultimo elemento, per verificare il fallback per-item."""
+
+    def post(self, url, headers=None, json=None, timeout=None):
+        import json as _json
+
+        if json.get("response_format") and "items" in json["messages"][1]["content"]:
+            with self._lock:
+                self.calls.append(json)
+            items = _json.loads(json["messages"][1]["content"])["items"]
+            if "Conventional Commits" in json["messages"][0]["content"]:
+                results = {item["id"]: "fix" for item in items[:-1]}
+            else:
+                results = {item["id"]: {"breaking": False, "db_migration": True, "public_api": False} for item in items}
+            return FakeResponse(_json.dumps({"results": results}))
+        if json.get("response_format"):
+            with self._lock:
+                self.calls.append(json)
+            return FakeResponse('{"breaking": true, "db_migration": false, "public_api": false}')
+        return super().post(url, headers=headers, json=json, timeout=timeout)
+
+
+def test_classify_types_batch_packs_subjects_and_falls_back(monkeypatch: pytest.MonkeyPatch) -> None:
+    session = BatchSession()
+    monkeypatch.setattr(module, "_get_session", lambda: session)
+    subjects = {f"sha{i}": f"subject {i}" for i in range(10)}
+    subjects["dup"] = "subject 0"
+
+    labels = module.classify_types_batch(subjects, batch_size=5)
+
+    # 2 richieste batch + 2 fallback singoli (ultimo elemento di ogni batch scartato)
+    assert len(session.calls) == 4
+    assert labels["sha0"] == labels["dup"] == "fix"
+    assert labels["sha4"] == "feat" and labels["sha9"] == "feat"
+
+    session.calls.clear()
+    assert module.classify_type("subject 3") == "fix"
+    assert module.classify_type("subject 4") == "feat"
+    assert session.calls == []
+
+
+def test_enrich_commits_batch_mode(monkeypatch: pytest.MonkeyPatch, fake_diffs: None) -> None:
+    session = BatchSession()
+    monkeypatch.setattr(module, "_get_session", lambda: session)
+    shas = [f"{i:040d}" for i in range(6)]
+    subjects = {sha: f"change {i}" for i, sha in enumerate(shas)}
+
+    results = module.enrich_commits(shas, subjects=subjects, batch_size=6)
+
+    assert [r.sha for r in results] == shas
+    assert all(r.risk == {"breaking": False, "db_migration": True, "public_api": False} for r in results)
+    assert [r.type for r in results] == ["fix"] * 5 + ["feat"]
+    # 6 sintesi + 1 batch tipi + 1 fallback tipo + 1 batch rischio
+    assert len(session.calls) == 9
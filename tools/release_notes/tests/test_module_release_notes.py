@@ -0,0 +1,129 @@
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from tools.release_notes import generate_release_notes as module
+from tools.release_notes.test import create_release
+
+
+def _git(repo: Path, *args: str) -> str:
+    return subprocess.run(
+        ["git", *args], cwd=repo, check=True, stdout=subprocess.PIPE, text=True
+    ).stdout.strip()
+
+
+@pytest.fixture()
+def repo(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    _git(tmp_path, "init", "-q")
+    _git(tmp_path, "config", "user.name", "Dev")
+    _git(tmp_path, "config", "user.email", "dev@example.com")
+    commits = [
+        ("chore: bootstrap", ["README.md"]),
+        ("feat(ticketing): add queue (#12)", ["modules/ticketing/queue.py", "modules/ticketing/api.py"]),
+        ("fix: shared bug\n\nCloses #7", ["modules/ticketing/fix.py", "modules/billing/fix.py", "src/app.py"]),
+        ("docs: modules overview", ["modules/README.md"]),
+    ]
+    for message, paths in commits:
+        for path in paths:
+            target = tmp_path / path
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_text(message, encoding="utf-8")
+        _git(tmp_path, "add", ".")
+        _git(tmp_path, "commit", "-q", "-m", message)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def test_determine_commits_reads_files_in_one_pass(repo: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    calls = []
+    original = module._stream_git
+    monkeypatch.setattr(module, "_stream_git", lambda cmd, *args, **kwargs: calls.append(cmd) or original(cmd, *args, **kwargs))
+
+    commits = module.determine_commits("", "HEAD")
+
+    assert len(calls) == 1
+    assert [c.subject for c in commits][-1] == "chore: bootstrap"
+    assert commits[1].files == ("modules/billing/fix.py", "modules/ticketing/fix.py", "src/app.py")
+
+
+def test_group_commits_by_module_uses_path_index(repo: Path) -> None:
+    commits = module.determine_commits("HEAD~3")
+
+    grouped = module.group_commits_by_module(commits, "modules")
+
+    assert set(grouped) == {module.ROOT_MODULE, "ticketing", "billing"}
+    assert len(grouped[module.ROOT_MODULE].commits) == 3
+    assert [c.subject for c in grouped["ticketing"].commits] == ["fix: shared bug", "feat(ticketing): add queue (#12)"]
+    assert grouped["ticketing"].issues == {7, 12}
+    assert grouped["billing"].issues == {7}
+
+
+def test_module_path_index_only_accepts_known_modules() -> None:
+    index = module.ModulePathIndex("modules", ["ticketing"])
+
+    assert index.module_for("modules/ticketing/a/b.py") == "ticketing"
+    assert index.module_for("modules/removed/a.py") is None
+    assert index.module_for("modules/README.md") is None
+    assert index.module_for("src/modules/ticketing/a.py") is None
+
+
+def test_create_release_writes_root_and_module_notes(repo: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(create_release, "fetch_issue_titles", lambda repo_name, issues, token: {12: "Queue support"})
+
+    files = create_release.generate_release_notes(
+        repository_root=repo,
+        version="1.1.0",
+        base_ref=None,
+        repo="owner/name",
+        github_token=None,
+        modules_root="modules",
+        release_dir="ReleaseNotes",
+    )
+
+    assert sorted(str(p.relative_to(repo)) for p in files) == [
+        "ReleaseNotes/1.1.0.md",
+        "modules/billing/ReleaseNotes/1.1.0.md",
+        "modules/ticketing/ReleaseNotes/1.1.0.md",
+    ]
+    ticketing = (repo / "modules/ticketing/ReleaseNotes/1.1.0.md").read_text(encoding="utf-8")
+    assert ticketing.startswith("# Release Notes ticketing 1.1.0")
+    assert "- **ticketing**: add queue (#12)" in ticketing
+    assert "- #12 Queue support" in ticketing
+    assert "- #7" in ticketing
+    assert "bootstrap" not in ticketing
+    assert "bootstrap" in (repo / "ReleaseNotes/1.1.0.md").read_text(encoding="utf-8")
+
+
+def test_create_release_runs_from_outside_the_repository(
+    repo: Path, tmp_path_factory: pytest.TempPathFactory, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(create_release, "fetch_issue_titles", lambda repo_name, issues, token: {})
+    monkeypatch.chdir(tmp_path_factory.mktemp("elsewhere"))
+    sha = _git(repo, "rev-parse", "HEAD~1")
+    assert module.load_commit(sha, repo_root=repo).files == (
+        "modules/billing/fix.py", "modules/ticketing/fix.py", "src/app.py"
+    )
+
+    files = create_release.generate_release_notes(
+        repository_root=repo,
+        version="1.1.0",
+        base_ref=None,
+        repo="owner/name",
+        github_token=None,
+        modules_root="modules",
+        release_dir="ReleaseNotes",
+    )
+
+    assert "modules/ticketing/ReleaseNotes/1.1.0.md" in {str(p.relative_to(repo)) for p in files}
+
+
+def test_default_repository_root_is_the_git_toplevel() -> None:
+    expected = Path(__file__).resolve().parents[3]
+    assert create_release.default_repository_root().resolve() == expected
+    assert (expected / "tools" / "release_notes").is_dir()
+
+
+def test_fetch_issue_titles_without_repo_or_issues() -> None:
+    assert module.fetch_issue_titles("", {1}) == {}
+    assert module.fetch_issue_titles("owner/name", set()) == {}
@@ -0,0 +1,66 @@
+from pathlib import Path
+
+import pytest
+
+from tools.release_notes import path_rules
+from tools.release_notes.conventional import BUMP_MAJOR, BUMP_MINOR, BUMP_NONE, BUMP_PATCH
+from tools.release_notes.path_rules import PathRules
+from tools.release_notes.test import versioning
+
+
+@pytest.fixture()
+def rules() -> PathRules:
+    return PathRules.load()
+
+
+@pytest.mark.parametrize(
+    "path,expected",
+    [
+        ("contracts/notifier/notifications.yaml", BUMP_MAJOR),
+        ("src/Services/api.proto", BUMP_MAJOR),
+        ("SRC/web-core/app.ts", BUMP_MINOR),
+        ("modules/ticketing/README.md", BUMP_MINOR),
+        ("modules/ticketing/ticketing.openapi.yaml", BUMP_MAJOR),
+        ("docs/01-Architecture.md", BUMP_PATCH),
+        ("README.md", BUMP_NONE),
+        ("srcs/app.py", BUMP_NONE),
+    ],
+)
+def test_default_rules(rules: PathRules, path: str, expected: int) -> None:
+    assert rules.classify(path) == expected
+
+
+def test_max_bump_takes_highest_file_regardless_of_order(rules: PathRules) -> None:
+    assert rules.max_bump(["docs/a.md", "src/a.py", "contracts/x.yaml"]) == BUMP_MAJOR
+    assert rules.max_bump(["docs/a.md", "src/a.py"]) == BUMP_MINOR
+    assert rules.max_bump([]) == BUMP_NONE
+
+
+def test_module_rules_override_general_prefix(tmp_path: Path) -> None:
+    config = tmp_path / "rules.yaml"
+    config.write_text(
+        "prefixes:\n  modules/: minor\n"
+        "modules:\n  billing:\n    default: patch\n    prefixes:\n      api/: major\n      generated/: none\n",
+        encoding="utf-8",
+    )
+    rules = PathRules.load(config)
+
+    assert rules.classify("modules/other/x.py") == BUMP_MINOR
+    assert rules.classify("modules/billing/x.py") == BUMP_PATCH
+    assert rules.classify("modules/billing/api/v1.yaml") == BUMP_MAJOR
+    assert rules.classify("modules/billing/generated/client.ts") == BUMP_NONE
+
+
+def test_invalid_bump_is_rejected() -> None:
+    with pytest.raises(ValueError, match="Bump non valido"):
+        PathRules.from_mapping({"prefixes": {"src/": "huge"}})
+
+
+def test_versioning_reads_rules_from_env(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    config = tmp_path / "rules.yaml"
+    config.write_text("prefixes:\n  infra/: minor\n", encoding="utf-8")
+    monkeypatch.setenv("RELEASE_BUMP_RULES", str(config))
+
+    assert versioning.detect_bump_from_commit("chore: terraform", ["infra/main.tf"]) == versioning.VersionBump.MINOR
+    assert versioning.detect_bump_from_commit("chore: x", ["src/a.py"]) == versioning.VersionBump.NONE
+    assert path_rules.get_path_rules() is path_rules.get_path_rules()
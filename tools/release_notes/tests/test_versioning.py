@@ -0,0 +1,70 @@
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from tools.release_notes.test import versioning
+
+
+def _git(repo: Path, *args: str) -> str:
+    return subprocess.run(
+        ["git", *args], cwd=repo, check=True, stdout=subprocess.PIPE, text=True
+    ).stdout.strip()
+
+
+@pytest.fixture()
+def repo(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    _git(tmp_path, "init", "-q")
+    _git(tmp_path, "config", "user.name", "Dev")
+    _git(tmp_path, "config", "user.email", "dev@example.com")
+    commits = [
+        ("chore: bootstrap", "README.md"),
+        ("feat!: new contract", "contracts/api.proto"),
+        ("fix: handle null\n\nlonger body", "src/app.py"),
+        ("docs: guide", "docs/guide.md"),
+    ]
+    for message, path in commits:
+        target = tmp_path / path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(message, encoding="utf-8")
+        _git(tmp_path, "add", ".")
+        _git(tmp_path, "commit", "-q", "-m", message)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def test_iter_commits_streams_newest_first_with_files(repo: Path) -> None:
+    commits = versioning.iter_commits(None)
+
+    assert not isinstance(commits, list)
+    items = list(commits)
+    assert [c.subject for c in items] == ["docs: guide", "fix: handle null", "feat!: new contract", "chore: bootstrap"]
+    assert items[1].message == "fix: handle null\n\nlonger body"
+    assert items[1].files == ["src/app.py"]
+
+
+def test_collect_commits_is_chronological(repo: Path) -> None:
+    commits = versioning.collect_commits(None)
+
+    assert [c.files for c in commits] == [["README.md"], ["contracts/api.proto"], ["src/app.py"], ["docs/guide.md"]]
+
+
+def test_plan_release_stops_reading_at_first_major(repo: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    seen = []
+    original = versioning.detect_bump_from_commit
+    monkeypatch.setattr(
+        versioning, "detect_bump_from_commit", lambda message, files: seen.append(message) or original(message, files)
+    )
+
+    assert versioning.plan_release(None, current_version="1.4.2") == ("2.0.0", versioning.VersionBump.MAJOR)
+    # i commit precedenti al MAJOR non vengono letti
+    assert seen == ["docs: guide", "fix: handle null\n\nlonger body", "feat!: new contract"]
+
+
+def test_plan_release_empty_range(repo: Path) -> None:
+    assert versioning.plan_release("HEAD", current_version="1.0.0") is None
+
+
+def test_iter_commits_reports_git_errors(repo: Path) -> None:
+    with pytest.raises(subprocess.CalledProcessError):
+        list(versioning.iter_commits("missing"))
@@ -0,0 +1,146 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Tuple
+
+import pytest
+
+from tools.github_http import GitHubHTTPClient
+
+
+class StubGitHub(ThreadingHTTPServer):
+    """Risposte programmate per path; registra header e porta client di ogni richiesta."""
+
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.scripts: Dict[str, List[Tuple[int, Dict[str, str], object]]] = {}
+        self.seen: List[Tuple[str, str, Dict[str, str], int]] = []
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def script(self, path: str, *responses: Tuple[int, Dict[str, str], object]) -> None:
+        self.scripts[path] = list(responses)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: StubGitHub
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def log_message(self, format: str, *args) -> None:  # noqa: A002
+        return
+
+    def _handle(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        path = self.path.split("?")[0]
+        self.server.seen.append((self.command, path, dict(self.headers), self.client_address[1]))
+        queue = self.server.scripts[path]
+        status, headers, body = queue.pop(0) if len(queue) > 1 else queue[0]
+        if status == 200 and headers.get("ETag") and self.headers.get("If-None-Match") == headers["ETag"]:
+            status, body = 304, None
+        raw = json.dumps(body).encode("utf-8") if body is not None else b""
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    do_GET = do_POST = do_PATCH = _handle  # noqa: N815
+
+
+@pytest.fixture()
+def github() -> Iterator[StubGitHub]:
+    server = StubGitHub()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture()
+def sleeps() -> List[float]:
+    return []
+
+
+def _client(github: StubGitHub, sleeps: List[float]) -> GitHubHTTPClient:
+    return GitHubHTTPClient("token", api_url=github.url, clock=lambda: 1000.0, sleep=sleeps.append)
+
+
+def test_conditional_get_reuses_cached_body_and_connection(github: StubGitHub, sleeps: List[float]) -> None:
+    github.script("/repos/o/r/pulls/1", (200, {"ETag": '"v1"'}, {"number": 1}))
+    client = _client(github, sleeps)
+
+    first = client.get("/repos/o/r/pulls/1")
+    second = client.get("/repos/o/r/pulls/1")
+
+    assert first.json() == second.json() == {"number": 1}
+    assert [seen[2].get("If-None-Match") for seen in github.seen] == [None, '"v1"']
+    assert github.seen[0][2]["Authorization"] == "Bearer token"
+    assert len({seen[3] for seen in github.seen}) == 1  # stessa connessione
+    assert client.metrics.requests == 2 and client.metrics.not_modified == 1
+
+
+def test_secondary_rate_limit_honours_retry_after(github: StubGitHub, sleeps: List[float]) -> None:
+    github.script(
+        "/repos/o/r/issues",
+        (403, {"Retry-After": "7"}, {"message": "You have exceeded a secondary rate limit"}),
+        (201, {}, {"number": 5}),
+    )
+    client = _client(github, sleeps)
+
+    response = client.post("/repos/o/r/issues", json={"title": "x"})
+
+    assert response.status_code == 201
+    assert sleeps == [7.0]
+    assert client.metrics.throttled == 1 and client.metrics.throttled_seconds == 7.0
+    assert client.metrics.retries == 1
+
+
+def test_exhausted_primary_limit_waits_for_reset(github: StubGitHub, sleeps: List[float]) -> None:
+    github.script("/rate", (200, {"x-ratelimit-remaining": "0", "x-ratelimit-reset": "1030"}, {}))
+    client = _client(github, sleeps)
+
+    client.get("/rate")
+    assert sleeps == []
+    client.get("/rate")
+
+    assert sleeps == [31.0]
+    assert client.metrics.throttled == 1 and client.metrics.retries == 0
+
+
+def test_rate_limited_response_without_hints_backs_off(github: StubGitHub, sleeps: List[float]) -> None:
+    github.script("/busy", (429, {}, {"message": "slow down"}), (429, {}, {}), (200, {}, {"ok": True}))
+    client = _client(github, sleeps)
+
+    assert client.get("/busy").json() == {"ok": True}
+    assert sleeps == [60.0, 120.0]
+
+
+def test_server_errors_are_not_retried_for_post(github: StubGitHub, sleeps: List[float]) -> None:
+    github.script("/comments", (502, {}, {}), (502, {}, {}), (201, {}, {}))
+    client = _client(github, sleeps)
+
+    assert client.post("/comments", json={}).status_code == 502
+    assert client.get("/comments").status_code == 201  # GET: un nuovo tentativo dopo il backoff
+    assert sleeps == [2.0]
+
+
+def test_caller_etag_bypasses_the_client_cache(github: StubGitHub, sleeps: List[float]) -> None:
+    github.script("/repos/o/r/issues", (200, {"ETag": '"v1"'}, [{"number": 1}]))
+    client = _client(github, sleeps)
+
+    assert client.get("/repos/o/r/issues").status_code == 200
+    response = client.get("/repos/o/r/issues", headers={"If-None-Match": '"v1"'})
+
+    assert response.status_code == 304
+    assert client.metrics.not_modified == 0
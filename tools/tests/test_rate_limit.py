@@ -0,0 +1,52 @@
+from typing import List
+
+from tools.rate_limit import SlidingWindowLimiter
+
+
+def _limiter(capacity: int, now: List[float], sleeps: List[float]) -> SlidingWindowLimiter:
+    def sleep(seconds: float) -> None:
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    return SlidingWindowLimiter(capacity, 60.0, clock=lambda: now[0], sleep=sleep)
+
+
+def test_limiter_counts_calls_in_the_window() -> None:
+    now, sleeps = [0.0], []
+    limiter = _limiter(2, now, sleeps)
+    for _ in range(3):
+        limiter.acquire()
+
+    assert sleeps == [60.0]
+
+
+def test_limiter_waits_when_token_budget_is_spent() -> None:
+    now, sleeps = [0.0], []
+    limiter = _limiter(1000, now, sleeps)
+    limiter.acquire(600)
+    limiter.acquire(300)
+    limiter.acquire(300)
+
+    assert sleeps == [60.0]
+
+
+def test_limiter_frees_only_the_expired_costs() -> None:
+    now, sleeps = [0.0], []
+    limiter = _limiter(1000, now, sleeps)
+    limiter.acquire(600)
+    now[0] = 30.0
+    limiter.acquire(400)
+    limiter.acquire(500)  # attende la scadenza dei 600 a t=60, i 400 restano nella finestra
+
+    assert sleeps == [30.0]
+    limiter.acquire(200)
+    assert sleeps == [30.0, 30.0]
+
+
+def test_cost_larger_than_capacity_passes_alone() -> None:
+    now, sleeps = [0.0], []
+    limiter = _limiter(100, now, sleeps)
+    limiter.acquire(500)
+    limiter.acquire(1)
+
+    assert sleeps == [60.0]